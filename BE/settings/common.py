@@ -5,6 +5,7 @@
 import os
 import sys
 import logging
+import tempfile
 from os.path import abspath, join, dirname
 
 SITE_ROOT = abspath(join(dirname(__file__), "..", ".."))
@@ -271,9 +272,32 @@ AUTH_USER_MODEL = 'landing.SEEDUser'
 NOSE_ARGS = ['--exclude-dir=libs/dal', '--exclude-dir=data_importer']
 
 
+# Local copies of uploaded import files, shared by all of the import stages.
+# Least recently used copies are evicted beyond IMPORT_FILE_CACHE_MAX_BYTES.
+IMPORT_FILE_CACHE_DIR = join(tempfile.gettempdir(), 'seed_import_files')
+IMPORT_FILE_CACHE_MAX_BYTES = 5 * 1024 ** 3
+# CSV imports are split into slices of about this many bytes, each of which
+# is parsed and saved by its own worker.
+RAW_DATA_SHARD_SIZE = 16 * 1024 ** 2
+# Map and save imported rows in one pass, without saving raw snapshots, when
+# the org already has mappings for every column of the file.
+FUSED_IMPORT = False
+
+
 # Matching Settings
 MATCH_MIN_THRESHOLD = 0.3
 MATCH_MED_THRESHOLD = 0.4
+# Buildings are only fuzzy matched against canonical buildings which share
+# one of these keys with them: 'postal_code', 'city', 'street', or the
+# composites 'postal_code_street' and 'city_street' (see
+# seed.matching.blocking).
+MATCH_BLOCKING_KEYS = ('postal_code_street', 'city_street')
+# The engine unmatched buildings are scored with (see
+# seed.matching.engines): 'ngram', one n-gram search per building,
+# 'tfidf', sparse TF-IDF matrices a chunk at a time (needs NumPy and SciPy),
+# or 'trigram', candidates from a pg_trgm index in PostgreSQL.
+# Compare them on your data with ./manage.py benchmark_matching.
+MATCH_ENGINE = 'ngram'
 
 
 # django-passwords settings: passwords should requre alphnumberic and 8
@@ -5,7 +5,6 @@ import csv
 import datetime
 import hashlib
 import math
-import tempfile
 # import time
 import sys
 from urllib import unquote
@@ -27,6 +26,7 @@ from django.contrib.auth.models import User
 
 from BE.utils import de_camel_case
 from data_importer.managers import NotDeletedManager
+from data_importer.storage import get_local_path
 from organizations.models import Organization
 
 from superperms.orgs.models import Organization as SuperOrganization
@@ -808,6 +808,8 @@ class ImportFile(NotDeletableModel):
     source_type = models.CharField(
         null=True, blank=True, max_length=63,
     )
+    # Rows were mapped as they were parsed, without saving raw snapshots.
+    fused_import = models.BooleanField(default=False)
 
     def __unicode__(self):
         return "%s" % self.file.name
@@ -821,16 +823,15 @@ class ImportFile(NotDeletableModel):
             pass
             # If we're deleting.
 
+    @property
+    def local_path(self):
+        """Path to a local copy of ``file``, shared across import stages."""
+        return get_local_path(self.file)
+
     @property
     def local_file(self):
         if not hasattr(self, "_local_file"):
-            temp_file = tempfile.NamedTemporaryFile(mode='w+b', bufsize=1024, delete=False)
-            for chunk in self.file.chunks(1024):
-                temp_file.write(chunk)
-            temp_file.flush()
-            temp_file.close()
-            self.file.close()
-            self._local_file = open(temp_file.name, 'rU')
+            self._local_file = open(self.local_path, 'rU')
 
         self._local_file.seek(0)
         return self._local_file
@@ -0,0 +1,130 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Local, size-bounded cache of uploaded import files.
+
+Every import stage (raw save, first row caching, green button import) needs
+the uploaded file on local disk. Rather than each worker copying the file out
+of storage into its own temp file, stages share one local copy per file,
+keyed by the file's storage name. The least recently used copies are evicted
+once the cache grows beyond ``IMPORT_FILE_CACHE_MAX_BYTES``.
+
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+# Pull from storage in large reads; each S3 read is a ranged GET.
+CHUNK_SIZE = 8 * 1024 * 1024
+PARTIAL_SUFFIX = '.part'
+
+
+def _cache_dir():
+    cache_dir = getattr(
+        settings,
+        'IMPORT_FILE_CACHE_DIR',
+        os.path.join(tempfile.gettempdir(), 'seed_import_files')
+    )
+    if not os.path.isdir(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            # Another worker beat us to it.
+            if not os.path.isdir(cache_dir):
+                raise
+
+    return cache_dir
+
+
+def _cache_path(key):
+    """Makes a path like '/tmp/seed_import_files/<sha1 of key>'."""
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+
+    return os.path.join(_cache_dir(), hashlib.sha1(key).hexdigest())
+
+
+def evict(max_bytes=None, keep=None):
+    """Remove least recently used files until the cache fits in max_bytes.
+
+    :param max_bytes: int, (optional) size limit, defaults to the
+        ``IMPORT_FILE_CACHE_MAX_BYTES`` setting.
+    :param keep: str, (optional) path that should never be evicted, e.g. the
+        file we've just fetched.
+
+    """
+    if max_bytes is None:
+        max_bytes = getattr(
+            settings, 'IMPORT_FILE_CACHE_MAX_BYTES', 5 * 1024 ** 3
+        )
+
+    cache_dir = _cache_dir()
+    entries = []
+    total = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith(PARTIAL_SUFFIX):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Evicted by another process while we were looking.
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    # Oldest access first.
+    entries.sort()
+    for _mtime, size, path in entries:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def get_local_path(stored_file):
+    """Return the path of a local copy of a stored file, fetching if needed.
+
+    :param stored_file: FieldFile inst., e.g. ``ImportFile.file``.
+    :returns: str, path to a local file which may be shared between stages.
+        Callers should only ever read from it.
+
+    """
+    path = _cache_path(stored_file.name)
+    if os.path.exists(path):
+        # Touch the file so that eviction sees it as recently used.
+        try:
+            os.utime(path, None)
+            return path
+        except OSError:
+            # Evicted between our check and our touch; fetch it again.
+            pass
+
+    fd, partial_path = tempfile.mkstemp(
+        dir=_cache_dir(), suffix=PARTIAL_SUFFIX
+    )
+    try:
+        with os.fdopen(fd, 'wb') as partial:
+            for chunk in stored_file.chunks(CHUNK_SIZE):
+                partial.write(chunk)
+        # Atomic, so concurrent fetchers of the same file can't see a
+        # half-written copy; the last one to finish wins.
+        os.rename(partial_path, path)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    finally:
+        stored_file.close()
+
+    evict(keep=path)
+
+    return path
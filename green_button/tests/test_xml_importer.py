@@ -9,6 +9,7 @@ from data_importer.models import ImportRecord, ImportFile
 from seed.models import(
     BuildingSnapshot, CanonicalBuilding, TimeSeries, Meter
 )
+from seed import search
 import seed.models
 import xmltodict
 import copy
@@ -381,3 +382,17 @@ class GreenButtonXMLImportTests(TestCase):
         """
         xml_importer.import_xml(self.import_file)
         self.assert_models_created()
+
+    def test_import_xml_search(self):
+        """
+        Imported buildings can be found by the global search.
+        """
+        xml_importer.import_xml(self.import_file)
+        bs = BuildingSnapshot.objects.get(
+            address_line_1=sample_building_data['address']
+        )
+
+        results = search.search_buildings(
+            '635 elm cerrito', queryset=BuildingSnapshot.objects.all()
+        )
+        self.assertEqual(list(results), [bs])
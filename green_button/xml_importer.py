@@ -8,6 +8,7 @@ from seed.models import (
     TimeSeries,
     CanonicalBuilding,
     set_initial_sources,
+    save_promoted_values,
     GREEN_BUTTON_BS,
 )
 import seed.models
@@ -272,6 +273,7 @@ def create_models(data, import_file):
 
     raw_bs.canonical_building = cb
     raw_bs.save()
+    save_promoted_values([raw_bs])
 
     # log building creation
     AuditLog.objects.create(
@@ -331,9 +333,8 @@ def import_xml(import_file):
     green button xml file that has been previously uploaded
     :returns: the created CanonicalBuilding Inst.
     """
-    xml_file = import_file.local_file
-    xml_string = xml_file.read()
-    raw_data = xmltodict.parse(xml_string)
+    # Let expat stream the file rather than reading it into one string.
+    raw_data = xmltodict.parse(import_file.local_file)
 
     data = building_data(raw_data)
     return create_models(data, import_file)
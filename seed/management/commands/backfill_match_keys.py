@@ -0,0 +1,47 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Store the match keys of every BuildingSnapshot.
+
+Snapshots get ``match_key``, ``blocking_keys``, ``address_key`` and
+``identifier_keys`` whenever they're saved; this fills them in for
+snapshots made before they existed. Run it again after changing
+``MATCH_BLOCKING_KEYS``.
+
+Usage:
+    ./manage.py backfill_match_keys --batch-size=1000
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from seed.models import BuildingSnapshot, store_match_keys
+
+
+class Command(BaseCommand):
+    help = 'Stores the match keys of every building snapshot'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    help='Snapshots to update per transaction.',
+                    action='store',
+                    type='int',
+                    default=1000,
+                    dest='batch_size'),
+    )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pks = list(
+            BuildingSnapshot.objects.order_by('pk').values_list(
+                'pk', flat=True
+            )
+        )
+        for start in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                store_match_keys(pks[start:start + batch_size])
+            self.stdout.write('{0} of {1} snapshots done.'.format(
+                min(start + batch_size, len(pks)), len(pks)
+            ))
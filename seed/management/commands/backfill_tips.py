@@ -0,0 +1,45 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Store the tip of every BuildingSnapshot's tree.
+
+Merges, edits and unmatches keep ``tip_snapshot`` and ``is_tip`` up to date
+from then on; this fills them in for snapshots made before they existed.
+
+Usage:
+    ./manage.py backfill_tips --batch-size=1000
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from seed.models import BuildingSnapshot, store_tips
+
+
+class Command(BaseCommand):
+    help = 'Stores the tip of every building snapshot tree'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    help='Snapshots to update per transaction.',
+                    action='store',
+                    type='int',
+                    default=1000,
+                    dest='batch_size'),
+    )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pks = list(
+            BuildingSnapshot.objects.order_by('pk').values_list(
+                'pk', flat=True
+            )
+        )
+        for start in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                store_tips(pks[start:start + batch_size])
+            self.stdout.write('{0} of {1} snapshots done.'.format(
+                min(start + batch_size, len(pks)), len(pks)
+            ))
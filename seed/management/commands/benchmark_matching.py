@@ -0,0 +1,113 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Compare the precision and speed of matching engines on a labelled dataset.
+
+Usage:
+    ./manage.py benchmark_matching pairs.csv
+    ./manage.py benchmark_matching --synthetic=5000 --engines=ngram,tfidf \
+        --thresholds=0.3,0.4,0.5
+
+See ``seed.matching.benchmark.load_csv`` for the CSV format.
+"""
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from seed.matching import benchmark
+from seed.matching.engines import ENGINES
+
+
+def _format_rate(value):
+    return 'n/a' if value is None else '{0:.3f}'.format(value)
+
+
+class Command(BaseCommand):
+    args = '[<labelled CSV>]'
+    help = 'Benchmarks matching engines against known matches'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--synthetic',
+                    help='Make up a dataset of this many buildings instead'
+                         ' of loading one.',
+                    action='store',
+                    type='int',
+                    dest='synthetic'),
+        make_option('--seed',
+                    help='Random seed for the synthetic dataset.',
+                    action='store',
+                    type='int',
+                    dest='seed'),
+        make_option('--engines',
+                    help='Comma separated engines to run; all installed'
+                         ' engines by default.',
+                    action='store',
+                    type='string',
+                    dest='engines'),
+        make_option('--thresholds',
+                    help='Comma separated thresholds to score at;'
+                         ' MATCH_MIN_THRESHOLD by default.',
+                    action='store',
+                    type='string',
+                    dest='thresholds'),
+        make_option('--no-isolate',
+                    help="Run engines in this process; peak memory won't"
+                         ' be comparable.',
+                    action='store_false',
+                    default=True,
+                    dest='isolate'),
+    )
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            canonicals, unmatched = benchmark.synthetic_dataset(
+                options['synthetic'], seed=options['seed']
+            )
+        elif args:
+            with open(args[0], 'rU') as csv_file:
+                canonicals, unmatched = benchmark.load_csv(csv_file)
+        else:
+            raise CommandError('Give a labelled CSV file or --synthetic.')
+
+        if options['engines']:
+            names = options['engines'].split(',')
+            for name in names:
+                if name not in ENGINES:
+                    raise CommandError('Unknown engine {0}.'.format(name))
+                if name not in benchmark.available_engines():
+                    raise CommandError(
+                        'Engine {0} is not installed, or needs the'
+                        ' database.'.format(name)
+                    )
+        else:
+            names = benchmark.available_engines()
+
+        if options['thresholds']:
+            thresholds = [float(t) for t in options['thresholds'].split(',')]
+        else:
+            thresholds = [settings.MATCH_MIN_THRESHOLD]
+
+        self.stdout.write('{0} canonical buildings, {1} to match.'.format(
+            len(canonicals), len(unmatched)
+        ))
+        reports = benchmark.benchmark(
+            names, canonicals, unmatched, thresholds,
+            isolate=options['isolate'],
+        )
+        for report in reports:
+            self.stdout.write(
+                '\n{engine}: setup {setup_time:.2f}s, matching'
+                ' {match_time:.2f}s, {buildings_per_sec:.0f} buildings/s,'
+                ' {pairs_per_sec:.0f} pairs/s, peak memory +{peak_memory}'
+                ' KiB'.format(**report)
+            )
+            for threshold, precision, recall in report['scores']:
+                self.stdout.write(
+                    '  threshold {0}: precision {1}, recall {2}'.format(
+                        threshold,
+                        _format_rate(precision),
+                        _format_rate(recall),
+                    )
+                )
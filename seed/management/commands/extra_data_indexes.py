@@ -0,0 +1,113 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Index the extra_data keys orgs search on the most, and drop the indexes
+on keys which have gone quiet. See ``seed.utils.extra_data_indexes``.
+
+Usage:
+    ./manage.py extra_data_indexes --dry-run
+    ./manage.py extra_data_indexes --min-queries=50 --max-per-org=5
+    ./manage.py extra_data_indexes --report
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from seed.utils import extra_data_indexes
+
+
+def _seconds(value):
+    return '-' if value is None else '{0:.3f}s'.format(value)
+
+
+class Command(BaseCommand):
+    help = 'Creates and drops indexes on busy extra_data keys'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--min-queries',
+                    help='Filters on a key before it is indexed.',
+                    action='store',
+                    type='int',
+                    default=extra_data_indexes.MIN_QUERIES,
+                    dest='min_queries'),
+        make_option('--min-seconds',
+                    help='Average search time before a key is indexed.',
+                    action='store',
+                    type='float',
+                    default=extra_data_indexes.MIN_SECONDS_PER_QUERY,
+                    dest='min_seconds'),
+        make_option('--idle-days',
+                    help='Days an index may go under --min-queries filters '
+                         'before it is dropped.',
+                    action='store',
+                    type='int',
+                    default=extra_data_indexes.IDLE_DAYS,
+                    dest='idle_days'),
+        make_option('--max-per-org',
+                    help='Most indexes to keep for an org.',
+                    action='store',
+                    type='int',
+                    default=extra_data_indexes.MAX_INDEXES_PER_ORG,
+                    dest='max_per_org'),
+        make_option('--dry-run',
+                    help='Only say which indexes would change.',
+                    action='store_true',
+                    default=False,
+                    dest='dry_run'),
+        make_option('--report',
+                    help='Only report the time the indexes have saved.',
+                    action='store_true',
+                    default=False,
+                    dest='report'),
+    )
+
+    def handle(self, *args, **options):
+        if not options['report']:
+            self.advise(options)
+        self.report()
+
+    def advise(self, options):
+        to_create, to_drop = extra_data_indexes.advise(
+            min_queries=options['min_queries'],
+            min_seconds=options['min_seconds'],
+            idle_days=options['idle_days'],
+            max_per_org=options['max_per_org'],
+        )
+        for usage in to_drop:
+            self.stdout.write(u'Dropping {0} for org {1}: {2}'.format(
+                usage.index_name, usage.organization_id, usage.key
+            ))
+            if not options['dry_run']:
+                extra_data_indexes.drop_key_index(usage)
+        for usage in to_create:
+            self.stdout.write(
+                u'Indexing org {0}: {1} ({2} filters, {3} each)'.format(
+                    usage.organization_id,
+                    usage.key,
+                    usage.filter_count,
+                    _seconds(usage.seconds_per_query),
+                )
+            )
+            if not options['dry_run']:
+                extra_data_indexes.create_key_index(usage)
+
+    def report(self):
+        rows = extra_data_indexes.report()
+        if not rows:
+            self.stdout.write('No extra_data keys are indexed.')
+            return
+        total = 0
+        for row in rows:
+            self.stdout.write(
+                u'Org {organization_id}: {key} ({index_name}), {queries} '
+                u'searches at {after} each, down from {before}; '
+                u'{saved} saved.'.format(
+                    after=_seconds(row['seconds_per_query']),
+                    before=_seconds(row['seconds_per_query_before']),
+                    saved=_seconds(row['seconds_saved']),
+                    **row
+                )
+            )
+            total += row['seconds_saved'] or 0
+        self.stdout.write('{0} saved in all.'.format(_seconds(total)))
@@ -0,0 +1,70 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Promote an org's numeric or date extra_data column, so that range searches
+on it use typed, indexed values. See ``seed.utils.promoted_columns``.
+
+Usage:
+    ./manage.py promote_column --org=1 --column='Site EUI (kBtu/ft2)'
+    ./manage.py promote_column --org=1 --column='Site EUI (kBtu/ft2)' --demote
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seed.models import Column
+from seed.utils.promoted_columns import (
+    demote_column, is_promotable, promote_column
+)
+
+
+class Command(BaseCommand):
+    help = 'Promotes or demotes an extra_data column of an org'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--org',
+                    help='The ID of the org.',
+                    action='store',
+                    type='int',
+                    dest='org_id'),
+        make_option('--column',
+                    help='The name of the extra_data column.',
+                    action='store',
+                    dest='column_name'),
+        make_option('--demote',
+                    help='Stop promoting the column.',
+                    action='store_true',
+                    default=False,
+                    dest='demote'),
+        make_option('--batch-size',
+                    help='Snapshots to fill in per transaction.',
+                    action='store',
+                    type='int',
+                    default=1000,
+                    dest='batch_size'),
+    )
+
+    def handle(self, *args, **options):
+        if not options['org_id'] or not options['column_name']:
+            raise CommandError('Give an --org and a --column.')
+        try:
+            column = Column.objects.select_related('unit').get(
+                organization_id=options['org_id'],
+                column_name=options['column_name'],
+                is_extra_data=True,
+            )
+        except Column.DoesNotExist:
+            raise CommandError('The org has no such extra_data column.')
+
+        if options['demote']:
+            demote_column(column)
+            self.stdout.write(u'Demoted {0}.'.format(column))
+            return
+
+        if not is_promotable(column):
+            raise CommandError('Only numeric and date columns can be promoted.')
+        promote_column(column, batch_size=options['batch_size'])
+        self.stdout.write(u'Promoted {0}: {1} values.'.format(
+            column, column.promoted_values.count()
+        ))
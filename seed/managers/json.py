@@ -21,12 +21,37 @@ Query JSON data from Postgres JsonFields.
         'Property Type', cond='LIKE', value='CONDO'
     ).filter(id__gt=1).count()
 
+    # Ordering by a key happens in SQL, so the result is still a queryset.
+    BuildingSnapshot.objects.json_query(
+        'Site EUI', order_by='Site EUI', order_by_rev=True, unit=unit
+    )[:25]
+
+Key existence and exact text matches are written as ``?`` and ``@>``
+filters, which the GIN index on ``BuildingSnapshot.extra_data`` serves.
+
 """
+from collections import OrderedDict
+import json
 
 from django.db.models import Manager
 from django.db.models.query import QuerySet
 
 FIELD_TEMPL = "({0}->>{1}"
+# Key existence and containment, which the GIN index on a jsonb column
+# can answer.
+HAS_KEY_TEMPL = "{0} ? %s"
+CONTAINS_TEMPL = "{0} @> %s"
+# The value of a key, with blanks as NULL so they sort with missing values.
+ORDER_TEMPL = "NULLIF({0}->>%s, '')"
+# The value of a key as a float, for both ``%s`` the key. Only values which
+# look like numbers are cast; a stray 'Not Available' would otherwise fail
+# the whole query. Expression indexes on a key (see
+# ``seed.utils.extra_data_indexes``) use this exact expression, so keep
+# them in step.
+NUMBER_REGEX = r"'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$'"
+NUMBER_TEMPL = (
+    "(CASE WHEN ({0}->>%s) ~ " + NUMBER_REGEX + " THEN ({0}->>%s)::float END)"
+)
 KEY_CAST_TO_TYPE = {
     'text': str,
     'float': float,
@@ -44,8 +69,16 @@ class JsonQuerySet(QuerySet):
     def __init__(self, primary=None, *args, **kwargs):
         self.primary = primary or 'extra_data'
         self.table = kwargs.get('table', 'seed_buildingsnapshot')
+        # (usage, key, key_cast) of each key queried, for the index advisor;
+        # usage is 'filter' or 'sort'.
+        self.json_keys = []
         return super(JsonQuerySet, self).__init__(*args, **kwargs)
 
+    def _clone(self, *args, **kwargs):
+        clone = super(JsonQuerySet, self)._clone(*args, **kwargs)
+        clone.json_keys = list(self.json_keys)
+        return clone
+
     def _build_extra(self, key, cond, value, key_cast, excludes, **kwargs):
         """Builds the parameters for Django Obj Manager's extra func.
 
@@ -81,6 +114,11 @@ class JsonQuerySet(QuerySet):
                     cond)
                 )
                 value = value.lower()
+            elif key_cast == 'float':
+                where.append('{0} {1} %s'.format(
+                    NUMBER_TEMPL.format(self.primary), cond
+                ))
+                params.extend([key, key])
             else:
                 where.append(FIELD_TEMPL.format(
                     self.primary, "'{0}'){1} {2} %s".format(key, cast, cond)
@@ -90,6 +128,64 @@ class JsonQuerySet(QuerySet):
 
         return {'where': where, 'params': params}
 
+    def _column(self, field):
+        return '"{0}"."{1}"'.format(self.model._meta.db_table, field)
+
+    def _build_containment(self, key, value, field):
+        """Containment filters which find every row where ``key`` = ``value``.
+
+        ``->>`` gives text, so '12' equals both the string "12" and the
+        number 12; we look for either, and let the ``->>`` condition
+        weed out the rest. Only for exact, case sensitive text matches.
+
+        :returns: dict, like ``_build_extra``'s.
+        """
+        docs = [{key: value}]
+        try:
+            number = json.loads(value)
+        except ValueError:
+            number = None
+        # NaN and Infinity aren't JSON.
+        if (isinstance(number, (int, long, float)) and number == number and
+                abs(number) != float('inf')):
+            docs.append({key: number})
+
+        contains = CONTAINS_TEMPL.format(self._column(field))
+        return {
+            'where': ['({0})'.format(' OR '.join([contains] * len(docs)))],
+            'params': [json.dumps(doc) for doc in docs],
+        }
+
+    def _order_by_key(self, key, field, unit_type, reverse=False):
+        """Orders by the value of a json key, cast for its unit type.
+
+        Numeric units sort as numbers, everything else as text. Rows
+        without a value for the key sort first, or last when reversed, and
+        ties are broken by pk so pages are stable.
+
+        """
+        from seed.models import FLOAT, DECIMAL
+
+        if unit_type in (FLOAT, DECIMAL):
+            value = NUMBER_TEMPL.format(self._column(field))
+            params = [key, key]
+        else:
+            value = ORDER_TEMPL.format(self._column(field))
+            params = [key]
+
+        select = OrderedDict([
+            ('_json_order_null', '{0} IS NULL'.format(value)),
+            ('_json_order', value),
+        ])
+        if reverse:
+            order_by = ['_json_order_null', '-_json_order', 'pk']
+        else:
+            order_by = ['-_json_order_null', '_json_order', 'pk']
+
+        return self.extra(
+            select=select, select_params=params + params, order_by=order_by
+        )
+
     def json_query(self, key, value=None, cond=None,
                    key_cast='text', unit=None, **kw):
         """Query JSONField data using simplified syntax.
@@ -100,10 +196,11 @@ class JsonQuerySet(QuerySet):
         :param field: str, if you'd like to override the ``self.primary``.
         :param order_by: str (optional), name of a key you want to order_by.
         :param order_by_rev: boolean (optional), whether to reverse or not.
+        :param unit: Unit inst. (optional), the unit of the ``order_by`` key;
+            float and decimal keys are ordered as numbers, others as text.
+        :returns: queryset, still lazy when ordered.
         """
-        from seed.models import (
-            FLOAT, DECIMAL, STRING
-        )
+        from seed.models import DECIMAL, FLOAT, STRING
 
         unit_type = STRING
         if unit:
@@ -130,41 +227,27 @@ class JsonQuerySet(QuerySet):
                 )
             )
 
-        # Sub-optimal implementation detected: Warning:
-        # We're going to materialize all of these rows to do sorting.'
-        # Obviously this is terrible, but there's no way to do an
-        # order_by on a  non-field (i.e. non-named column) in Django.
-        #"ORDER BY NULLIF({primary}->>%s, '')::{key_cast}" is the SQL
-        # we'd use if Django allowed it.
+        if (cond == '=' and key_cast in (None, 'text') and
+                isinstance(value, basestring) and
+                not kw.get('case_insensitive')):
+            qs = qs.extra(**self._build_containment(key, value, field))
+        elif not cond or not excludes:
+            # Restrict the number of rows we look at to those with the key.
+            qs = qs.extra(
+                where=[HAS_KEY_TEMPL.format(self._column(field))],
+                params=[key],
+            )
 
-        # Perhaps in Django 1.7 and its custom field definitions,
-        # this will be easily doable.
-        if not cond or not excludes:
-            # Restrict the number of rows we materialize
-            qs = qs.filter(**{'{0}__contains'.format(field): key})
+        if cond:
+            qs.json_keys.append(('filter', key, key_cast or 'text'))
 
         if order_by:
-            qs = list(qs)
-
-            def safe_cast(cast_fn, val):
-                try:
-                    return cast_fn(val)
-                except TypeError:
-                    return val
-
-            def get_field(x):
-                return getattr(x, self.primary).get(order_by, None)
-
-            key_fns = {
-                STRING: get_field,
-                FLOAT: lambda x: safe_cast(float, get_field(x)),
-                DECIMAL: lambda x: safe_cast(float, get_field(x)),
-            }
-
-            qs.sort(
-                key=key_fns.get(unit_type, get_field),
-                reverse=order_by_rev,
-            )
+            qs = qs._order_by_key(order_by, field, unit_type, order_by_rev)
+            qs.json_keys.append((
+                'sort',
+                order_by,
+                'float' if unit_type in (FLOAT, DECIMAL) else 'text',
+            ))
 
         return qs
 
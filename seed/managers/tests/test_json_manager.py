@@ -1,6 +1,7 @@
+from django.db.models.query import QuerySet
 from django.test import TestCase
 
-from seed.models import BuildingSnapshot
+from seed.models import BuildingSnapshot, Unit, FLOAT
 
 
 class TestJsonManager(TestCase):
@@ -11,18 +12,42 @@ class TestJsonManager(TestCase):
         self.model.save()
 
     def test_contains(self):
-        """If nothing else, check containment for partial key value."""
-        # Testing partial matches.
-        qs = BuildingSnapshot.objects.all().json_query('super')
+        """If nothing else, check that the key exists."""
+        qs = BuildingSnapshot.objects.all().json_query('superdata')
         self.assertEqual(len(qs), 1)
         self.assertEqual(qs.first(), self.model)
 
+        # Keys have to match exactly.
+        self.assertEqual(
+            BuildingSnapshot.objects.all().json_query('super').count(), 0
+        )
+
         # Testing no matches.
         no_match_count = BuildingSnapshot.objects.all().json_query(
             'noooope'
         ).count()
         self.assertEqual(no_match_count, 0)
 
+    def test_equality_containment(self):
+        """Exact matches find string and number values alike."""
+        b = BuildingSnapshot.objects.create()
+        b.extra_data = {'ratio': '0.43'}
+        b.save()
+        b = BuildingSnapshot.objects.create()
+        b.extra_data = {'ratio': '0.430'}
+        b.save()
+
+        qs = BuildingSnapshot.objects.all().json_query('ratio', value='0.43')
+
+        self.assertEqual(qs.count(), 2)
+        self.assertNotIn('0.430', [s.extra_data['ratio'] for s in qs])
+        self.assertEqual(
+            BuildingSnapshot.objects.all().json_query(
+                'superdata', value='always here'
+            ).get(),
+            self.model
+        )
+
     def test_no_key(self):
         """We safely return an empty QS if nothing is queried."""
         self.assertListEqual(
@@ -160,6 +185,47 @@ class TestJsonManager(TestCase):
         self.assertEqual(buildings4[0].extra_data['counter'], '1001')
         self.assertEqual(buildings4[1].extra_data['counter'], '10')
 
+    def test_order_by_unit(self):
+        """Numeric units order as numbers in SQL, and stay a queryset."""
+        for value in ['9', '10.5', '', 'Not Available', '-2']:
+            b = BuildingSnapshot.objects.create(source_type=3)
+            b.extra_data = {'eui': value}
+            b.save()
+
+        unit = Unit.objects.create(unit_name='kBtu', unit_type=FLOAT)
+        qs = BuildingSnapshot.objects.all().json_query(
+            'eui', order_by='eui', unit=unit
+        )
+
+        self.assertIsInstance(qs, QuerySet)
+        values = [b.extra_data['eui'] for b in qs]
+        # Blanks and non-numbers sort with missing values, first.
+        self.assertItemsEqual(values[:2], ['', 'Not Available'])
+        self.assertListEqual(values[2:], ['-2', '9', '10.5'])
+
+        qs = BuildingSnapshot.objects.all().json_query(
+            'eui', order_by='eui', order_by_rev=True, unit=unit
+        )
+        self.assertListEqual(
+            [b.extra_data['eui'] for b in qs[:3]], ['10.5', '9', '-2']
+        )
+        self.assertEqual(qs.count(), 5)
+
+    def test_json_keys(self):
+        """The keys queried are kept on the queryset for the index advisor."""
+        unit = Unit.objects.create(unit_name='kBtu', unit_type=FLOAT)
+        qs = BuildingSnapshot.objects.all().json_query(
+            'ratio', cond='>', value='.2', key_cast='float'
+        ).json_query(
+            'eui', order_by='eui', unit=unit
+        ).filter(pk__gt=0)
+
+        self.assertListEqual(qs.json_keys, [
+            ('filter', 'ratio', 'float'),
+            ('sort', 'eui', 'float'),
+        ])
+        self.assertListEqual(BuildingSnapshot.objects.all().json_keys, [])
+
     def test_case_insensitive(self):
         """Make sure that we do case insensitive comparisons."""
 
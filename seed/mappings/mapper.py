@@ -36,6 +36,61 @@ def save_variant(snapshot, attr, attribute_values):
     return variant
 
 
+def save_variants(snapshot_variants):
+    """Save the variants of many new snapshots at once; see ``save_variant``.
+
+    Like ``save_variant``, options are shared between variants by value and
+    source, and an option only joins the variant it was first created for.
+
+    :param snapshot_variants: list of (snapshot, attr, attribute_values)
+        tuples. The snapshots must not have any variants yet.
+    :rtype list of BuildingAttributeVariant insts.
+
+    """
+    if not snapshot_variants:
+        return []
+
+    variants = []
+    options = []
+    variant_pks = models.reserve_ids(
+        models.BuildingAttributeVariant, len(snapshot_variants)
+    )
+    for pk, (snapshot, attr, attribute_values) in zip(
+        variant_pks, snapshot_variants
+    ):
+        variant = models.BuildingAttributeVariant(
+            pk=pk, field_name=attr, building_snapshot=snapshot
+        )
+        variants.append(variant)
+        for data_set in attribute_values:
+            if attribute_values[data_set] is None:
+                continue
+            options.append((
+                variant,
+                unicode(attribute_values[data_set]),
+                get_source_id(data_set, attr),
+            ))
+
+    existing = set(models.AttributeOption.objects.filter(
+        value__in=set(value for _variant, value, _source in options)
+    ).values_list('value', 'value_source'))
+    new_options = []
+    for variant, value, data_source_id in options:
+        if (value, data_source_id) in existing:
+            continue
+        existing.add((value, data_source_id))
+        new_options.append(models.AttributeOption(
+            value=value,
+            value_source=data_source_id,
+            building_variant=variant,
+        ))
+
+    models.BuildingAttributeVariant.objects.bulk_create(variants)
+    models.AttributeOption.objects.bulk_create(new_options)
+
+    return variants
+
+
 def get_attr_source(field_values, value):
     """Return the first dictionary key that contains a value."""
     return (k for k, v in field_values.items() if v == value).next()
@@ -48,7 +103,12 @@ def get_source_id(source_inst, attr):
     # painstakingly copy whatever the original reference to this field
     # out of the BS and into the BuildingAttributeVariant.
     if isinstance(source_inst, models.BuildingSnapshot):
-        source_inst = getattr(source_inst, '{0}_source'.format(attr))
+        source_field = '{0}_source'.format(attr)
+        if getattr(source_inst, '{0}_id'.format(source_field), None):
+            # Sources are always BuildingSnapshots; don't fetch one just to
+            # find that out.
+            return getattr(models, 'BuildingSnapshot_SOURCE', default)
+        source_inst = getattr(source_inst, source_field)
 
     return getattr(
         models, '{0}_SOURCE'.format(source_inst.__class__.__name__), default
@@ -87,21 +147,21 @@ def merge_extra_data(b1, b2, default=None):
     return extra_data, extra_data_sources
 
 
-def merge_building(
-    snapshot, b1, b2, can_attrs, conf, default=None, match_type=None
-):
-    """Set attributes on our Canonical model, saving differences.
+def merge_attributes(snapshot, b1, b2, can_attrs, default=None):
+    """Set merged attribute values on a snapshot, without saving anything.
 
     :param snapshot: BuildingSnapshot model inst.
     :param b1: BuildingSnapshot model inst. Left parent.
     :param b2: BuildingSnapshot model inst. Right parent.
     :param can_attrs: dict of dicts, {'attr_name': {'dataset1': 'value'...}}.
     :param default: (optional), which dataset's value to default to.
-    :rtype BuildingSnapshot inst(``snapshot``), updated.
+    :rtype list of (attr, dict) tuples, the attributes with differing values
+        and their values from each dataset, to be saved with
+        ``save_variant``.
 
     """
     default = default or b1
-    match_type = match_type or models.SYSTEM_MATCH
+    variants = []
     for attr in can_attrs:
         # Do we have any differences between these fields?
         attr_values = list(set([
@@ -114,7 +174,7 @@ def merge_building(
             # If we have more than one value for this field,
             # save each of the field options in the DB,
             # but opt for the default when there is a difference.
-            save_variant(snapshot, attr, can_attrs[attr])
+            variants.append((attr, can_attrs[attr]))
             attr_source = default
             attr_value = can_attrs[attr][default]
 
@@ -141,6 +201,28 @@ def merge_building(
     snapshot.extra_data, snapshot.extra_data_sources = merge_extra_data(
         b1, b2, default=default
     )
+
+    return variants
+
+
+def merge_building(
+    snapshot, b1, b2, can_attrs, conf, default=None, match_type=None
+):
+    """Set attributes on our Canonical model, saving differences.
+
+    :param snapshot: BuildingSnapshot model inst.
+    :param b1: BuildingSnapshot model inst. Left parent.
+    :param b2: BuildingSnapshot model inst. Right parent.
+    :param can_attrs: dict of dicts, {'attr_name': {'dataset1': 'value'...}}.
+    :param default: (optional), which dataset's value to default to.
+    :rtype BuildingSnapshot inst(``snapshot``), updated.
+
+    """
+    match_type = match_type or models.SYSTEM_MATCH
+    variants = merge_attributes(snapshot, b1, b2, can_attrs, default)
+    for attr, attribute_values in variants:
+        save_variant(snapshot, attr, attribute_values)
+
     snapshot.match_type = match_type
     snapshot.source_type = models.COMPOSITE_BS
     canonical_building = models.get_or_create_canonical(b1, b2)
@@ -1,55 +1,55 @@
 """
 :copyright: (c) 2014 Building Energy Inc
 """
-import regex
-
 from django.db.models import Q
 
+from seed.utils.address import identifier_keys, normalize_address
+
 #
 ## For Reconciliation between data sets.
 ###
 
-ADDRESS_REGEX = r'(\d*)(?:\s(\w+))+'
-
+def build_address_q(address, b_attr):
+    """Build a Q object for buildings at the same address.
 
-def break_up_address(address):
-    """Return a list of strings, breaking up address num and st. name.
+    Compares ``BuildingSnapshot.address_key``, the normalized address, so
+    '123 North Main Street' finds '123 N. Main St.' with an index scan.
 
-    "1232 Harris Blvd." -> [1232, ['Harris', 'Blvd.']]
-    "23 SE Double Phantom St." -> [23, ['SE', 'Double' 'Phantom', 'St.']]
+    :param address: str, the full address.
+    :param b_attr: str, the address attribute compared for confidence;
+        ``address_key`` is normalized from ``address_line_1``.
+    :rtype Q: Returns a Q object for the address's key, or an empty one if
+        there's no address.
 
     """
-    reg = regex.match(ADDRESS_REGEX, address)
-    if not reg:
-        # If we don't see any address information send on the street name.
-        return None, address.split(' ')
+    address_key = normalize_address(address)
+    if address_key is None:
+        return Q()
 
-    return reg.captures(1)[0], reg.captures(2)
+    return Q(address_key=address_key)
 
 
-def build_address_q(address, b_attr):
-    """Build a Q(street number) AND (Q(street name) OR Q(quadrant)) Q object.
+def build_id_q(value, b_attr):
+    """Build a Q object for buildings with an ID in any of their ID fields.
 
-    :param address: str, the full address.
-    :param b_attr: str, the attribute name you're going to query against.
-    :rtype Q: Returns a Q object that queries for the street number
-        and any other string data from the address field.
+    Matches the stored ID keys (see
+    ``seed.matching.identifiers.filter_by_ids``), so a PM property id which
+    some other file put in ``tax_lot_id`` is still found.
 
-    """
-    street_num, street_ids = break_up_address(address)
-    address_q = Q()
-    street_info_q = Q()
-    if street_num:
-        address_q = Q(**{'{0}__icontains'.format(b_attr): street_num})
+    :param value: the ID.
+    :param b_attr: str, the ID attribute compared for confidence.
+    :rtype Q: Returns a Q object, empty if there's no ID.
 
-    # Because we don't know which parts are ommitted, we OR these.
-    for street_id in street_ids:
-        street_info_q |= Q(**{'{0}__icontains'.format(b_attr): street_id})
+    """
+    from seed.matching.identifiers import filter_by_ids
+    from seed.models import BuildingSnapshot
 
-    # AND with the street number, which should probably be accurate.
-    address_q &= street_info_q
+    if not identifier_keys([value]):
+        return Q()
 
-    return address_q
+    return Q(pk__in=filter_by_ids(
+        BuildingSnapshot.objects.all(), [value]
+    ).values('pk'))
 
 
 # Mapping from PM data.
@@ -66,3 +66,12 @@ FIRST_PASS_ASSESSEDBUILDING = (
     ((build_address_q, 'address_line_1'), 'address_line_1'),
     ('address_line_2', 'address_line_2'),
 )
+
+# Mapping between BuildingSnapshots.
+FIRST_PASS_BUILDINGSNAPSHOT = (
+    ((build_id_q, 'pm_property_id'), 'pm_property_id'),
+    ((build_id_q, 'tax_lot_id'), 'tax_lot_id'),
+    ((build_id_q, 'custom_id_1'), 'custom_id_1'),
+    ('property_name', 'property_name'),
+    ((build_address_q, 'address_line_1'), 'address_line_1'),
+)
@@ -0,0 +1,315 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Offline precision and throughput benchmarks of matching engines.
+
+A labelled dataset is a list of canonical buildings and a list of buildings
+to match, each labelled with the canonical building it should match, if
+any. Datasets are loaded from CSV or made up with SEEDFactory's random
+values, matched in memory without touching the database, and scored at
+each of several thresholds.
+
+"""
+import csv
+import multiprocessing
+import random
+import resource
+import time
+
+from seed.factory import SEEDFactory
+from seed.matching.blocking import BLOCKING_FIELDS, blocking_keys
+from seed.matching.engines import ENGINES
+from seed.matching.ngrams import MATCH_FIELDS, MatchIndex, stringify
+
+# match_id of buildings which shouldn't match anything.
+NO_MATCH = 'none'
+# Spelling variations made in synthetic buildings to match.
+SUFFIX_VARIANTS = {
+    'Street': 'St.',
+    'Avenue': 'Ave',
+    'Road': 'Rd',
+    'Boulevard': 'Blvd.',
+    'Drive': 'Dr',
+    'Lane': 'Ln',
+    'Court': 'Ct',
+}
+
+
+class Building(object):
+    """A building in a labelled dataset.
+
+    :param building_id: str, the building's ID in the dataset.
+    :param values: dict, field name: value, of MATCH_FIELDS and
+        BLOCKING_FIELDS.
+    :param match_id: (optional) str, ID of the canonical building this one
+        should match; None for canonical buildings and buildings which
+        shouldn't match anything.
+
+    """
+
+    def __init__(self, building_id, values, match_id=None):
+        self.building_id = building_id
+        self.values = values
+        self.match_id = match_id
+
+    def match_values(self):
+        return [self.values.get(field) for field in MATCH_FIELDS]
+
+    def blocking_values(self):
+        return [self.values.get(field) for field in BLOCKING_FIELDS]
+
+
+def load_csv(csv_file):
+    """Load a labelled dataset from a CSV file.
+
+    Every row has an ``id`` and a ``match_id`` column, along with any of
+    MATCH_FIELDS and BLOCKING_FIELDS. Rows with an empty ``match_id`` are
+    canonical buildings. The rest are buildings to match, whose ``match_id``
+    is the ``id`` of the canonical building they should match, or 'none'.
+
+    :param csv_file: file-like object.
+    :returns: tuple of (canonical buildings, buildings to match), lists of
+        Building insts.
+
+    """
+    fields = set(MATCH_FIELDS) | set(BLOCKING_FIELDS)
+    canonicals, unmatched = [], []
+    for row in csv.DictReader(csv_file):
+        values = dict(
+            (field, value) for field, value in row.items()
+            if field in fields and value
+        )
+        match_id = (row.get('match_id') or '').strip()
+        if not match_id:
+            canonicals.append(Building(row['id'], values))
+        elif match_id.lower() == NO_MATCH:
+            unmatched.append(Building(row['id'], values))
+        else:
+            unmatched.append(Building(row['id'], values, match_id))
+
+    return canonicals, unmatched
+
+
+def _misspell(rand, value):
+    """Drop or swap a character, as a typo would."""
+    if len(value) < 4:
+        return value
+    i = rand.randint(1, len(value) - 2)
+    if rand.random() < 0.5:
+        return value[:i] + value[i + 1:]
+
+    return value[:i] + value[i + 1] + value[i] + value[i + 2:]
+
+
+def _vary_address(rand, address):
+    """A differently written version of the same address."""
+    for suffix, variant in SUFFIX_VARIANTS.items():
+        if address.endswith(suffix) and rand.random() < 0.5:
+            address = address[:-len(suffix)] + variant
+            break
+    if rand.random() < 0.5:
+        address = _misspell(rand, address)
+    if rand.random() < 0.2:
+        address = '{0} Suite {1}'.format(address, rand.randint(1, 400))
+    if rand.random() < 0.3:
+        address = address.upper()
+
+    return address
+
+
+def _random_values():
+    return {
+        'tax_lot_id': SEEDFactory.rand_str(length=12),
+        'address_line_1': SEEDFactory.rand_street_address(),
+        'city': SEEDFactory.rand_city(),
+        'postal_code': str(SEEDFactory.rand_int(43214, 97214)),
+    }
+
+
+def synthetic_dataset(size, match_rate=0.7, seed=None):
+    """Make up a labelled dataset of random buildings.
+
+    ``size`` buildings are canonical, and ``size`` are to be matched.
+    ``match_rate`` of those are versions of canonical buildings with their
+    address written differently and half of them without a tax lot ID; the
+    rest are new buildings.
+
+    :returns: tuple of (canonical buildings, buildings to match), lists of
+        Building insts.
+
+    """
+    # SEEDFactory uses the random module's generator.
+    random.seed(seed)
+    rand = random.Random(seed)
+    canonicals = [
+        Building(str(i), _random_values()) for i in range(size)
+    ]
+    unmatched = []
+    for i in range(size):
+        building_id = 'u{0}'.format(i)
+        if rand.random() >= match_rate:
+            unmatched.append(Building(building_id, _random_values()))
+            continue
+
+        canonical = rand.choice(canonicals)
+        values = dict(canonical.values)
+        values['address_line_1'] = _vary_address(
+            rand, values['address_line_1']
+        )
+        if rand.random() < 0.5:
+            del values['tax_lot_id']
+        unmatched.append(
+            Building(building_id, values, canonical.building_id)
+        )
+
+    return canonicals, unmatched
+
+
+def build_index(canonicals, key_names=None):
+    """A MatchIndex of a dataset's canonical buildings.
+
+    The canonical snapshot PK of each building is its dataset ID.
+
+    """
+    index = MatchIndex(key_names)
+    for canon_pk, building in enumerate(canonicals):
+        index.add(
+            canon_pk,
+            building.building_id,
+            building.match_values(),
+            building.blocking_values(),
+        )
+
+    return index
+
+
+def score(predictions, unmatched, threshold):
+    """Precision and recall of an engine's best matches at a threshold.
+
+    :param predictions: list of (canonical building ID, similarity), or
+        (None, None), for each building in ``unmatched``.
+    :returns: tuple of (precision, recall), floats. Either is None when
+        there was nothing to divide by.
+
+    """
+    true_pos = false_pos = false_neg = 0
+    for (match_id, similarity), building in zip(predictions, unmatched):
+        if match_id is not None and similarity < threshold:
+            match_id = None
+        if match_id is not None:
+            if match_id == building.match_id:
+                true_pos += 1
+            else:
+                false_pos += 1
+        if building.match_id is not None and match_id != building.match_id:
+            false_neg += 1
+
+    precision = recall = None
+    if true_pos + false_pos:
+        precision = float(true_pos) / (true_pos + false_pos)
+    if true_pos + false_neg:
+        recall = float(true_pos) / (true_pos + false_neg)
+
+    return precision, recall
+
+
+def _max_rss():
+    """The process's peak resident memory, in KiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_engine(name, canonicals, unmatched, thresholds, key_names=None):
+    """Benchmark one engine against a labelled dataset.
+
+    :param name: str, name of a registered engine.
+    :param thresholds: list of float, the thresholds to score at.
+    :returns: dict of results; ``scores`` is a list of (threshold,
+        precision, recall) tuples, and ``peak_memory`` is how far matching
+        raised the process's peak memory, in KiB.
+
+    """
+    rss_before = _max_rss()
+    start = time.time()
+    index = build_index(canonicals, key_names)
+    engine = ENGINES[name](index)
+    setup_time = time.time() - start
+
+    match_strings = [stringify(b.match_values()) for b in unmatched]
+    keys_list = [
+        blocking_keys(b.blocking_values(), index.key_names)
+        for b in unmatched
+    ]
+    start = time.time()
+    all_results = engine.search_many(
+        match_strings, min(thresholds), keys_list
+    )
+    match_time = time.time() - start
+
+    predictions = []
+    for results, keys in zip(all_results, keys_list):
+        if results:
+            match_string, similarity = results[0]
+            predictions.append(
+                (index.get_snapshot(match_string, keys), similarity)
+            )
+        else:
+            predictions.append((None, None))
+
+    num_pairs = len(canonicals) * len(unmatched)
+    return {
+        'engine': name,
+        'setup_time': setup_time,
+        'match_time': match_time,
+        'buildings_per_sec': len(unmatched) / (match_time or 1e-9),
+        'pairs_per_sec': num_pairs / (match_time or 1e-9),
+        'peak_memory': _max_rss() - rss_before,
+        'scores': [
+            (threshold,) + score(predictions, unmatched, threshold)
+            for threshold in sorted(thresholds)
+        ],
+    }
+
+
+def _run_engine_in_child(queue, *args):
+    queue.put(run_engine(*args))
+
+
+def benchmark(names, canonicals, unmatched, thresholds, key_names=None,
+              isolate=True):
+    """Benchmark several engines against a labelled dataset.
+
+    :param names: list of str, names of registered engines.
+    :param isolate: bool, run each engine in its own process, so that peak
+        memory use isn't hidden by what earlier engines used.
+    :returns: list of dicts, the ``run_engine`` results of each engine.
+
+    """
+    reports = []
+    for name in names:
+        args = (name, canonicals, unmatched, thresholds, key_names)
+        if not isolate:
+            reports.append(run_engine(*args))
+            continue
+
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_run_engine_in_child, args=(queue,) + args
+        )
+        process.start()
+        reports.append(queue.get())
+        process.join()
+
+    return reports
+
+
+def available_engines():
+    """Names of the installed engines which can be benchmarked.
+
+    Engines which don't use a MatchIndex need the database, so they can't.
+
+    """
+    return sorted(
+        name for name, engine_class in ENGINES.items()
+        if engine_class.uses_index and engine_class.is_available()
+    )
@@ -0,0 +1,137 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Blocking keys for fuzzy matching.
+
+Rather than scoring a building against every canonical building in an org,
+only those sharing a blocking key with it are scored, e.g. those in the same
+ZIP code and on the same street. Which keys are used is set by
+``MATCH_BLOCKING_KEYS``.
+
+A building is scored against every block it has a key in, so each key
+should be narrow: in an org of buildings in one city, a block on the city
+alone would be the whole org. The default keys are composites, the street
+within a ZIP code and the street within a city.
+
+"""
+import re
+import string
+
+from django.conf import settings
+
+# The snapshot fields blocking keys are made from.
+BLOCKING_FIELDS = ('postal_code', 'city', 'address_line_1')
+DEFAULT_BLOCKING_KEYS = ('postal_code_street', 'city_street')
+# Joins a snapshot's keys, as 'name:key', in BuildingSnapshot.blocking_keys.
+# Punctuation never makes it into a key.
+KEY_SEPARATOR = '|'
+PUNCT_REGEX = re.compile('[{0}]'.format(
+    re.escape(string.punctuation)
+))
+# e.g. '123' or '123a', but not '5th'.
+HOUSE_NUMBER_REGEX = re.compile(r'^\d+[a-z]?$')
+# Words which don't tell streets apart.
+STREET_NOISE = frozenset([
+    # Directions.
+    'n', 's', 'e', 'w', 'ne', 'nw', 'se', 'sw',
+    'north', 'south', 'east', 'west',
+    # Suffixes.
+    'st', 'street', 'ave', 'av', 'avenue', 'rd', 'road', 'blvd',
+    'boulevard', 'dr', 'drive', 'ln', 'lane', 'ct', 'court', 'pl', 'place',
+    'way', 'pkwy', 'parkway', 'hwy', 'highway', 'cir', 'circle', 'ter',
+    'terrace', 'sq', 'square',
+])
+UNIT_WORDS = frozenset([
+    'apt', 'apartment', 'unit', 'ste', 'suite', 'fl', 'floor', 'rm', 'room',
+    'bldg', 'building',
+])
+
+
+def _normalize(value):
+    return PUNCT_REGEX.sub('', value.lower()).split()
+
+
+def postal_code_key(postal_code):
+    """The 5 digit ZIP code, or the whole postal code elsewhere."""
+    code = ''.join(_normalize(postal_code))
+    digits = ''.join(c for c in code if c.isdigit())
+    if len(digits) >= 5 and code[:5].isdigit():
+        return digits[:5]
+
+    return code or None
+
+
+def city_key(city):
+    return ' '.join(_normalize(city)) or None
+
+
+def street_key(address):
+    """The name of the street, e.g. 'main' for '123 N. Main St. Apt 4'."""
+    for word in _normalize(address):
+        if word in UNIT_WORDS:
+            break
+        if HOUSE_NUMBER_REGEX.match(word) or word in STREET_NOISE:
+            continue
+        return word
+
+    return None
+
+
+KEY_FUNCTIONS = {
+    'postal_code': (0, postal_code_key),
+    'city': (1, city_key),
+    'street': (2, street_key),
+}
+# Keys made of several of the above, shared only by buildings which have
+# all of the parts in common.
+COMPOSITE_KEYS = {
+    'postal_code_street': ('postal_code', 'street'),
+    'city_street': ('city', 'street'),
+}
+
+
+def _make_key(name, values):
+    if name in COMPOSITE_KEYS:
+        parts = [_make_key(part, values) for part in COMPOSITE_KEYS[name]]
+        return ' '.join(parts) if all(parts) else None
+
+    position, key_function = KEY_FUNCTIONS[name]
+    value = values[position]
+    return key_function(value) if value else None
+
+
+def get_blocking_keys():
+    """The names of the blocking keys in use, from settings."""
+    return tuple(
+        getattr(settings, 'MATCH_BLOCKING_KEYS', DEFAULT_BLOCKING_KEYS)
+    )
+
+
+def blocking_keys(values, key_names=None):
+    """Returns the blocking keys for a building.
+
+    :param values: list, the building's values for BLOCKING_FIELDS.
+    :param key_names: (optional) names of the keys to make; defaults to
+        those in settings.
+    :returns: tuple of (key name, key) pairs, empty if the building has
+        none of the values needed.
+
+    """
+    if key_names is None:
+        key_names = get_blocking_keys()
+
+    keys = []
+    for name in key_names:
+        key = _make_key(name, values)
+        if key:
+            keys.append((name, key))
+
+    return tuple(keys)
+
+
+def join_blocking_keys(keys):
+    """Keys from ``blocking_keys`` as one string; None if there are none."""
+    return KEY_SEPARATOR.join(
+        u'{0}:{1}'.format(name, key) for name, key in keys
+    ) or None
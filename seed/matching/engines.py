@@ -0,0 +1,217 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Matching engines, which score unmatched buildings against canonical ones.
+
+An engine is made for an org's MatchIndex and scores a chunk of match
+strings at a time. For each it returns a list of (match string, similarity)
+tuples, best first, as ``handle_results`` expects; ``MatchIndex.get_snapshot``
+then gives the canonical snapshot of a match string.
+
+Engines are registered by name with ``register_engine``. ``MATCH_ENGINE``
+picks the one ``_match_buildings`` uses, and the ``benchmark_matching``
+command compares those which work from the MatchIndex alone.
+
+"""
+import logging
+
+import ngram
+from django.conf import settings
+from django.db import connection
+
+from seed.matching import tfidf, trigram
+from seed.matching.blocking import blocking_keys, get_blocking_keys
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENGINE = 'ngram'
+# {engine name: MatchEngine subclass}
+ENGINES = {}
+
+
+def register_engine(engine_class):
+    """Class decorator making an engine available by its name."""
+    ENGINES[engine_class.name] = engine_class
+    return engine_class
+
+
+class MatchEngine(object):
+    """Base class of matching engines.
+
+    :param match_index: MatchIndex inst., the canonical buildings to match;
+        None for engines which don't use one.
+    :param org_id: (optional) int, PK of the Organization ``match_index`` is
+        for. Engines may use it to keep things between chunks; without it,
+        nothing is kept.
+
+    """
+
+    # The name MATCH_ENGINE uses for the engine.
+    name = None
+    # Whether the engine searches the org's MatchIndex. Engines which don't
+    # are given None, and must know the org.
+    uses_index = True
+
+    def __init__(self, match_index, org_id=None):
+        self.match_index = match_index
+        self.org_id = org_id
+
+    @classmethod
+    def is_available(cls):
+        """Whether the engine's dependencies are installed."""
+        return True
+
+    def search_many(self, match_strings, threshold, keys_list):
+        """Find the closest canonical buildings for many buildings.
+
+        :param match_strings: list of str, the buildings' match strings.
+        :param threshold: float, the least similarity to return.
+        :param keys_list: list, each building's blocking keys. Only
+            canonical buildings the MatchIndex would search for those keys
+            may be returned.
+        :returns: list, for each building, of (match string, similarity)
+            tuples, best first.
+
+        """
+        raise NotImplementedError
+
+    def get_snapshot(self, match_string, keys=()):
+        """The canonical snapshot PK of a match string ``search_many`` found.
+
+        :param keys: the blocking keys of the building matched.
+
+        """
+        return self.match_index.get_snapshot(match_string, keys)
+
+
+@register_engine
+class NGramEngine(MatchEngine):
+    """One ``ngram.NGram`` search of the MatchIndex per building."""
+
+    name = 'ngram'
+
+    def search_many(self, match_strings, threshold, keys_list):
+        return [
+            self.match_index.search(match_string, threshold, keys)
+            for match_string, keys in zip(match_strings, keys_list)
+        ]
+
+
+@register_engine
+class TfidfEngine(MatchEngine):
+    """TF-IDF cosine similarity, a chunk at a time (see ``tfidf``)."""
+
+    name = 'tfidf'
+
+    def __init__(self, match_index, org_id=None):
+        super(TfidfEngine, self).__init__(match_index, org_id)
+        if org_id is None:
+            self.matcher = tfidf.TfidfMatcher(sorted(match_index.snapshots))
+        else:
+            self.matcher = tfidf.get_tfidf_matcher(org_id, match_index)
+
+    @classmethod
+    def is_available(cls):
+        return tfidf.sparse is not None
+
+    def _allows(self, keys):
+        return lambda match_string: self.match_index.in_blocks(
+            match_string, keys
+        )
+
+    def search_many(self, match_strings, threshold, keys_list):
+        return self.matcher.search_many(
+            match_strings,
+            threshold,
+            allowed=[self._allows(keys) for keys in keys_list],
+        )
+
+
+@register_engine
+class TrigramEngine(MatchEngine):
+    """Candidates from a pg_trgm index, scored by NGram (see ``trigram``)."""
+
+    name = 'trigram'
+    uses_index = False
+
+    def __init__(self, match_index, org_id=None):
+        super(TrigramEngine, self).__init__(match_index, org_id)
+        self.key_names = get_blocking_keys()
+        # {match string: set of (canonical snapshot pk, blocking keys)}
+        self.candidates = {}
+
+    @classmethod
+    def is_available(cls):
+        return connection.vendor == 'postgresql'
+
+    def search_many(self, match_strings, threshold, keys_list):
+        all_candidates = trigram.search_candidates(
+            self.org_id, match_strings, threshold, keys_list, self.key_names
+        )
+        all_results = []
+        for match_string, keys, candidates in zip(
+            match_strings, keys_list, all_candidates
+        ):
+            similarities = {}
+            for snapshot_pk, match_key, blocking_values in candidates:
+                candidate_keys = blocking_keys(blocking_values, self.key_names)
+                self.candidates.setdefault(match_key, set()).add(
+                    (snapshot_pk, candidate_keys)
+                )
+                # The same blocks the MatchIndex would search; the query
+                # can't tell for snapshots with out of date keys.
+                if (keys and candidate_keys
+                        and not set(keys).intersection(candidate_keys)):
+                    continue
+                similarity = ngram.NGram.compare(match_string, match_key)
+                if similarity >= threshold:
+                    similarities[match_key] = similarity
+            all_results.append(sorted(
+                similarities.items(), key=lambda item: (-item[1], item[0])
+            ))
+
+        return all_results
+
+    def get_snapshot(self, match_string, keys=()):
+        candidates = self.candidates[match_string]
+        keys = set(keys)
+        in_block = [
+            snapshot_pk for snapshot_pk, candidate_keys in candidates
+            if keys.intersection(candidate_keys)
+        ]
+
+        return min(in_block or [pk for pk, _keys in candidates])
+
+
+def get_engine_class(name=None):
+    """Return the MatchEngine subclass to match with.
+
+    :param name: (optional) str, name of the engine; MATCH_ENGINE by default.
+        Falls back to the ngram engine if the engine is unknown or its
+        dependencies are missing.
+
+    """
+    if name is None:
+        name = getattr(settings, 'MATCH_ENGINE', DEFAULT_ENGINE)
+
+    engine_class = ENGINES.get(name)
+    if engine_class is None or not engine_class.is_available():
+        logger.warning(
+            'Matching engine {0} is unknown or not installed; matching with'
+            ' {1} instead.'.format(name, DEFAULT_ENGINE)
+        )
+        engine_class = ENGINES[DEFAULT_ENGINE]
+
+    return engine_class
+
+
+def get_engine(match_index, org_id=None, name=None):
+    """Return a MatchEngine for an index.
+
+    :param name: (optional) str, name of the engine, as for
+        ``get_engine_class``.
+    :returns: MatchEngine inst.
+
+    """
+    return get_engine_class(name)(match_index, org_id)
@@ -0,0 +1,120 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Exact identifier matching against an org's canonical buildings.
+
+Any of an unmatched building's IDs may match any of a canonical building's
+IDs, e.g. a PM property id which some other file put in ``tax_lot_id``.
+IDs are compared by their normalized keys (see ``seed.utils.address``),
+which snapshots keep in ``identifier_keys``. Snapshots made before it
+existed get theirs from the ``backfill_match_keys`` command; until then,
+``IdentifierIndex`` works their keys out from their ID fields.
+
+"""
+from seed.utils.address import identifier_keys, split_identifier_keys
+
+ID_FIELDS = ('pm_property_id', 'tax_lot_id', 'custom_id_1')
+# The expression migration 0032 GIN indexes.
+IDENTIFIER_KEYS_SQL = (
+    "string_to_array(seed_buildingsnapshot.identifier_keys, ' ')"
+)
+
+
+def _id_values(keys, values):
+    """A snapshot's ID keys, from ``identifier_keys`` if it's been set.
+
+    :param keys: str or None, the snapshot's ``identifier_keys``.
+    :param values: the snapshot's values of ID_FIELDS.
+
+    """
+    if keys is not None:
+        return split_identifier_keys(keys)
+
+    return identifier_keys(values)
+
+
+def filter_by_ids(snapshots, values):
+    """Snapshots sharing any of several IDs, with one index scan.
+
+    Compares ``identifier_keys``, so snapshots made before it existed are
+    only found once the ``backfill_match_keys`` command has run.
+
+    :param snapshots: QuerySet of BuildingSnapshot.
+    :param values: IDs, normalized here.
+    :returns: QuerySet, empty if there are no IDs.
+
+    """
+    keys = identifier_keys(values)
+    if not keys:
+        return snapshots.none()
+
+    return snapshots.extra(
+        where=[IDENTIFIER_KEYS_SQL + ' && %s::text[]'],
+        params=[sorted(keys)],
+    )
+
+
+class IdentifierIndex(object):
+    """Hash index from ID values to canonical BuildingSnapshot PKs.
+
+    Built with one query, then kept up to date with ``add`` and ``remove``
+    as matches create new canonical snapshots, so that a whole import file
+    can be ID matched without querying per building.
+
+    """
+
+    def __init__(self, canonical_snapshots):
+        """
+        :param canonical_snapshots: queryset of BuildingSnapshot, the
+            canonical snapshots to match against.
+
+        """
+        # {id value: set of snapshot pks}
+        self.pks_by_id = {}
+        # {snapshot pk: set of id values}
+        self.ids_by_pk = {}
+        rows = canonical_snapshots.values_list(
+            'pk', 'identifier_keys', *ID_FIELDS
+        )
+        for row in rows.iterator():
+            self._add(row[0], _id_values(row[1], row[2:]))
+
+    def _add(self, pk, ids):
+        self.ids_by_pk[pk] = ids
+        for value in ids:
+            self.pks_by_id.setdefault(value, set()).add(pk)
+
+    def add(self, snapshot):
+        """Start matching against a (new) canonical snapshot."""
+        self.remove(snapshot.pk)
+        self._add(snapshot.pk, self._snapshot_ids(snapshot))
+
+    def remove(self, pk):
+        """Stop matching against a snapshot, e.g. one that's been merged."""
+        for value in self.ids_by_pk.pop(pk, ()):
+            pks = self.pks_by_id[value]
+            pks.discard(pk)
+            if not pks:
+                del self.pks_by_id[value]
+
+    def match(self, snapshot):
+        """Returns the sorted PKs of canonical snapshots sharing an ID.
+
+        :param snapshot: BuildingSnapshot inst.
+        :returns: list of int.
+
+        """
+        pks = set()
+        for value in self._snapshot_ids(snapshot):
+            pks.update(self.pks_by_id.get(value, ()))
+
+        return sorted(pks)
+
+    @staticmethod
+    def _snapshot_ids(snapshot):
+        return _id_values(
+            snapshot.identifier_keys,
+            [getattr(snapshot, field) for field in ID_FIELDS],
+        )
+
@@ -0,0 +1,457 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Persistent per-org n-gram index of canonical buildings for fuzzy matching.
+
+Each org's index is kept in the cache, compressed, along with a journal of
+changes to the org's canonical buildings. Saving a CanonicalBuilding
+appends a change to the journal (see ``seed.models``), and loading an index
+replays whatever it has missed, so matching never has to re-index all of
+an org's buildings unless the cached copy has been lost.
+
+The journal is written as buildings are saved, before their transactions
+commit, and isn't rolled back with them. So rather than trusting what a
+change says, replaying one re-reads the building it names from the
+database, and a rolled back change just re-indexes the building as it was.
+(A change replayed before its transaction commits is read the same way,
+but is replayed again by every load until the index is next saved.)
+
+"""
+import cPickle as pickle
+import re
+import string
+import zlib
+
+import ngram
+from django.core.cache import cache
+
+from data_importer.utils import acquire_lock, release_lock
+from seed.decorators import SEED_CACHE_PREFIX
+from seed.matching.blocking import (
+    BLOCKING_FIELDS, blocking_keys, get_blocking_keys
+)
+from seed.models import BS_VALUES_LIST, BuildingSnapshot, CanonicalBuilding
+
+INDEX_KEY = SEED_CACHE_PREFIX.format('NGRAM_INDEX') + ':{0}'
+INDEX_SEQ_KEY = INDEX_KEY + ':SEQ'
+INDEX_LOCK_KEY = INDEX_KEY + ':LOCK'
+JOURNAL_SEQ_KEY = SEED_CACHE_PREFIX.format('NGRAM_JOURNAL') + ':{0}'
+JOURNAL_KEY = JOURNAL_SEQ_KEY + ':{1}'
+# Memcached won't keep anything for longer than 30 days.
+INDEX_TIMEOUT = 60 * 60 * 24 * 30
+# Save the index back to the cache once it's this many changes behind.
+COMPACT_AFTER = 1000
+# The values we match buildings on; BS_VALUES_LIST without the PK.
+MATCH_FIELDS = BS_VALUES_LIST[1:]
+# MATCH_FIELDS, then the fields blocking keys are made from.
+INDEX_FIELDS = tuple(MATCH_FIELDS) + BLOCKING_FIELDS
+PUNCT_REGEX = re.compile('[{0}]'.format(
+    re.escape(string.punctuation)
+))
+
+
+def stringify(values):
+    """Take iterable of str and NoneTypes and reduce to space sep. str."""
+    return ' '.join(
+        [PUNCT_REGEX.sub('', value.lower()) for value in values if value]
+    )
+
+
+class MatchIndex(object):
+    """An n-gram index of an org's active canonical buildings.
+
+    As well as the n-grams of every building, there are n-grams for each
+    block of buildings sharing a blocking key (see ``seed.matching.blocking``),
+    so that buildings can be scored against just the canonical buildings in
+    their blocks.
+
+    Can be used where the reverse index from match string to canonical
+    snapshot PK used to be, e.g. ``index[match_string]``.
+
+    """
+
+    def __init__(self, key_names=None):
+        if key_names is None:
+            key_names = get_blocking_keys()
+        # The blocking keys indexed; the index is rebuilt if these change.
+        self.key_names = tuple(key_names)
+        # Journal sequence number of the last change applied.
+        self.seq = 0
+        self.ngrams = ngram.NGram()
+        # {canonical building pk: (canonical snapshot pk, match string,
+        #  blocking keys)}
+        self.entries = {}
+        # {match string: {canonical building pk: canonical snapshot pk}}
+        self.snapshots = {}
+        # {blocking key: NGram of the match strings in the block}, where the
+        # key None is the block of buildings without any blocking keys.
+        self.blocks = {}
+        # {(blocking key, match string): number of buildings}
+        self.block_counts = {}
+
+    @classmethod
+    def build(cls, org_id):
+        """Index all of an org's active canonical buildings."""
+        index = cls()
+        for row in _index_rows(org_id).iterator():
+            index._add_row(row)
+
+        return index
+
+    def _add_row(self, row):
+        values = row[2:]
+        num_match_fields = len(MATCH_FIELDS)
+        self.add(
+            row[0],
+            row[1],
+            values[:num_match_fields],
+            values[num_match_fields:],
+        )
+
+    def __getstate__(self):
+        # NGram pickles as a list of its items, which means splitting every
+        # string into n-grams again when loading; keep its tables instead.
+        return {
+            'key_names': self.key_names,
+            'seq': self.seq,
+            'entries': self.entries,
+            'grams': self.ngrams._grams,
+            'length': self.ngrams.length,
+            'blocks': dict(
+                (key, (block._grams, block.length))
+                for key, block in self.blocks.items()
+            ),
+        }
+
+    @staticmethod
+    def _load_ngrams(grams, length):
+        ngrams = ngram.NGram()
+        set.update(ngrams, length)
+        ngrams._grams = grams
+        ngrams.length = length
+        return ngrams
+
+    def __setstate__(self, state):
+        self.key_names = state.get('key_names')
+        self.seq = state['seq']
+        self.entries = state['entries']
+        if self.key_names is None:
+            # Saved before blocking was added, so it can't be used (see
+            # ``is_current``); don't bother loading the rest.
+            self.entries = {}
+            self.snapshots = {}
+            self.blocks = {}
+            self.block_counts = {}
+            self.ngrams = ngram.NGram()
+            return
+
+        self.snapshots = {}
+        self.block_counts = {}
+        for canon_pk, (snapshot_pk, match_string, keys) in (
+                self.entries.items()):
+            self.snapshots.setdefault(match_string, {})[canon_pk] = snapshot_pk
+            for key in keys or (None,):
+                count_key = (key, match_string)
+                self.block_counts[count_key] = (
+                    self.block_counts.get(count_key, 0) + 1
+                )
+
+        self.ngrams = self._load_ngrams(state['grams'], state['length'])
+        self.blocks = dict(
+            (key, self._load_ngrams(grams, length))
+            for key, (grams, length) in state.get('blocks', {}).items()
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, match_string):
+        """The canonical snapshot PK for a match string."""
+        return self.get_snapshot(match_string)
+
+    def is_current(self):
+        """Whether the index uses the blocking keys in settings."""
+        return self.key_names == get_blocking_keys()
+
+    def get_snapshot(self, match_string, keys=()):
+        """The canonical snapshot PK for a match string.
+
+        :param keys: (optional) blocking keys of the building matched; when
+            several canonical buildings have the same match string, one
+            sharing a blocking key with the building is preferred.
+
+        """
+        snapshots = self.snapshots[match_string]
+        keys = set(keys)
+        in_block = [
+            canon_pk for canon_pk in snapshots
+            if keys.intersection(self.entries[canon_pk][2])
+        ]
+
+        return snapshots[min(in_block or snapshots)]
+
+    def _add_to_block(self, key, match_string):
+        count_key = (key, match_string)
+        count = self.block_counts.get(count_key, 0)
+        self.block_counts[count_key] = count + 1
+        if not count:
+            self.blocks.setdefault(key, ngram.NGram()).add(match_string)
+
+    def _remove_from_block(self, key, match_string):
+        count_key = (key, match_string)
+        self.block_counts[count_key] -= 1
+        if not self.block_counts[count_key]:
+            del self.block_counts[count_key]
+            block = self.blocks[key]
+            block.remove(match_string)
+            if not block:
+                del self.blocks[key]
+
+    def add(self, canon_pk, snapshot_pk, values, blocking_values=()):
+        """Index (or re-index) a canonical building's snapshot.
+
+        :param values: list, the snapshot's values for MATCH_FIELDS.
+        :param blocking_values: list, the snapshot's values for
+            BLOCKING_FIELDS.
+
+        """
+        self.remove(canon_pk)
+        match_string = stringify(values)
+        keys = ()
+        if blocking_values:
+            keys = blocking_keys(blocking_values, self.key_names)
+        self.entries[canon_pk] = (snapshot_pk, match_string, keys)
+        self.snapshots.setdefault(match_string, {})[canon_pk] = snapshot_pk
+        self.ngrams.add(match_string)
+        for key in keys or (None,):
+            self._add_to_block(key, match_string)
+
+    def remove(self, canon_pk):
+        """Stop matching against a canonical building, if indexed."""
+        if canon_pk not in self.entries:
+            return
+
+        _snapshot_pk, match_string, keys = self.entries.pop(canon_pk)
+        for key in keys or (None,):
+            self._remove_from_block(key, match_string)
+        snapshots = self.snapshots[match_string]
+        del snapshots[canon_pk]
+        if not snapshots:
+            del self.snapshots[match_string]
+            self.ngrams.remove(match_string)
+
+    def refresh(self, org_id, canon_pks):
+        """Re-index canonical buildings as they are in the database.
+
+        Buildings which are no longer active, or have moved to another org,
+        are removed.
+
+        :param canon_pks: iterable of CanonicalBuilding PKs.
+
+        """
+        canon_pks = set(canon_pks)
+        if not canon_pks:
+            return
+
+        for row in _index_rows(org_id).filter(pk__in=canon_pks):
+            self._add_row(row)
+            canon_pks.discard(row[0])
+        for canon_pk in canon_pks:
+            self.remove(canon_pk)
+
+    def in_blocks(self, match_string, keys):
+        """Whether a match string would be searched for the blocking keys.
+
+        That is, whether a canonical building with the match string shares
+        one of the keys, or has no blocking keys of its own.
+
+        """
+        if not keys:
+            return match_string in self.snapshots
+
+        return any(
+            (key, match_string) in self.block_counts
+            for key in keys + (None,)
+        )
+
+    def search(self, match_string, threshold, keys=None):
+        """Returns list of (match string, similarity), best first.
+
+        :param keys: (optional) the blocking keys of the building being
+            matched. Only canonical buildings sharing one of them, or
+            without any blocking keys of their own, are searched. Without
+            keys, every canonical building is searched.
+
+        """
+        if not keys:
+            return self.ngrams.search(match_string, threshold)
+
+        similarities = {}
+        for key in keys + (None,):
+            if key not in self.blocks:
+                continue
+            for result, similarity in self.blocks[key].search(
+                match_string, threshold
+            ):
+                similarities[result] = similarity
+
+        return sorted(
+            similarities.items(), key=lambda item: (-item[1], item[0])
+        )
+
+
+def _index_rows(org_id):
+    """Values of an org's active canonical buildings for ``_add_row``."""
+    return CanonicalBuilding.objects.filter(
+        canonical_snapshot__super_organization_id=org_id,
+    ).values_list(
+        'pk',
+        'canonical_snapshot_id',
+        *['canonical_snapshot__{0}'.format(f) for f in INDEX_FIELDS]
+    )
+
+
+def _get_journal_seq(org_id):
+    return cache.get(JOURNAL_SEQ_KEY.format(org_id)) or 0
+
+
+def _record(org_id, change):
+    """Append a change to an org's journal."""
+    seq_key = JOURNAL_SEQ_KEY.format(org_id)
+    cache.add(seq_key, 0, INDEX_TIMEOUT)
+    seq = cache.incr(seq_key)
+    cache.set(JOURNAL_KEY.format(org_id, seq), change, INDEX_TIMEOUT)
+
+
+def _get_changes(org_id, start, end):
+    """Journal changes after ``start``, up to and including ``end``.
+
+    :returns: list of changes, or None if any have gone missing.
+
+    """
+    if start > end:
+        # The journal has been lost and started over.
+        return None
+
+    keys = [
+        JOURNAL_KEY.format(org_id, seq) for seq in range(start + 1, end + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+
+    return [changes[key] for key in keys]
+
+
+def save_match_index(org_id, index):
+    """Save an index to the cache, unless a newer one is already there."""
+    lock_key = INDEX_LOCK_KEY.format(org_id)
+    if not acquire_lock(lock_key, 60):
+        # Someone else is saving one, that'll do.
+        return
+
+    try:
+        if (cache.get(INDEX_SEQ_KEY.format(org_id)) or 0) > index.seq:
+            return
+        data = zlib.compress(pickle.dumps(index, pickle.HIGHEST_PROTOCOL))
+        cache.set(INDEX_KEY.format(org_id), data, INDEX_TIMEOUT)
+        cache.set(INDEX_SEQ_KEY.format(org_id), index.seq, INDEX_TIMEOUT)
+    finally:
+        release_lock(lock_key)
+
+
+def get_match_index(org_id):
+    """Return an org's MatchIndex, up to date with its canonical buildings.
+
+    :param org_id: int, PK of an Organization.
+    :returns: MatchIndex inst.
+
+    """
+    seq = _get_journal_seq(org_id)
+    index = None
+    data = cache.get(INDEX_KEY.format(org_id))
+    if data is not None:
+        index = pickle.loads(zlib.decompress(data))
+        saved_seq = index.seq
+        changes = _get_changes(org_id, index.seq, seq)
+        if changes is None or not index.is_current():
+            index = None
+        else:
+            # Every change names the canonical building it's for.
+            index.refresh(org_id, [change[1] for change in changes])
+            index.seq = seq
+
+    if index is None:
+        index = MatchIndex.build(org_id)
+        index.seq = seq
+        save_match_index(org_id, index)
+    elif seq - saved_seq >= COMPACT_AFTER:
+        save_match_index(org_id, index)
+
+    return index
+
+
+def invalidate_match_index(org_id):
+    """Drop an org's index, so the next load re-indexes from the database."""
+    cache.delete(INDEX_KEY.format(org_id))
+    cache.delete(INDEX_SEQ_KEY.format(org_id))
+
+
+def canonical_building_changed(canon, deleted=False):
+    """Journal a change to a CanonicalBuilding for its org's index.
+
+    Also sets the ``match_key`` of the canonical snapshot. Called inside the
+    save's transaction; if that's rolled back, replaying the change finds
+    the building unchanged.
+
+    :param canon: CanonicalBuilding inst., post save or delete.
+    :param deleted: bool, whether ``canon`` has been deleted.
+
+    """
+    if not canon.canonical_snapshot_id:
+        return
+
+    row = BuildingSnapshot.objects.filter(
+        pk=canon.canonical_snapshot_id
+    ).values_list(
+        'super_organization_id', 'match_key', *MATCH_FIELDS
+    ).first()
+    if row is None or row[0] is None:
+        return
+
+    org_id, match_key = row[:2]
+    values = row[2:]
+    if canon.active and not deleted:
+        # Keep the match key trigram searches use up to date, too.
+        if match_key != stringify(values):
+            BuildingSnapshot.objects.filter(
+                pk=canon.canonical_snapshot_id
+            ).update(match_key=stringify(values))
+        _record(org_id, ('add', canon.pk))
+    else:
+        _record(org_id, ('remove', canon.pk))
+
+
+def index_canonical_buildings(canons):
+    """Journal new canonical snapshots of canonical buildings saved in bulk.
+
+    :param canons: iterable of active CanonicalBuilding insts., with their
+        canonical snapshots already loaded.
+
+    """
+    for canon in canons:
+        org_id = canon.canonical_snapshot.super_organization_id
+        if org_id is not None:
+            _record(org_id, ('add', canon.pk))
+
+
+def forget_canonical_buildings(canons):
+    """Journal removals for canonical buildings deactivated in bulk.
+
+    :param canons: iterable of (canonical building pk, org pk) tuples.
+
+    """
+    for canon_pk, org_id in canons:
+        if org_id is not None:
+            _record(org_id, ('remove', canon_pk))
@@ -0,0 +1,202 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+TF-IDF matching engine, an alternative to scoring with ``ngram.NGram``.
+
+Match strings are split into character trigrams, weighted by TF-IDF and
+compared by cosine similarity. A whole chunk of buildings is scored against
+every canonical building with sparse matrix multiplies, a block of rows at
+a time, instead of one n-gram search per building.
+
+Needs NumPy and SciPy, which are optional; use ``MATCH_ENGINE = 'tfidf'``
+to turn it on (see ``seed.matching.engines``).
+
+"""
+import math
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+# Same n-grams as ngram.NGram's defaults.
+N = 3
+PAD = '$' * (N - 1)
+# Number of buildings whose similarities are computed in one multiply.
+BLOCK_SIZE = 1000
+# This process's matchers, {org_pk: (index seq, matcher)}.
+_MATCHERS = {}
+
+
+def _grams(string):
+    """Counts of a string's (padded) character n-grams."""
+    padded = PAD + string + PAD
+    counts = {}
+    for i in range(len(padded) - N + 1):
+        gram = padded[i:i + N]
+        counts[gram] = counts.get(gram, 0) + 1
+
+    return counts
+
+
+class TfidfMatcher(object):
+    """Scores match strings against a fixed list of canonical match strings.
+
+    Similarities are cosine similarities between TF-IDF vectors, so 1.0 for
+    identical strings and 0.0 for strings without any n-grams in common.
+
+    """
+
+    def __init__(self, strings):
+        """
+        :param strings: list of str, the canonical match strings.
+
+        """
+        self.strings = list(strings)
+        self.vocabulary = {}
+        rows, columns, counts = [], [], []
+        for row, string in enumerate(self.strings):
+            for gram, count in _grams(string).items():
+                column = self.vocabulary.setdefault(
+                    gram, len(self.vocabulary)
+                )
+                rows.append(row)
+                columns.append(column)
+                counts.append(count)
+
+        shape = (len(self.strings), len(self.vocabulary))
+        matrix = sparse.csr_matrix(
+            (numpy.array(counts, dtype=numpy.float64), (rows, columns)),
+            shape=shape,
+        )
+        # Smoothed, so that grams in every string still count for a little.
+        doc_freqs = numpy.bincount(columns, minlength=shape[1])
+        self.idf = numpy.log((1.0 + shape[0]) / (1.0 + doc_freqs)) + 1.0
+        # The weight of grams no canonical string has.
+        self.unseen_idf = math.log(1.0 + shape[0]) + 1.0
+        matrix = matrix * sparse.diags(self.idf, 0)
+        self.matrix = self._normalize(matrix).T.tocsr()
+
+    @staticmethod
+    def _normalize(matrix):
+        """Scale each row to unit length."""
+        norms = numpy.sqrt(numpy.asarray(
+            matrix.multiply(matrix).sum(axis=1)
+        ).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms, 0) * matrix
+
+    def transform(self, strings):
+        """TF-IDF vectors of strings, one row per string, unit length.
+
+        Grams no canonical string has don't add to the similarities, but
+        still count towards each vector's length.
+
+        """
+        rows, columns, weights = [], [], []
+        norms = []
+        for row, string in enumerate(strings):
+            norm = 0.0
+            for gram, count in _grams(string).items():
+                column = self.vocabulary.get(gram)
+                if column is None:
+                    norm += (count * self.unseen_idf) ** 2
+                    continue
+                weight = count * self.idf[column]
+                norm += weight ** 2
+                rows.append(row)
+                columns.append(column)
+                weights.append(weight)
+            norms.append(math.sqrt(norm) or 1.0)
+
+        weights = numpy.array(weights, dtype=numpy.float64)
+        if rows:
+            weights /= numpy.array(norms)[rows]
+
+        return sparse.csr_matrix(
+            (weights, (rows, columns)),
+            shape=(len(strings), len(self.vocabulary)),
+        )
+
+    def _best(self, columns, scores, is_allowed, limit):
+        """The ``limit`` best allowed (match string, similarity) of a row.
+
+        Candidates are picked out best first with ``argpartition``, a few at
+        a time, so ``is_allowed`` is only called until there are enough.
+
+        """
+        matches = []
+        while len(scores) and len(matches) < limit:
+            if len(scores) > limit:
+                picked = numpy.argpartition(-scores, limit - 1)[:limit]
+                # Ties with the worst picked are picked, too, so that they
+                # are ordered by match string.
+                picked = numpy.flatnonzero(scores >= scores[picked].min())
+            else:
+                picked = numpy.arange(len(scores))
+            for column, similarity in zip(columns[picked], scores[picked]):
+                match_string = self.strings[column]
+                if is_allowed is None or is_allowed(match_string):
+                    matches.append((match_string, float(similarity)))
+            rest = numpy.ones(len(scores), dtype=bool)
+            rest[picked] = False
+            columns = columns[rest]
+            scores = scores[rest]
+
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    def search_many(self, strings, threshold, allowed=None, limit=5):
+        """Find the closest canonical strings for each of many strings.
+
+        :param strings: list of str, the match strings to score.
+        :param threshold: float, the least similarity to return.
+        :param allowed: (optional) list, for each string, of a function
+            taking a canonical match string and returning whether it may
+            be matched, or None to allow them all.
+        :param limit: int, the most results to return for each string.
+        :returns: list, for each string, of (match string, similarity),
+            best first; the same as ``MatchIndex.search`` returns.
+
+        """
+        results = []
+        for start in range(0, len(strings), BLOCK_SIZE):
+            queries = self.transform(strings[start:start + BLOCK_SIZE])
+            similarities = (queries * self.matrix).tocsr()
+            for i in range(similarities.shape[0]):
+                row_start = similarities.indptr[i]
+                row_end = similarities.indptr[i + 1]
+                scores = similarities.data[row_start:row_end]
+                above = numpy.flatnonzero(scores >= threshold)
+                results.append(self._best(
+                    similarities.indices[row_start:row_end][above],
+                    # Rounding can take identical strings a hair over 1.
+                    numpy.minimum(scores[above], 1.0),
+                    allowed[start + i] if allowed else None,
+                    limit,
+                ))
+
+        return results
+
+
+def get_tfidf_matcher(org_id, match_index):
+    """Return a TfidfMatcher of a MatchIndex's canonical match strings.
+
+    Matchers are kept in memory for the life of the process, until the
+    index changes.
+
+    :param org_id: int, PK of the Organization ``match_index`` is for.
+    :param match_index: MatchIndex inst.
+    :returns: TfidfMatcher inst.
+
+    """
+    cached = _MATCHERS.get(org_id)
+    if cached is not None and cached[0] == match_index.seq:
+        return cached[1]
+
+    matcher = TfidfMatcher(sorted(match_index.snapshots))
+    _MATCHERS[org_id] = (match_index.seq, matcher)
+
+    return matcher
@@ -0,0 +1,116 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Candidate generation for fuzzy matching in PostgreSQL, with pg_trgm.
+
+Each active canonical snapshot keeps its normalized match string in
+``BuildingSnapshot.match_key``, which has a trigram GIN index. A batch of
+unmatched buildings' match strings is sent in one query, which returns the
+few most similar canonical snapshots in each building's blocks; only those
+are scored in Python. Workers never load the org's canonical buildings, so
+this stays quick as orgs grow. Snapshots made before match keys existed
+get theirs from the ``backfill_match_keys`` command.
+
+Blocks are compared with ``BuildingSnapshot.blocking_keys``. Snapshots
+without keys, or whose keys were made with other ``MATCH_BLOCKING_KEYS``,
+are in every block here, and left for the caller to check.
+
+"""
+from django.db import connection
+
+from seed.matching.blocking import (
+    BLOCKING_FIELDS, KEY_SEPARATOR, get_blocking_keys, join_blocking_keys,
+)
+
+# Candidates fetched per building.
+CANDIDATES = 5
+# pg_trgm's similarity doesn't count grams quite like ngram.NGram, so fetch
+# candidates a little below the threshold and let NGram decide.
+THRESHOLD_SLACK = 0.8
+
+CANDIDATES_SQL = """
+SELECT
+    ranked.i, ranked.rank, ranked.id, ranked.match_key,
+    {ranked_blocking_fields}
+FROM (
+    SELECT
+        q.i, bs.id, bs.match_key, {blocking_fields},
+        row_number() OVER (
+            PARTITION BY q.i
+            ORDER BY similarity(bs.match_key, q.s) DESC, bs.id
+        ) AS rank
+    FROM (
+        SELECT
+            i,
+            (%(strings)s::text[])[i] AS s,
+            string_to_array((%(keys)s::text[])[i], %(separator)s) AS k
+        FROM generate_subscripts(%(strings)s::text[], 1) AS i
+    ) AS q
+    JOIN seed_buildingsnapshot AS bs ON bs.match_key %% q.s
+    JOIN seed_canonicalbuilding AS cb ON cb.canonical_snapshot_id = bs.id
+    WHERE cb.active AND bs.super_organization_id = %(org_id)s
+    AND (
+        q.k IS NULL
+        OR string_to_array(bs.blocking_keys, %(separator)s) && q.k
+        -- No keys of the current kinds.
+        OR NOT EXISTS (
+            SELECT 1
+            FROM unnest(
+                string_to_array(bs.blocking_keys, %(separator)s)
+            ) AS bk
+            WHERE split_part(bk, ':', 1) = ANY(%(key_names)s::text[])
+        )
+    )
+) AS ranked
+WHERE ranked.rank <= %(limit)s
+""".format(
+    blocking_fields=', '.join('bs.{0}'.format(f) for f in BLOCKING_FIELDS),
+    ranked_blocking_fields=', '.join(
+        'ranked.{0}'.format(f) for f in BLOCKING_FIELDS
+    ),
+)
+
+
+def search_candidates(org_id, match_strings, threshold, keys_list=None,
+                      key_names=None, limit=CANDIDATES):
+    """The canonical snapshots most similar to each of many match strings.
+
+    :param org_id: int, PK of the Organization to search.
+    :param match_strings: list of str.
+    :param threshold: float, roughly the least similarity to return.
+    :param keys_list: (optional) list, each string's blocking keys. Only
+        canonical snapshots sharing one, or without any, are returned.
+    :param key_names: (optional) names of the blocking keys in use;
+        defaults to those in settings.
+    :param limit: int, the most candidates to return for each string.
+    :returns: list, for each match string, of (canonical snapshot pk, match
+        key, values of BLOCKING_FIELDS) tuples, most similar first.
+
+    """
+    candidates = [[] for _ in match_strings]
+    if not match_strings:
+        return candidates
+
+    cursor = connection.cursor()
+    # The similarity the % operator needs.
+    cursor.execute('SELECT set_limit(%s)', [threshold * THRESHOLD_SLACK])
+    if keys_list is None:
+        keys_list = [()] * len(match_strings)
+    if key_names is None:
+        key_names = get_blocking_keys()
+    cursor.execute(CANDIDATES_SQL, {
+        'strings': list(match_strings),
+        'keys': [join_blocking_keys(keys) for keys in keys_list],
+        'separator': KEY_SEPARATOR,
+        'key_names': list(key_names),
+        'org_id': org_id,
+        'limit': limit,
+    })
+    # Rows are in no particular order; sort by string, then rank.
+    for row in sorted(cursor.fetchall()):
+        i, _rank, snapshot_pk, match_key = row[:4]
+        candidates[i - 1].append((snapshot_pk, match_key, row[4:]))
+
+    return candidates
+
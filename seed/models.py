@@ -4,9 +4,14 @@
 # system imports
 import json
 import unicodedata
+import uuid
 
 # django imports
-from django.db import models
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
 from django.contrib.contenttypes import generic
 from django.core import serializers
 from django.utils.translation import ugettext_lazy as _
@@ -28,13 +33,24 @@ from superperms.orgs.models import (
     Organization as SuperOrganization,
 )
 
-from seed.managers.json import JsonManager
+from seed.decorators import SEED_CACHE_PREFIX
+from seed.managers.json import JsonManager, JsonQuerySet
+from seed.utils import address
+from seed.utils.fields import JSONBField, TSVectorField
 from seed.utils.time import convert_datestr
 from seed.utils.generic import split_model_fields
 
 
 PROJECT_NAME_MAX_LENGTH = 255
 
+MAPPING_REVISION_KEY = SEED_CACHE_PREFIX.format('MAPPING_REVISION') + ':{0}'
+# Anything cached per mapping revision can be rebuilt, so let it expire.
+MAPPING_CACHE_TIMEOUT = 60 * 60 * 24
+SNAPSHOT_VALUES_KEY = SEED_CACHE_PREFIX.format('SNAPSHOT_VALUES') + ':{0}'
+# Compacted edits never change, so keep their values as long as the cache
+# will (memcached won't keep anything for longer than 30 days).
+SNAPSHOT_VALUES_TIMEOUT = 60 * 60 * 24 * 30
+
 # Represents the data source of a given BuildingSnapshot
 
 ASSESSED_RAW = 0
@@ -147,7 +163,8 @@ ENERGY_UNITS = (
 def get_ancestors(building):
     """gets all the non-raw, non-composite ancestors of a building
 
-       Recursive function to traverse the tree upward.
+       Only climbs through non-raw snapshots, i.e. those whose source_type is
+       one of:
        source_type {
            2: ASSESSED_BS,
            3: PORTFOLIO_BS,
@@ -157,12 +174,20 @@ def get_ancestors(building):
        :param building: BuildingSnapshot inst.
        :returns: list of BuildingSnapshot inst., ancestors of building
     """
-    ancestors = []
-    parents = building.parents.filter(source_type__in=[2, 3, 4])
-    ancestors.extend(parents.filter(source_type__in=[2, 3]))
-    for p in parents:
-        ancestors.extend(get_ancestors(p))
-    return ancestors
+    edges, source_types = get_lineage([building.pk], 'parents')
+
+    def climb(pk):
+        parents = [
+            p for p in edges.get(pk, ()) if source_types[p] in (2, 3, 4)
+        ]
+        ancestor_pks = [p for p in parents if source_types[p] in (2, 3)]
+        for p in parents:
+            ancestor_pks.extend(climb(p))
+        return ancestor_pks
+
+    ancestor_pks = climb(building.pk)
+    snapshots = BuildingSnapshot.objects.in_bulk(ancestor_pks)
+    return [snapshots[pk] for pk in ancestor_pks]
 
 
 def find_unmatched_buildings(import_file):
@@ -209,20 +234,33 @@ def obj_to_dict(obj):
         tries to serialize JSONField
 
     """
-    data = serializers.serialize('json', [obj, ])
-    struct = json.loads(data)[0]
-    response = struct['fields']
-    response[u'id'] = response[u'pk'] = struct['pk']
-    response[u'model'] = struct['model']
-    # JSONField doesn't get serialized by `serialize`
-    for f in obj._meta.fields:
-        if type(f) == JSONField:
-            e = getattr(obj, f.name)
-            # postgres < 9.3 support
-            while type(e) == unicode:
-                e = json.loads(e)
-            response[unicode(f.name)] = e
-    return response
+    return objs_to_dicts([obj])[0]
+
+
+def objs_to_dicts(objs, fields=None):
+    """serializes many objs as ``obj_to_dict`` does, in one pass
+
+    :param objs: list of model insts. of the same model
+    :param fields: (optional) list of field names to serialize; all of them
+        by default. Leave out M2M fields to save a query per obj.
+
+    """
+    data = serializers.serialize('json', objs, fields=fields)
+    results = []
+    for obj, struct in zip(objs, json.loads(data)):
+        response = struct['fields']
+        response[u'id'] = response[u'pk'] = struct['pk']
+        response[u'model'] = struct['model']
+        # JSONField doesn't get serialized by `serialize`
+        for f in obj._meta.fields:
+            if isinstance(f, JSONField):
+                e = getattr(obj, f.name)
+                # postgres < 9.3 support
+                while type(e) == unicode:
+                    e = json.loads(e)
+                response[unicode(f.name)] = e
+        results.append(response)
+    return results
 
 
 def get_sourced_attributes(snapshot):
@@ -257,6 +295,42 @@ def set_initial_sources(snapshot):
     return snapshot
 
 
+def reserve_ids(model, count):
+    """Pull ``count`` primary keys off of a model's sequence.
+
+    ``bulk_create`` doesn't hand PKs back, so we reserve them up front.
+
+    :param model: Model class with an AutoField PK.
+    :param count: int, the number of PKs to reserve.
+    :rtype: list of int.
+
+    """
+    if count < 1:
+        return []
+
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, %s)) "
+        "FROM generate_series(1, %s)",
+        [model._meta.db_table, model._meta.pk.column, count]
+    )
+
+    return [row[0] for row in cursor.fetchall()]
+
+
+def reserve_snapshot_ids(count):
+    """Pull ``count`` primary keys off of the BuildingSnapshot sequence.
+
+    Reserving them lets callers point the self-referencing ``*_source`` FKs
+    at a row before it has been inserted.
+
+    :param count: int, the number of PKs to reserve.
+    :rtype: list of int.
+
+    """
+    return reserve_ids(BuildingSnapshot, count)
+
+
 def get_or_create_canonical(b1, b2=None):
     """Gets most trusted Canonical Building.
 
@@ -368,10 +442,495 @@ def save_snapshot_match(
     new_snapshot.super_organization = b2.super_organization
 
     new_snapshot.save()
+    save_promoted_values([new_snapshot])
 
     return new_snapshot
 
 
+# {M2M attr: (column of the snapshot, column of its child or parent)}
+LINEAGE_COLUMNS = {
+    'children': ('from_buildingsnapshot_id', 'to_buildingsnapshot_id'),
+    'parents': ('to_buildingsnapshot_id', 'from_buildingsnapshot_id'),
+}
+LINEAGE_SQL = """
+WITH RECURSIVE edges(node_id, next_id) AS (
+    SELECT {node}, {next} FROM {through} WHERE {node} IN %s
+  UNION
+    SELECT e.{node}, e.{next} FROM {through} AS e
+    JOIN edges ON e.{node} = edges.next_id
+)
+SELECT edges.node_id, edges.next_id, bs.source_type
+FROM edges JOIN {table} AS bs ON bs.id = edges.next_id
+ORDER BY edges.node_id, bs.modified DESC, bs.created DESC, bs.id DESC
+"""
+
+
+def get_lineage(snapshot_pks, attr):
+    """The whole of the trees below or above some snapshots, in one query.
+
+    Follows the ``children`` or ``parents`` M2M with a recursive query, so
+    the number of queries doesn't grow with the depth of the tree.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs.
+    :param attr: str, 'children' or 'parents'.
+    :rtype: tuple of ({pk: list of the pks of its children or parents, in
+        BuildingSnapshot's default order}, {pk: source_type}), for every
+        snapshot reached.
+
+    """
+    edges = {}
+    source_types = {}
+    snapshot_pks = tuple(snapshot_pks)
+    if not snapshot_pks:
+        return edges, source_types
+
+    node, next_node = LINEAGE_COLUMNS[attr]
+    cursor = connection.cursor()
+    cursor.execute(LINEAGE_SQL.format(
+        node=node,
+        next=next_node,
+        through=BuildingSnapshot.children.through._meta.db_table,
+        table=BuildingSnapshot._meta.db_table,
+    ), [snapshot_pks])
+    for node_pk, next_pk, source_type in cursor.fetchall():
+        edges.setdefault(node_pk, []).append(next_pk)
+        source_types[next_pk] = source_type
+
+    return edges, source_types
+
+
+def walk_lineage(edges, pk):
+    """The order ``BuildingSnapshot.recurse_tree`` gives nodes in."""
+    nodes = []
+    for next_pk in edges.get(pk, ()):
+        nodes.extend(walk_lineage(edges, next_pk))
+    nodes.extend(edges.get(pk, ()))
+
+    return nodes
+
+
+def _find_tips(snapshot_pks):
+    """The PK of the tip of each snapshot's tree; see ``BuildingSnapshot.tip``.
+
+    All the trees are loaded with one ``get_lineage`` query. Where a
+    snapshot has more than one child, the newest is followed.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs.
+    :rtype: dict, {snapshot pk: tip pk}.
+
+    """
+    snapshot_pks = set(snapshot_pks)
+    edges, _source_types = get_lineage(snapshot_pks, 'children')
+    tips = {}
+    for pk in snapshot_pks:
+        tip_pk = pk
+        while tip_pk in edges:
+            tip_pk = max(edges[tip_pk])
+        tips[pk] = tip_pk
+
+    return tips
+
+
+def get_tips(snapshot_pks):
+    """The PK of the tip of each snapshot's tree, from the stored tips.
+
+    Only snapshots without a stored tip have theirs worked out.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs.
+    :rtype: dict, {snapshot pk: tip pk}.
+
+    """
+    snapshot_pks = set(snapshot_pks)
+    tips = {}
+    # Snapshots flagged as tips are their own, whether or not they've
+    # been stored yet.
+    for pk, tip_pk, is_tip in BuildingSnapshot.objects.filter(
+        models.Q(tip_snapshot__isnull=False) | models.Q(is_tip=True),
+        pk__in=list(snapshot_pks),
+    ).values_list('pk', 'tip_snapshot_id', 'is_tip'):
+        tips[pk] = pk if is_tip else tip_pk
+    tips.update(_find_tips(snapshot_pks - set(tips)))
+
+    return tips
+
+
+# The fields ``update_tips`` maintains.
+TIP_FIELDS = ('tip_snapshot', 'is_tip')
+
+
+def _write_tips(tips):
+    """Store the tips of many snapshots, with one UPDATE.
+
+    :param tips: dict, {snapshot pk: tip pk}.
+
+    """
+    if not tips:
+        return
+
+    rows = ', '.join(['(%s::integer, %s::integer)'] * len(tips))
+    params = []
+    for pk, tip_pk in sorted(tips.items()):
+        params.extend([pk, tip_pk])
+    cursor = connection.cursor()
+    cursor.execute(
+        'UPDATE {0} AS bs SET tip_snapshot_id = v.tip_id,'
+        ' is_tip = (bs.id = v.tip_id) FROM (VALUES {1}) AS v(id, tip_id)'
+        ' WHERE bs.id = v.id'.format(BuildingSnapshot._meta.db_table, rows),
+        params
+    )
+
+
+def update_tips(snapshot_pks):
+    """Store the tips of snapshots and of all of their ancestors.
+
+    Call this with the parents whenever children are added or removed.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs.
+
+    """
+    snapshot_pks = set(snapshot_pks)
+    edges, _source_types = get_lineage(snapshot_pks, 'parents')
+    for parent_pks in edges.values():
+        snapshot_pks.update(parent_pks)
+    store_tips(snapshot_pks)
+
+
+def store_tips(snapshot_pks):
+    """Work out and store the tips of some snapshots, and mark the tips.
+
+    Unlike ``update_tips``, doesn't touch the snapshots' ancestors.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs.
+
+    """
+    tips = _find_tips(snapshot_pks)
+    # A tip is its own tip.
+    tips.update((tip_pk, tip_pk) for tip_pk in set(tips.values()))
+    _write_tips(tips)
+
+
+# The fields ``BuildingSnapshot.set_match_keys`` sets.
+MATCH_KEY_FIELDS = (
+    'match_key', 'blocking_keys', 'address_key', 'identifier_keys',
+)
+
+
+def store_match_keys(snapshot_pks):
+    """Work out and store the match keys of some snapshots, with one UPDATE.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs.
+
+    """
+    snapshots = BuildingSnapshot.objects.filter(
+        pk__in=list(snapshot_pks)
+    ).defer('extra_data', 'extra_data_sources', 'search_document')
+    params = []
+    for snapshot in snapshots:
+        snapshot.set_match_keys()
+        params.append(snapshot.pk)
+        params.extend(getattr(snapshot, field) for field in MATCH_KEY_FIELDS)
+    if not params:
+        return
+
+    columns = len(MATCH_KEY_FIELDS) + 1
+    row = '(%s::integer{0})'.format(', %s::text' * len(MATCH_KEY_FIELDS))
+    cursor = connection.cursor()
+    cursor.execute(
+        'UPDATE {0} AS bs SET {1} FROM (VALUES {2}) AS v(id, {3})'
+        ' WHERE bs.id = v.id'.format(
+            BuildingSnapshot._meta.db_table,
+            ', '.join(
+                '{0} = v.{0}'.format(field) for field in MATCH_KEY_FIELDS
+            ),
+            ', '.join([row] * (len(params) / columns)),
+            ', '.join(MATCH_KEY_FIELDS),
+        ),
+        params
+    )
+
+
+def get_promoted_columns(org_ids):
+    """The promoted extra_data columns of some orgs.
+
+    :param org_ids: iterable of int, Organization PKs.
+    :returns: dict, {org pk: list of Column inst.}, units selected.
+
+    """
+    columns = {}
+    for column in Column.objects.filter(
+        organization_id__in=list(org_ids), is_promoted=True
+    ).select_related('unit'):
+        columns.setdefault(column.organization_id, []).append(column)
+
+    return columns
+
+
+def promoted_value(value, unit_type):
+    """``value`` as ``PromotedValue`` keeps it for a unit type, or None.
+
+    Numbers are what the float casts in ``JsonQuerySet`` accept, and dates
+    are whatever ``convert_datestr`` can read.
+
+    """
+    if isinstance(value, bool):
+        return None
+    if unit_type in (FLOAT, DECIMAL):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        # NaN and Infinity.
+        if number != number or abs(number) == float('inf'):
+            return None
+        return number
+    if isinstance(value, basestring):
+        return convert_datestr(value)
+
+
+def save_promoted_values(snapshots, columns=None):
+    """Write snapshots' values of their orgs' promoted columns.
+
+    For snapshots which are new, so have no values yet; they need their
+    PKs. Called wherever snapshots are bulk inserted.
+
+    :param snapshots: list of BuildingSnapshot inst.
+    :param columns: (optional) dict, ``get_promoted_columns`` of the orgs.
+
+    """
+    if columns is None:
+        columns = get_promoted_columns(
+            set(snapshot.super_organization_id for snapshot in snapshots)
+        )
+    if not columns:
+        return
+
+    values = []
+    for snapshot in snapshots:
+        extra_data = snapshot.extra_data or {}
+        for column in columns.get(snapshot.super_organization_id, []):
+            unit_type = column.unit.unit_type
+            value = promoted_value(
+                extra_data.get(column.column_name), unit_type
+            )
+            if value is not None:
+                values.append(PromotedValue(
+                    snapshot_id=snapshot.pk,
+                    column_id=column.pk,
+                    **{PROMOTED_VALUE_FIELDS[unit_type]: value}
+                ))
+    PromotedValue.objects.bulk_create(values)
+
+
+# The fields of a snapshot's search document, by weight.
+SEARCH_DOCUMENT_FIELDS = (
+    ('A', ('pm_property_id', 'tax_lot_id')),
+    ('B', ('property_name', 'address_line_1')),
+)
+# extra_data keys whose text is searched too, at weight C.
+SEARCH_EXTRA_DATA_KEYS = (
+    'Property Type', 'Primary Property Type', 'Owner', 'Organization',
+)
+# Words, as ``seed.search.search_query`` splits searches; Postgres would
+# otherwise keep e.g. '435/422' as one token.
+SEARCH_TEXT_TEMPL = (
+    "to_tsvector('simple', regexp_replace("
+    "concat_ws(' ', {0}), '[^[:alnum:]]+', ' ', 'g'))"
+)
+
+
+def search_document_sql():
+    """The SQL for a snapshot's search document, and its params."""
+    weighted = [
+        "setweight({0}, '{1}')".format(
+            SEARCH_TEXT_TEMPL.format(', '.join(fields)), weight
+        )
+        for weight, fields in SEARCH_DOCUMENT_FIELDS
+    ]
+    weighted.append("setweight({0}, 'C')".format(SEARCH_TEXT_TEMPL.format(
+        ', '.join(['extra_data->>%s'] * len(SEARCH_EXTRA_DATA_KEYS))
+    )))
+
+    return ' || '.join(weighted), list(SEARCH_EXTRA_DATA_KEYS)
+
+
+def update_search_documents(snapshot_pks):
+    """Write the full text search documents of snapshots.
+
+    ``BuildingSnapshot.save`` calls this; call it after bulk inserting or
+    updating snapshots which may be searched.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs.
+
+    """
+    snapshot_pks = tuple(snapshot_pks)
+    if not snapshot_pks:
+        return
+
+    document, params = search_document_sql()
+    cursor = connection.cursor()
+    cursor.execute(
+        'UPDATE {0} SET search_document = {1} WHERE id IN %s'.format(
+            BuildingSnapshot._meta.db_table, document
+        ),
+        params + [snapshot_pks]
+    )
+
+
+def _update_canonicals(canons):
+    """Write the canonical snapshots and active flags of many canonicals."""
+    if not canons:
+        return
+
+    rows = ', '.join(['(%s::integer, %s::integer, %s::boolean)'] * len(canons))
+    params = []
+    for canon in canons:
+        params.extend([canon.pk, canon.canonical_snapshot_id, canon.active])
+    cursor = connection.cursor()
+    cursor.execute(
+        'UPDATE {0} AS cb SET canonical_snapshot_id = v.snapshot_id,'
+        ' active = v.active FROM (VALUES {1}) AS v(id, snapshot_id, active)'
+        ' WHERE cb.id = v.id'.format(CanonicalBuilding._meta.db_table, rows),
+        params
+    )
+
+
+def save_snapshot_matches(matches, user=None):
+    """Save many matches at once; a batched ``save_snapshot_match``.
+
+    The merged snapshots are worked out in memory, then written with a few
+    bulk inserts and updates in one transaction, instead of dozens of
+    queries per match. Matches are merged in order, so later ones build on
+    earlier ones: two buildings matched to the same canonical snapshot end
+    up in one tree, just as with a ``save_snapshot_match`` call for each.
+
+    :param matches: list of (b1 pk, b2 pk, confidence, match_type) tuples.
+    :param user: (optional) User inst, last_modified_by for new snapshots.
+    :rtype: list of BuildingSnapshot insts, the new snapshot for each match;
+        None where b1 and b2 are the same building.
+
+    """
+    from seed.mappings import mapper as seed_mapper
+    from seed.matching.ngrams import (
+        forget_canonical_buildings, index_canonical_buildings
+    )
+
+    tips = get_tips(set(
+        pk for match in matches for pk in match[:2]
+    ))
+    snapshots = BuildingSnapshot.objects.select_related(
+        'canonical_building'
+    ).in_bulk(list(set(tips.values())))
+    # One instance per canonical building, however many snapshots share it.
+    canons = {}
+    for snapshot in snapshots.values():
+        if snapshot.canonical_building_id is not None:
+            snapshot.canonical_building = canons.setdefault(
+                snapshot.canonical_building_id, snapshot.canonical_building
+            )
+    meter_through = Meter.building_snapshot.through
+    meters = {}
+    for snapshot_pk, meter_pk in meter_through.objects.filter(
+        buildingsnapshot_id__in=snapshots.keys()
+    ).values_list('buildingsnapshot_id', 'meter_id'):
+        meters.setdefault(snapshot_pk, set()).add(meter_pk)
+
+    # {snapshot pk: the new snapshot it has been merged into}
+    merged_into = {}
+
+    def current_tip(pk):
+        snapshot = snapshots[tips[pk]]
+        while snapshot.pk in merged_into:
+            snapshot = merged_into[snapshot.pk]
+        return snapshot
+
+    results = []
+    new_snapshots = []
+    snapshot_variants = []
+    children = set()
+    changed_canons = {}
+    # {canonical pk: org pk} of canonicals deactivated.
+    orgs = {}
+    for pk, (b1_pk, b2_pk, confidence, match_type) in zip(
+        reserve_snapshot_ids(len(matches)), matches
+    ):
+        # No point in linking the same building together.
+        if b1_pk == b2_pk:
+            results.append(None)
+            continue
+
+        # We don't want to match in the middle of the tree, so get the tip.
+        b1 = current_tip(b1_pk)
+        b2 = current_tip(b2_pk)
+
+        new_snapshot = BuildingSnapshot(pk=pk)
+        variants = seed_mapper.merge_attributes(
+            new_snapshot, b1, b2, seed_mapper.get_building_attrs([b1, b2])
+        )
+        snapshot_variants.extend(
+            (new_snapshot, attr, values) for attr, values in variants
+        )
+        new_snapshot.match_type = match_type or SYSTEM_MATCH
+        new_snapshot.source_type = COMPOSITE_BS
+        new_snapshot.confidence = confidence
+        new_snapshot.last_modified_by = user
+        new_snapshot.super_organization_id = b2.super_organization_id
+        new_snapshot.set_match_keys()
+
+        canon = b1.canonical_building or b2.canonical_building
+        if canon is None:
+            canon = CanonicalBuilding.objects.create()
+            canons[canon.pk] = canon
+        new_snapshot.canonical_building = canon
+        canon.canonical_snapshot = new_snapshot
+        changed_canons[canon.pk] = canon
+        # Make sure that we don't leave dead limbs in our tree.
+        for parent in (b1, b2):
+            parent_canon = parent.canonical_building
+            if parent_canon and parent_canon.pk != canon.pk:
+                parent_canon.active = False
+                changed_canons[parent_canon.pk] = parent_canon
+                orgs[parent_canon.pk] = parent.super_organization_id
+
+        meters[pk] = meters.get(b1.pk, set()) | meters.get(b2.pk, set())
+        children.update([(b1.pk, pk), (b2.pk, pk)])
+        merged_into[b1.pk] = merged_into[b2.pk] = new_snapshot
+        new_snapshots.append(new_snapshot)
+        results.append(new_snapshot)
+
+    children_through = BuildingSnapshot.children.through
+    with transaction.atomic():
+        BuildingSnapshot.objects.bulk_create(new_snapshots)
+        save_promoted_values(new_snapshots)
+        update_search_documents(snapshot.pk for snapshot in new_snapshots)
+        seed_mapper.save_variants(snapshot_variants)
+        children_through.objects.bulk_create([
+            children_through(
+                from_buildingsnapshot_id=parent_pk,
+                to_buildingsnapshot_id=child_pk,
+            )
+            for parent_pk, child_pk in sorted(children)
+        ])
+        meter_through.objects.bulk_create([
+            meter_through(buildingsnapshot_id=snapshot.pk, meter_id=meter_pk)
+            for snapshot in new_snapshots
+            for meter_pk in sorted(meters[snapshot.pk])
+        ])
+        _update_canonicals(changed_canons.values())
+        # The bulk insert skips the signal which keeps tips current.
+        update_tips(set(parent_pk for parent_pk, _child_pk in children))
+
+    # The bulk update skips the signals which keep match indexes current.
+    index_canonical_buildings(
+        canon for canon in changed_canons.values() if canon.active
+    )
+    forget_canonical_buildings(
+        (canon.pk, orgs[canon.pk]) for canon in changed_canons.values()
+        if not canon.active
+    )
+
+    return results
+
+
 def unmatch_snapshot_tree(building_pk):
     """May or may not obviate ``unmatch_snapshot``. Experimental.
 
@@ -494,8 +1053,203 @@ def _get_diff_sources(mappable, old_snapshot):
     return results
 
 
+def _edit_fields():
+    """BuildingSnapshot fields a user edit writes, besides extra_data."""
+    from seed.utils.constants import EXCLUDE_FIELDS
+    return [
+        f for f in BuildingSnapshot._meta.fields
+        if f.name not in EXCLUDE_FIELDS and f.name != 'extra_data_sources'
+    ]
+
+
+def _snapshot_values(snapshot):
+    return {
+        'fields': dict(
+            (f.attname, getattr(snapshot, f.attname)) for f in _edit_fields()
+        ),
+        'extra_data': dict(snapshot.extra_data or {}),
+        'extra_data_sources': dict(snapshot.extra_data_sources or {}),
+    }
+
+
+def _field_to_json(field, snapshot):
+    """A field's value as JSON; only dates and the like become strings.
+
+    Numbers are kept as they are, as ``value_to_string`` would round floats
+    to 12 significant digits.
+
+    """
+    value = getattr(snapshot, field.attname)
+    if value is None or isinstance(
+            value, (basestring, bool, int, long, float)):
+        return value
+    return field.value_to_string(snapshot)
+
+
+def _field_to_python(field, value):
+    if value is None:
+        return None
+    if field.rel:
+        field = field.rel.get_related_field()
+    return field.to_python(value)
+
+
+def compact_edit(snapshot, child):
+    """Keep only the values of an edit which differ from the edit of it.
+
+    Sets ``edit_delta`` to the snapshot's values, sources and extra_data
+    keys which differ from ``child``'s, and clears the rest of the row;
+    ``get_snapshot_values`` works them out again, and BuildingSnapshot's
+    manager fills them in as the snapshot is loaded.
+
+    :param snapshot: BuildingSnapshot inst., a user edit with all of its
+        values loaded.
+    :param child: BuildingSnapshot inst., the user edit of ``snapshot``.
+
+    """
+    delta = {'fields': {}}
+    for field in _edit_fields():
+        value = getattr(snapshot, field.attname)
+        if value != getattr(child, field.attname):
+            delta['fields'][field.attname] = _field_to_json(field, snapshot)
+    for name in ('extra_data', 'extra_data_sources'):
+        values = getattr(snapshot, name) or {}
+        child_values = getattr(child, name) or {}
+        delta[name] = dict(
+            (key, value) for key, value in values.items()
+            if key not in child_values or child_values[key] != value
+        )
+        delta[name + '_removed'] = [
+            key for key in child_values if key not in values
+        ]
+
+    cache.set(
+        SNAPSHOT_VALUES_KEY.format(snapshot.pk),
+        _snapshot_values(snapshot),
+        SNAPSHOT_VALUES_TIMEOUT,
+    )
+    BuildingSnapshot.objects.filter(pk=snapshot.pk).update(
+        edit_delta=delta,
+        extra_data={},
+        extra_data_sources={},
+        **dict((field.name, None) for field in _edit_fields())
+    )
+    snapshot.edit_delta = delta
+
+
+def _apply_edit_delta(values, delta):
+    fields = dict(values['fields'])
+    for field in _edit_fields():
+        if field.attname in delta['fields']:
+            fields[field.attname] = _field_to_python(
+                field, delta['fields'][field.attname]
+            )
+    result = {'fields': fields}
+    for name in ('extra_data', 'extra_data_sources'):
+        result[name] = dict(values[name])
+        for key in delta[name + '_removed']:
+            result[name].pop(key, None)
+        result[name].update(delta[name])
+
+    return result
+
+
+def get_snapshot_values(snapshot):
+    """Values of a snapshot's edit fields, extra_data and their sources.
+
+    Compacted edits (see ``compact_edit``) are worked out from the edits
+    of them, down to the first one which still has all of its values, and
+    cached.
+
+    :param snapshot: BuildingSnapshot inst.
+    :returns: dict, with the field values by attname under ``fields``, and
+        ``extra_data`` and ``extra_data_sources``.
+    :raises: BuildingSnapshot.DoesNotExist, if a compacted edit which isn't
+        cached has lost the edit of it.
+
+    """
+    compacted = []
+    values = None
+    while values is None:
+        if snapshot.edit_delta is None:
+            values = _snapshot_values(snapshot)
+        else:
+            values = cache.get(SNAPSHOT_VALUES_KEY.format(snapshot.pk))
+            if values is None:
+                compacted.append(snapshot)
+                children = list(
+                    BuildingSnapshot.objects.stored().filter(
+                        parents=snapshot
+                    )[:2]
+                )
+                if len(children) != 1:
+                    raise BuildingSnapshot.DoesNotExist(
+                        'Compacted edit {0} has {1} edits of it to work its'
+                        ' values out from, rather than one.'.format(
+                            snapshot.pk, len(children)
+                        )
+                    )
+                snapshot = children[0]
+
+    for snapshot in reversed(compacted):
+        values = _apply_edit_delta(values, snapshot.edit_delta)
+        cache.set(
+            SNAPSHOT_VALUES_KEY.format(snapshot.pk),
+            values,
+            SNAPSHOT_VALUES_TIMEOUT,
+        )
+
+    return values
+
+
+def materialize_snapshots(snapshots):
+    """Fill in the values of any compacted edits among snapshots, in place.
+
+    :param snapshots: iterable of BuildingSnapshot inst.
+
+    """
+    for snapshot in snapshots:
+        if snapshot.edit_delta is None:
+            continue
+        values = get_snapshot_values(snapshot)
+        for attname, value in values['fields'].items():
+            setattr(snapshot, attname, value)
+        snapshot.extra_data = values['extra_data']
+        snapshot.extra_data_sources = values['extra_data_sources']
+
+
+def expand_edits(snapshot_pks):
+    """Write compacted edits' values back into their rows.
+
+    Their values are worked out from the edits of them (see
+    ``get_snapshot_values``), so this is called before those are unlinked
+    or deleted.
+
+    :param snapshot_pks: iterable of int, BuildingSnapshot PKs; any which
+        aren't compacted edits are left alone.
+
+    """
+    snapshots = BuildingSnapshot.objects.filter(
+        pk__in=list(snapshot_pks), edit_delta__isnull=False
+    )
+    for snapshot in snapshots:
+        # Loaded with its values filled in.
+        snapshot.edit_delta = None
+        snapshot.save()
+
+
 def update_building(old_snapshot, updated_values, user, *args, **kwargs):
-    """Creates a new snapshot with updated values."""
+    """Creates a new snapshot with updated values.
+
+    The new snapshot is put together in memory and written with a single
+    INSERT. Sources of unchanged fields are copied by PK, without loading
+    the source snapshots.
+
+    If the old snapshot was itself an edit, it's compacted to the values
+    this edit changes (see ``compact_edit``), so a building edited many
+    times keeps just one full copy of its values.
+
+    """
     from seed.mappings import seed_mappings, mapper as seed_mapper
 
     mappable, meta, sources = _get_filtered_values(updated_values)
@@ -505,18 +1259,20 @@ def update_building(old_snapshot, updated_values, user, *args, **kwargs):
     extra_data = extra_data or old_snapshot.extra_data or {}
 
     canon = old_snapshot.canonical_building or None
-    # Need to hydrate sources
-    sources = {
-        k: BuildingSnapshot.objects.get(pk=v) for k, v in sources.items() if v
-    }
 
     # Handle the mapping of "normal" attributes.
     new_snapshot = mapper.map_row(
         mappable,
         dict(seed_mappings.BuildingSnapshot_to_BuildingSnapshot),
         BuildingSnapshot,
-        initial_data=sources  # Copy parent's source attributes.
     )
+    # Copy parent's source attributes.
+    for source, source_pk in sources.items():
+        if source_pk:
+            setattr(new_snapshot, '{0}_id'.format(source), source_pk)
+    # Sources and extra_data sources point at the new snapshot, so it needs
+    # its PK before it's saved.
+    new_snapshot.pk = reserve_snapshot_ids(1)[0]
 
     diff_sources = _get_diff_sources(mappable, old_snapshot)
     for diff in diff_sources:
@@ -525,14 +1281,11 @@ def update_building(old_snapshot, updated_values, user, *args, **kwargs):
     # convert dates to something django likes
     new_snapshot.clean()
     new_snapshot.canonical_building = canon
-    new_snapshot.save()
     # All all the orgs the old snapshot had.
-    new_snapshot.super_organization = old_snapshot.super_organization
+    new_snapshot.super_organization_id = old_snapshot.super_organization_id
     # Move the meta data over.
     for meta_val in meta:
         setattr(new_snapshot, meta_val, meta[meta_val])
-    # Insert new_snapshot into the inheritence chain
-    old_snapshot.children.add(new_snapshot)
     new_snapshot.import_file_id = old_snapshot.import_file_id
 
     new_snapshot.extra_data = extra_data
@@ -543,10 +1296,17 @@ def update_building(old_snapshot, updated_values, user, *args, **kwargs):
     )
     new_snapshot.extra_data = extra
     new_snapshot.extra_data_sources = sources
-    new_snapshot.save()
+    new_snapshot.save(force_insert=True)
+    save_promoted_values([new_snapshot])
+    # Insert new_snapshot into the inheritence chain
+    old_snapshot.children.add(new_snapshot)
+    # Edits are the only snapshots with a single parent.
+    if (old_snapshot.edit_delta is None
+            and old_snapshot.parents.count() == 1):
+        compact_edit(old_snapshot, new_snapshot)
 
     # If we had a canonical building and its can_snapshot was old, update.
-    if canon and canon.canonical_snapshot == old_snapshot:
+    if canon and canon.canonical_snapshot_id == old_snapshot.pk:
         canon.canonical_snapshot = new_snapshot
         canon.save()
 
@@ -559,8 +1319,9 @@ def update_building(old_snapshot, updated_values, user, *args, **kwargs):
     )
 
     # Check to see if there are any new ``extra_data`` fields added for this
-    # org.
-    save_column_names(new_snapshot)
+    # org; the old snapshot's are already saved.
+    if set(new_snapshot.extra_data) - set(old_snapshot.extra_data or {}):
+        save_column_names(new_snapshot)
 
     return new_snapshot
 
@@ -640,6 +1401,36 @@ def get_column_mappings(organization):
     return mapping, concat_confs
 
 
+def get_mapping_revision(organization_id):
+    """Returns an opaque token which changes whenever an org's mappings do.
+
+    :param organization_id: int, PK of an Organization.
+    :returns: str.
+
+    """
+    key = MAPPING_REVISION_KEY.format(organization_id)
+    revision = cache.get(key)
+    if revision is None:
+        # If another worker gets here first, use their revision instead.
+        cache.add(key, uuid.uuid4().hex, MAPPING_CACHE_TIMEOUT)
+        revision = cache.get(key)
+
+    return revision
+
+
+def invalidate_mapping_revision(organization_id):
+    """Start a new mapping revision, e.g. after a ColumnMapping changes.
+
+    :param organization_id: int, PK of an Organization.
+
+    """
+    cache.set(
+        MAPPING_REVISION_KEY.format(organization_id),
+        uuid.uuid4().hex,
+        MAPPING_CACHE_TIMEOUT
+    )
+
+
 def save_column_names(bs, mapping=None):
     """Save unique column names for extra_data in this organization.
 
@@ -892,6 +1683,9 @@ class Column(models.Model):
     unit = models.ForeignKey(Unit, blank=True, null=True)
     enum = models.ForeignKey(Enum, blank=True, null=True)
     is_extra_data = models.BooleanField(default=False)
+    # Numeric and date extra_data columns can have their values kept, typed
+    # and indexed, in ``PromotedValue``; see seed.utils.promoted_columns.
+    is_promoted = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ('organization', 'column_name', 'is_extra_data')
@@ -1000,6 +1794,81 @@ class Schema(models.Model):
         )
 
 
+# Where ``PromotedValue`` keeps each type of unit.
+PROMOTED_VALUE_FIELDS = {
+    FLOAT: 'float_value',
+    DECIMAL: 'float_value',
+    DATE: 'date_value',
+    DATETIME: 'date_value',
+}
+
+
+class PromotedValue(models.Model):
+    """A snapshot's value of a promoted extra_data column, typed.
+
+    Range filters on these are index scans, where on extra_data they cast
+    every row's value.
+
+    """
+    snapshot = models.ForeignKey(
+        'BuildingSnapshot', related_name='promoted_values'
+    )
+    column = models.ForeignKey(Column, related_name='promoted_values')
+    float_value = models.FloatField(blank=True, null=True)
+    date_value = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ('snapshot', 'column')
+        index_together = [
+            ('column', 'float_value'),
+            ('column', 'date_value'),
+        ]
+
+    def __unicode__(self):
+        return u'{0}: {1}'.format(self.snapshot_id, self.column_id)
+
+
+class ExtraDataKeyUsage(models.Model):
+    """How often, and how slowly, an org searches on an extra_data key.
+
+    Kept by ``seed.utils.extra_data_indexes``, which indexes the busiest
+    keys. Counts and times start over when a key is indexed, so they can be
+    compared with ``seconds_per_query_before``.
+
+    """
+    organization = models.ForeignKey(
+        SuperOrganization, related_name='extra_data_key_usage'
+    )
+    key = models.CharField(max_length=512)
+    # 'float' or 'text', as the key was compared.
+    key_cast = models.CharField(max_length=16)
+    filter_count = models.IntegerField(default=0)
+    sort_count = models.IntegerField(default=0)
+    # Total time of the searches which used the key.
+    seconds = models.FloatField(default=0)
+    index_name = models.CharField(max_length=63, blank=True, null=True)
+    indexed_at = models.DateTimeField(blank=True, null=True)
+    seconds_per_query_before = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ('organization', 'key', 'key_cast')
+
+    @property
+    def query_count(self):
+        return self.filter_count + self.sort_count
+
+    @property
+    def seconds_per_query(self):
+        if not self.query_count:
+            return None
+        return self.seconds / self.query_count
+
+    def __unicode__(self):
+        return u'{0}: {1} ({2})'.format(
+            self.organization_id, self.key, self.key_cast
+        )
+
+
 class CanonicalManager(models.Manager):
     """Manager to add useful model filtering methods"""
     def get_queryset(self):
@@ -1037,6 +1906,48 @@ class CanonicalBuilding(models.Model):
         )
 
 
+class BuildingSnapshotQuerySet(JsonQuerySet):
+    """Fills in the values of compacted user edits as they're loaded.
+
+    See ``compact_edit``. Values querysets and deferred loads read just the
+    stored columns, which are blank for compacted edits.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(BuildingSnapshotQuerySet, self).__init__(*args, **kwargs)
+        self.materialize = True
+
+    def _clone(self, *args, **kwargs):
+        clone = super(BuildingSnapshotQuerySet, self)._clone(*args, **kwargs)
+        clone.materialize = self.materialize
+        return clone
+
+    def stored(self):
+        """Load compacted edits as they're stored, without their values."""
+        clone = self._clone()
+        clone.materialize = False
+        return clone
+
+    def iterator(self):
+        for snapshot in super(BuildingSnapshotQuerySet, self).iterator():
+            if (self.materialize and not snapshot._deferred
+                    and snapshot.edit_delta is not None):
+                materialize_snapshots([snapshot])
+            yield snapshot
+
+
+class BuildingSnapshotManager(JsonManager):
+    # So that parents, children and sources are filled in, too.
+    use_for_related_fields = True
+
+    def get_queryset(self):
+        return BuildingSnapshotQuerySet(model=self.model, using=self._db)
+
+    def stored(self):
+        return self.get_queryset().stored()
+
+
 class BuildingSnapshot(TimeStampedModel):
     """The periodical composite of a building from disparate data sources.
 
@@ -1291,6 +2202,35 @@ class BuildingSnapshot(TimeStampedModel):
     )
     # How we determine which subset of `'BuildingSnapshot'` to bubble up.
     confidence = models.FloatField(null=True, blank=True, db_index=True)
+    # Normalized match string, kept for trigram searches of canonical
+    # snapshots. Trigram indexed (gin_trgm_ops) by migration 0031.
+    match_key = models.TextField(null=True, blank=True)
+    # The blocking keys trigram searches are restricted to, joined by
+    # seed.matching.blocking.join_blocking_keys.
+    blocking_keys = models.TextField(null=True, blank=True)
+    # The tip (leaf) of the snapshot's tree, and whether this is it. Kept
+    # up to date by ``update_tips`` as children are added and removed; null
+    # for snapshots which have never had a child or parent since being
+    # created or backfilled (see the ``backfill_tips`` command).
+    tip_snapshot = models.ForeignKey(
+        'BuildingSnapshot',
+        null=True,
+        blank=True,
+        related_name='tip_of',
+        on_delete=models.SET_NULL,
+    )
+    is_tip = models.BooleanField(default=True)
+    # Normalized address_line_1 and IDs, for exact lookups (see
+    # seed.utils.address). identifier_keys is space separated, and
+    # string_to_array(identifier_keys, ' ') is GIN indexed by migration 0032.
+    address_key = models.CharField(
+        max_length=255, null=True, blank=True, db_index=True
+    )
+    identifier_keys = models.TextField(null=True, blank=True)
+    # Weighted IDs, name, address and a few extra_data keys for full text
+    # search, written by ``update_search_documents`` and GIN indexed by
+    # migration 0037.
+    search_document = TSVectorField()
     # Setting NULL/BLANK so we can use get_or_create.
     last_modified_by = models.ForeignKey(User, null=True, blank=True)
     # Tells us whether this is pulled from AS-Raw data, PM-Raw data, or BS.
@@ -1308,11 +2248,15 @@ class BuildingSnapshot(TimeStampedModel):
     ###
 
     # 'key' -> 'value'
-    extra_data = JSONField()
+    extra_data = JSONBField()
     # 'key' -> ['model', 'fk'], what was the model and its FK?
-    extra_data_sources = JSONField()
+    extra_data_sources = JSONBField()
+    # Set once a user edit has been edited again, to the values which differ
+    # from the next edit's; the rest of its values are cleared. See
+    # ``compact_edit`` and ``get_snapshot_values``.
+    edit_delta = JSONBField(null=True, blank=True, default=None)
 
-    objects = JsonManager()
+    objects = BuildingSnapshotManager()
 
     def clean(self, *args, **kwargs):
         super(BuildingSnapshot, self).clean(*args, **kwargs)
@@ -1334,6 +2278,54 @@ class BuildingSnapshot(TimeStampedModel):
             if value and isinstance(value, basestring):
                 setattr(self, field, convert_datestr(value))
 
+    def set_match_keys(self):
+        """Set ``match_key``, ``blocking_keys``, ``address_key`` and
+        ``identifier_keys``.
+
+        ``save`` calls this; call it before bulk creating snapshots.
+
+        """
+        from seed.matching import blocking
+        from seed.matching.identifiers import ID_FIELDS
+        from seed.matching.ngrams import MATCH_FIELDS, stringify
+        self.match_key = stringify([
+            unicode(getattr(self, field) or '') for field in MATCH_FIELDS
+        ])
+        self.blocking_keys = blocking.join_blocking_keys(
+            blocking.blocking_keys([
+                unicode(getattr(self, field) or '')
+                for field in blocking.BLOCKING_FIELDS
+            ])
+        )
+        self.address_key = address.normalize_address(self.address_line_1)
+        self.identifier_keys = address.join_identifier_keys(
+            address.identifier_keys(
+                getattr(self, field) for field in ID_FIELDS
+            )
+        )
+
+    def save(self, *args, **kwargs):
+        """Overrides default model save to keep the match keys and search
+        document up to date.
+
+        Saving a snapshot that's already in the database leaves the stored
+        tip alone, as ``update_tips`` may have changed it since this
+        instance was loaded. The search document is worked out again from
+        the saved row by ``update_search_documents``.
+
+        """
+        self.set_match_keys()
+        if (not self._state.adding and not self._deferred
+                and 'update_fields' not in kwargs
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.fields
+                if not f.primary_key and f.name not in TIP_FIELDS
+                and f.name != 'search_document'
+            ]
+        super(BuildingSnapshot, self).save(*args, **kwargs)
+        update_search_documents([self.pk])
+
     def to_dict(self, fields=None):
         """
         Returns a dict version of this building, either with all fields
@@ -1386,12 +2378,10 @@ class BuildingSnapshot(TimeStampedModel):
     @property
     def co_parent(self):
         """returns the first co-parent as a BuildingSnapshot inst"""
-        if not self.has_children:
-            return
-        first_child = self.children.all()[0]
-        for parent in first_child.parents.all():
-            if parent.pk != self.pk:
-                return parent
+        first_child = self.children.values_list('pk', flat=True)[:1]
+        return BuildingSnapshot.objects.filter(
+            children__in=first_child
+        ).exclude(pk=self.pk).first()
 
     @property
     def co_parents(self):
@@ -1403,19 +2393,18 @@ class BuildingSnapshot(TimeStampedModel):
     def recurse_tree(self, attr):
         """Recurse M2M relationship tree, extending list as we go.
 
+        The tree is loaded with one query (see ``get_lineage``) and the
+        snapshots in it with another.
+
         :param attr: str, name of attribute we wish to traverse.
             .e.g. 'children', or 'parents'
 
         """
-        nodes = []
-        node_type = getattr(self, attr)
-        # N.B. We're expecting a Django M2M attribute here.
-        for node in node_type.all():
-            nodes.extend(node.recurse_tree(attr))
+        edges, _source_types = get_lineage([self.pk], attr)
+        pks = walk_lineage(edges, self.pk)
+        snapshots = BuildingSnapshot.objects.in_bulk(pks)
 
-        nodes.extend(node_type.all())
-
-        return nodes
+        return [snapshots[pk] for pk in pks]
 
     @property
     def child_tree(self):
@@ -1434,10 +2423,16 @@ class BuildingSnapshot(TimeStampedModel):
     @property
     def tip(self):
         """returns the tip (leaf) of the BuildingSnapshot tree"""
-        children = self.child_tree
+        # The stored tip, read fresh in case this instance is out of date.
+        tips = list(BuildingSnapshot.objects.filter(tip_of=self.pk))
+        if tips:
+            return tips[0]
+
+        edges, _source_types = get_lineage([self.pk], 'children')
+        children = walk_lineage(edges, self.pk)
         if children:
-            # we could also sort by id here to ensure the most recent child
-            return children[-1]
+            # The last of child_tree.
+            return BuildingSnapshot.objects.get(pk=children[0])
         else:
             return self
 
@@ -1491,3 +2486,101 @@ class TimeSeries(models.Model):
     meter = models.ForeignKey(
         Meter, related_name='timeseries_data', null=True, blank=True
     )
+
+
+def column_mapping_changed(sender, instance, **kwargs):
+    """Invalidate the mapping revision of the org whose mappings changed."""
+    if not kwargs.get('action', 'post_').startswith('post_'):
+        return
+
+    if isinstance(instance, ColumnMapping):
+        organization_id = instance.super_organization_id
+    else:
+        # The reverse side of the M2M, e.g. ``column.raw_mappings.add(...)``.
+        organization_id = instance.organization_id
+
+    if organization_id is not None:
+        invalidate_mapping_revision(organization_id)
+
+
+def column_changed(sender, instance, **kwargs):
+    """Invalidate the mapping revisions of the orgs mapping to a column.
+
+    Compiled mapping plans clean values by their columns' units.
+
+    """
+    org_ids = set(ColumnMapping.objects.filter(
+        column_mapped=instance
+    ).values_list('super_organization_id', flat=True))
+    org_ids.add(instance.organization_id)
+    for organization_id in org_ids - set([None]):
+        invalidate_mapping_revision(organization_id)
+
+
+def snapshot_deleted(sender, instance, **kwargs):
+    """Expand compacted edits of a snapshot before it's deleted."""
+    expand_edits(instance.parents.values_list('pk', flat=True))
+
+
+def canonical_building_saved(sender, instance, **kwargs):
+    """Keep the org's n-gram match index in step with its canonicals."""
+    from seed.matching.ngrams import canonical_building_changed
+    canonical_building_changed(instance)
+
+
+def canonical_building_deleted(sender, instance, **kwargs):
+    from seed.matching.ngrams import canonical_building_changed
+    canonical_building_changed(instance, deleted=True)
+
+
+def snapshot_children_changed(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Keep stored tips in step with the snapshot tree.
+
+    Also expands compacted edits before they're unlinked from the edits
+    their values are worked out from.
+
+    """
+    if action == 'pre_remove':
+        expand_edits(pk_set if reverse else [instance.pk])
+        return
+    if action == 'pre_clear' and reverse:
+        # Once cleared, we can't tell whose child this was.
+        instance._cleared_parent_pks = list(
+            instance.parents.values_list('pk', flat=True)
+        )
+        expand_edits(instance._cleared_parent_pks)
+        return
+    if action == 'pre_clear':
+        expand_edits([instance.pk])
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_clear':
+        parent_pks = (
+            instance.__dict__.pop('_cleared_parent_pks', [])
+            if reverse else [instance.pk]
+        )
+    else:
+        parent_pks = pk_set if reverse else [instance.pk]
+    update_tips(parent_pks)
+
+
+post_save.connect(column_mapping_changed, sender=ColumnMapping)
+post_delete.connect(column_mapping_changed, sender=ColumnMapping)
+m2m_changed.connect(
+    column_mapping_changed, sender=ColumnMapping.column_raw.through
+)
+m2m_changed.connect(
+    column_mapping_changed, sender=ColumnMapping.column_mapped.through
+)
+post_save.connect(column_changed, sender=Column)
+# Before the column's mappings are deleted along with it.
+pre_delete.connect(column_changed, sender=Column)
+post_save.connect(canonical_building_saved, sender=CanonicalBuilding)
+post_delete.connect(canonical_building_deleted, sender=CanonicalBuilding)
+m2m_changed.connect(
+    snapshot_children_changed, sender=BuildingSnapshot.children.through
+)
+pre_delete.connect(snapshot_deleted, sender=BuildingSnapshot)
@@ -8,6 +8,7 @@ Search methods pertaining to buildings.
 # python
 import operator
 import json
+import re
 
 # django
 from django.db.models import Q
@@ -18,6 +19,7 @@ from superperms.orgs.models import Organization
 # app
 from .models import BuildingSnapshot
 from .utils.mapping import get_mappable_types
+from .utils.promoted_columns import filter_promoted, get_searchable_columns
 from public.models import PUBLIC
 
 
@@ -40,26 +42,62 @@ def get_building_fieldnames():
     ]
 
 
-def search_buildings(q, fieldnames=None, queryset=None):
+# Words of a search, as ``update_search_documents`` splits documents.
+WORD_REGEX = re.compile(r'[^\W_]+', re.UNICODE)
+SEARCH_QUERY_TEMPL = "to_tsquery('simple', %s)"
+
+
+def search_query(q):
+    """returns the tsquery text for a search string, or None if it has no
+    words. Every word has to match the start of a word in the document, so
+    '123 mai' finds '123 Main St'.
+    """
+    words = WORD_REGEX.findall(unicode(q).lower())
+    return u' & '.join(u'{0}:*'.format(word) for word in words) or None
+
+
+def search_buildings(q, fieldnames=None, queryset=None, rank=False):
     """returns a queryset for matching buildings
 
+    By default, matches ``q`` against the snapshots' full text search
+    documents (see ``seed.models.update_search_documents``), which cover
+    the fields from get_building_fieldnames() and some extra_data.
+
     :param str or unicode q: search string
-    :param list fieldnames: list of BuildingSnapshot model fieldnames
-        (defaults to those generated by get_building_field_names())
+    :param list fieldnames: list of BuildingSnapshot model fieldnames to
+        search with ``icontains`` instead of the search documents
     :param queryset: optional queryset to filter from, defaults to
         BuildingSnapshot.objects.none()
+    :param bool rank: order the results by relevance, most relevant first
     :returns: :queryset: queryset of matching buildings
     """
-    if fieldnames is None:
-        fieldnames = get_building_fieldnames()
     if queryset is None:
         queryset = BuildingSnapshot.objects.none()
     if q == '':
         return queryset
-    qgroup = reduce(operator.or_, (
-        Q(**{fieldname + '__icontains': q}) for fieldname in fieldnames
-    ))
-    return queryset.filter(qgroup)
+    if fieldnames is not None:
+        qgroup = reduce(operator.or_, (
+            Q(**{fieldname + '__icontains': q}) for fieldname in fieldnames
+        ))
+        return queryset.filter(qgroup)
+
+    query = search_query(q)
+    if query is None:
+        return queryset.none()
+    document = '{0}.search_document'.format(BuildingSnapshot._meta.db_table)
+    queryset = queryset.extra(
+        where=['{0} @@ {1}'.format(document, SEARCH_QUERY_TEMPL)],
+        params=[query],
+    )
+    if rank:
+        queryset = queryset.extra(
+            select={'search_rank': 'ts_rank({0}, {1})'.format(
+                document, SEARCH_QUERY_TEMPL
+            )},
+            select_params=[query],
+            order_by=['-search_rank', 'pk'],
+        )
+    return queryset
 
 
 def generate_paginated_results(queryset, number_per_page=25, page=1,
@@ -97,11 +135,7 @@ def generate_paginated_results(queryset, number_per_page=25, page=1,
     number_per_page = min(MAX_RESULTS, number_per_page)
     start = page * number_per_page
     end = start + number_per_page
-    if isinstance(queryset, list):
-        # hack until we can sort json_queryset as a queryset
-        building_count = len(queryset)
-    else:
-        building_count = queryset.count()
+    building_count = queryset.count()
 
     if start > building_count:
         return []
@@ -158,7 +192,7 @@ def is_not_whitelist_building(parent_org, building, whitelist_orgs):
     return (parent_org and building.super_organization not in whitelist_orgs)
 
 
-def filter_other_params(queryset, other_params, db_columns):
+def filter_other_params(queryset, other_params, db_columns, orgs=None):
     """applyes a dictionary filter to the query set. Does some domain specific
     parsing,
        mostly to remove extra query params and deal with ranges.
@@ -168,6 +202,8 @@ def filter_other_params(queryset, other_params, db_columns):
     :param Django Queryset queryset: queryset to be filtered
     :param dict other_params: dictionary to be parsed and applied to filter.
     :param dict db_columns: list of column names, extra_data blob outsite these
+    :param orgs: (optional) Organization insts. searched; ranges on columns
+        they've promoted filter the typed values instead of extra_data.
     :returns: Django Queryset:
     """
     def strip_suffix(k, suffix):
@@ -203,6 +239,8 @@ def filter_other_params(queryset, other_params, db_columns):
 
     queryset = queryset.filter(**query_dict)
 
+    promoted = get_searchable_columns(orgs) if orgs is not None else {}
+
     # handle extra_data with json_query
     for k, v in other_params.iteritems():
         if (not is_column(k, db_columns)) and k != 'q' and v != '':
@@ -220,6 +258,10 @@ def filter_other_params(queryset, other_params, db_columns):
                 v = "%{0}%".format(v)
             case_insensitive = key_cast == 'text'
 
+            if key_cast == 'float' and k in promoted:
+                queryset = filter_promoted(queryset, promoted[k], cond, v)
+                continue
+
             queryset = queryset.json_query(
                 k,
                 cond=cond,
@@ -243,6 +285,7 @@ def parse_body(request):
         'number_per_page': int, number per pagination page
         'show_shared_buildings': bool, whether to search across all user's orgs
         'q': str, global search param
+        'rank': bool, True if results should be ordered by relevance to q
         'other_search_params': dict, filter params
         'project_id': str, project id if exists in body
     }
@@ -261,6 +304,8 @@ def parse_body(request):
         exclude = {}
 
     order_by = body.get('order_by', 'tax_lot_id')
+    # Searches without a sort column of their own come back by relevance.
+    rank = bool(q) and not order_by
     if order_by == '':
         order_by = 'tax_lot_id'
     sort_reverse = body.get('sort_reverse', False)
@@ -283,6 +328,7 @@ def parse_body(request):
         'number_per_page': number_per_page,
         'show_shared_buildings': show_shared_buildings,
         'q': q,
+        'rank': rank,
         'other_search_params': other_search_params,
         'project_id': body.get('project_id')
     }
@@ -336,7 +382,7 @@ def get_orgs_w_public_fields():
 
 
 def search_public_buildings(request, orgs):
-    """returns a queryset or list of buildings matching the search params and
+    """returns a queryset of buildings matching the search params and
         count
     :param request: wsgi request (Django) for parsing params
     :orgs: list of Organization instances to search within
@@ -355,14 +401,15 @@ def search_public_buildings(request, orgs):
         params['exclude'],
         params['order_by'],
         extra_data_sort=extra_data_sort,
+        rank=params['rank'],
     )
 
     # full text search across a couple common fields
     buildings_queryset = search_buildings(
-        params['q'], queryset=building_snapshots
+        params['q'], queryset=building_snapshots, rank=params['rank']
     )
     buildings_queryset = filter_other_params(
-        buildings_queryset, other_search_params, db_columns
+        buildings_queryset, other_search_params, db_columns, orgs=orgs
     )
     if extra_data_sort:
         buildings_queryset = buildings_queryset.json_query(
@@ -370,10 +417,7 @@ def search_public_buildings(request, orgs):
             order_by=params['order_by'],
             order_by_rev=params['sort_reverse'],
         )
-    if isinstance(buildings_queryset, list):
-        buildings_count = len(buildings_queryset)
-    else:
-        buildings_count = buildings_queryset.count()
+    buildings_count = buildings_queryset.count()
 
     return buildings_queryset, buildings_count
 
@@ -384,6 +428,7 @@ def create_building_queryset(
     order_by,
     other_orgs=None,
     extra_data_sort=False,
+    rank=False,
 ):
     """creates a querset of buildings within orgs. If ``other_orgs``, buildings
     in both orgs and other_orgs will be represented in the queryset.
@@ -392,10 +437,16 @@ def create_building_queryset(
     :param exclude: django query exclude dict.
     :param order_by: django query order_by str.
     :param other_orgs: list of other orgs to ``or`` the query
+    :param extra_data_sort: leave the queryset unordered, to be ordered by
+        an extra_data key
+    :param rank: leave the queryset unordered, to be ordered by relevance
     """
     distinct_order_by = order_by.lstrip('-')
+    # Compare against org ids rather than a subquery, so the per org
+    # indexes from seed.utils.extra_data_indexes can be used.
+    orgs = list(orgs)
     if other_orgs:
-        if extra_data_sort:
+        if extra_data_sort or rank:
             return BuildingSnapshot.objects.filter(
                 (
                     Q(super_organization__in=orgs) |
@@ -414,7 +465,7 @@ def create_building_queryset(
                 canonicalbuilding__active=True
             ).exclude(**exclude).distinct(distinct_order_by, 'pk')
     else:
-        if extra_data_sort:
+        if extra_data_sort or rank:
             return BuildingSnapshot.objects.filter(
                 super_organization__in=orgs,
                 canonicalbuilding__active=True
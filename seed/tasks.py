@@ -4,9 +4,7 @@
 import calendar
 import datetime
 from dateutil import parser
-import re
-import string
-import operator
+import itertools
 import os
 
 from django.core.mail import send_mail
@@ -16,7 +14,7 @@ from django.utils.encoding import force_bytes
 from django.template import loader
 from django.core.cache import cache
 from django.core.files.storage import DefaultStorage
-from django.db.models import Q
+from django.db.models import F
 from django.db.models.loading import get_model
 from django.core.urlresolvers import reverse_lazy
 
@@ -28,7 +26,6 @@ from mcm import cleaners, mapper, reader
 from mcm.data.ESPM import espm as espm_schema
 from mcm.data.SEED import seed as seed_schema
 from mcm.utils import batch
-import ngram
 
 from data_importer.models import (
     ImportFile, ImportRecord, STATUS_READY_TO_MERGE, ROW_DELIMITER
@@ -45,15 +42,21 @@ from seed.models import (
     GREEN_BUTTON_BS,
     BS_VALUES_LIST,
     Column,
+    MAPPING_CACHE_TIMEOUT,
     get_column_mappings,
+    get_promoted_columns,
+    get_mapping_revision,
     find_unmatched_buildings,
-    find_canonical_building_values,
     SYSTEM_MATCH,
     POSSIBLE_MATCH,
     initialize_canonical_building,
+    reserve_snapshot_ids,
     set_initial_sources,
     save_snapshot_match,
+    save_snapshot_matches,
     save_column_names,
+    save_promoted_values,
+    update_search_documents,
     BuildingSnapshot,
     CanonicalBuilding,
     Compliance,
@@ -61,9 +64,21 @@ from seed.models import (
     ProjectBuilding,
 )
 
-from seed.decorators import lock_and_track, get_prog_key, increment_cache
+from seed.decorators import (
+    SEED_CACHE_PREFIX, lock_and_track, get_prog_key, increment_cache,
+)
+from seed.matching.blocking import (
+    BLOCKING_FIELDS, blocking_keys, get_blocking_keys
+)
+from seed.matching.engines import get_engine_class
+from seed.matching.identifiers import IdentifierIndex, filter_by_ids
+from seed.matching.ngrams import (
+    get_match_index, invalidate_match_index, save_match_index, stringify
+)
 from seed.utils.buildings import get_source_type, get_search_query
+from seed.utils.cleaning import BatchCleaner
 from seed.utils.mapping import get_mappable_columns
+from seed.utils.shards import get_shards, read_shard
 
 from superperms.orgs.models import Organization
 
@@ -77,9 +92,19 @@ MIN_CONF = .80
 # Knows how to clean floats for ESPM data.
 ASSESSED_CLEANER = cleaners.Cleaner(seed_schema.schema)
 PORTFOLIO_CLEANER = cleaners.Cleaner(espm_schema.schema)
-PUNCT_REGEX = re.compile('[{0}]'.format(
-    re.escape(string.punctuation)
-))
+MAPPING_PLAN_KEY = SEED_CACHE_PREFIX.format('MAPPING_PLAN') + ':{0}:{1}'
+# This process's compiled MappingPlans, {org_pk: (revision, plan)}.
+_MAPPING_PLANS = {}
+# Approximate size in bytes of each slice of a CSV parsed by one worker.
+RAW_DATA_SHARD_SIZE = getattr(settings, 'RAW_DATA_SHARD_SIZE', 16 * 1024 ** 2)
+# Map rows as they're parsed when an org already has mappings for a file.
+FUSED_IMPORT = getattr(settings, 'FUSED_IMPORT', False)
+# Number of unmatched buildings scored per task.
+MATCH_CHUNK_SIZE = 500
+# Number of matches merged per transaction.
+MERGE_BATCH_SIZE = 500
+# Number of rows saved at a time from files which can't be split by bytes.
+RAW_DATA_BATCH_ROWS = 100
 
 
 @task
@@ -410,6 +435,15 @@ def _build_cleaner(org):
     Basically, this just tells us how to try and cast types during cleaning
     based on the Column definition in the database.
 
+    :param org: superperms.orgs.Organization instance.
+    :returns: mcm.cleaners.Cleaner inst.
+    """
+    return cleaners.Cleaner(_build_cleaner_schema(org))
+
+
+def _build_cleaner_schema(org):
+    """Return the schema ``_build_cleaner`` configures its cleaner with.
+
     :param org: superperms.orgs.Organization instance.
     :returns: dict of dicts. {'types': {'col_name': 'type'},}
     """
@@ -429,7 +463,7 @@ def _build_cleaner(org):
     # column types.
     units['types'].update(seed_schema.schema['types'])
 
-    return cleaners.Cleaner(units)
+    return units
 
 
 def apply_extra_data(model, key, value):
@@ -451,6 +485,69 @@ def apply_data_func(mappable_columns):
     return result_fn
 
 
+class MappingPlan(object):
+    """Everything ``map_row_chunk`` needs to map an org's raw rows.
+
+    Plans are compiled once per mapping revision (see
+    ``seed.models.get_mapping_revision``) and shared between chunks, rather
+    than every chunk querying for its org's mappings and units again.
+
+    """
+
+    def __init__(self, mapping, concats, cleaner_schema, mappable_columns):
+        self.mapping = mapping
+        self.concats = concats
+        self.cleaner = cleaners.Cleaner(cleaner_schema)
+        self.types = cleaner_schema['types']
+        mappable_columns = set(mappable_columns)
+        # For those column mapping which are not db columns, we
+        # need to let MCM know that we apply our mapping function to those.
+        self.apply_columns = [
+            raw for raw, mapped in mapping.items()
+            if mapped not in mappable_columns
+        ]
+        self.apply_func = apply_data_func(mappable_columns)
+
+
+def _compile_mapping_plan(org):
+    """Query for the parts of an org's MappingPlan, in a cacheable form."""
+    mapping, concats = get_column_mappings(org)
+
+    return {
+        'mapping': mapping,
+        'concats': concats,
+        'cleaner_schema': _build_cleaner_schema(org),
+        'mappable_columns': list(get_mappable_columns()),
+    }
+
+
+def get_mapping_plan(org):
+    """Return the MappingPlan for an org's current mapping revision.
+
+    Plans are kept in memory for the life of the process, and in the cache
+    so that other workers can skip compiling them.
+
+    :param org: superperms.orgs.Organization instance.
+    :returns: MappingPlan inst.
+
+    """
+    revision = get_mapping_revision(org.pk)
+    cached = _MAPPING_PLANS.get(org.pk)
+    if cached is not None and cached[0] == revision:
+        return cached[1]
+
+    key = MAPPING_PLAN_KEY.format(org.pk, revision)
+    parts = cache.get(key)
+    if parts is None:
+        parts = _compile_mapping_plan(org)
+        cache.set(key, parts, MAPPING_CACHE_TIMEOUT)
+
+    plan = MappingPlan(**parts)
+    _MAPPING_PLANS[org.pk] = (revision, plan)
+
+    return plan
+
+
 @task
 def map_row_chunk(
     chunk, file_pk, source_type, prog_key, increment, *args, **kwargs
@@ -467,39 +564,39 @@ def map_row_chunk(
 
     """
     import_file = ImportFile.objects.get(pk=file_pk)
-    save_type = PORTFOLIO_BS
-    if source_type == ASSESSED_RAW:
-        save_type = ASSESSED_BS
+    _map_rows(chunk, import_file, source_type, *args, **kwargs)
 
-    concats = []
+    increment_cache(prog_key, increment)
 
-    org = Organization.objects.get(
-        pk=import_file.import_record.super_organization.pk
-    )
 
-    mapping, concats = get_column_mappings(org)
-    map_cleaner = _build_cleaner(org)
+def _map_rows(rows, import_file, source_type, *args, **kwargs):
+    """Map raw rows with the org's MappingPlan and save them.
 
-    # For those column mapping which are not db columns, we
-    # need to let MCM know that we apply our mapping function to those.
-    apply_columns = []
+    :param rows: list of dict, raw rows keyed by raw column name.
+    :param import_file: ImportFile inst.
+    :param source_type: int, represented by either ASSESSED_RAW, or
+        PORTFOLIO_RAW.
 
-    mappable_columns = get_mappable_columns()
-    for item in mapping:
-        if mapping[item] not in mappable_columns:
-            apply_columns.append(item)
+    """
+    save_type = PORTFOLIO_BS
+    if source_type == ASSESSED_RAW:
+        save_type = ASSESSED_BS
 
-    apply_func = apply_data_func(mappable_columns)
+    super_org = import_file.import_record.super_organization
+    plan = get_mapping_plan(super_org)
+    cleaner = BatchCleaner(plan.cleaner, plan.types)
+    cleaner.clean_rows(rows, plan.mapping)
 
-    for row in chunk:
+    snapshots = []
+    for row in rows:
         model = mapper.map_row(
             row,
-            mapping,
+            plan.mapping,
             BuildingSnapshot,
-            cleaner=map_cleaner,
-            concat=concats,
-            apply_columns=apply_columns,
-            apply_func=apply_func,
+            cleaner=cleaner,
+            concat=plan.concats,
+            apply_columns=plan.apply_columns,
+            apply_func=plan.apply_func,
             *args,
             **kwargs
         )
@@ -507,13 +604,68 @@ def map_row_chunk(
         model.import_file = import_file
         model.source_type = save_type
         model.clean()
-        model.super_organization = import_file.import_record.super_organization
-        model.save()
-    if model:
+        model.super_organization = super_org
+        # bulk_create doesn't call save, which sets these.
+        model.set_match_keys()
+        snapshots.append(model)
+
+    # Promoted values and search documents are written by PK, which
+    # bulk_create won't give the snapshots.
+    for pk, model in zip(reserve_snapshot_ids(len(snapshots)), snapshots):
+        model.pk = pk
+    BuildingSnapshot.objects.bulk_create(snapshots)
+    save_promoted_values(snapshots, get_promoted_columns([super_org.pk]))
+    update_search_documents(model.pk for model in snapshots)
+    if snapshots:
         # Make sure that we've saved all of the extra_data column names
-        save_column_names(model, mapping=mapping)
+        save_column_names(snapshots[-1], mapping=plan.mapping)
 
-    increment_cache(prog_key, increment)
+
+@task
+def map_row_range(
+    start_pk, end_pk, file_pk, source_type, prog_key, increment,
+    *args, **kwargs
+):
+    """Load a range of raw snapshots and map them.
+
+    :param start_pk: int, PK of the first raw BuildingSnapshot to map.
+    :param end_pk: int, PK of the last raw BuildingSnapshot to map.
+
+    """
+    qs = BuildingSnapshot.objects.filter(
+        import_file_id=file_pk,
+        source_type=source_type,
+        pk__gte=start_pk,
+        pk__lte=end_pk,
+    ).order_by('pk').only('extra_data')
+    chunk = [obj.extra_data for obj in qs]
+
+    return map_row_chunk(
+        chunk, file_pk, source_type, prog_key, increment, *args, **kwargs
+    )
+
+
+def _map_raw_snapshot_tasks(import_file, prog_key):
+    """Make a map_row_range subtask for each 100 of a file's raw snapshots."""
+    source_type_dict = {
+        'Portfolio Raw': PORTFOLIO_RAW,
+        'Assessed Raw': ASSESSED_RAW,
+        'Green Button Raw': GREEN_BUTTON_RAW,
+    }
+    source_type = source_type_dict.get(import_file.source_type, ASSESSED_RAW)
+
+    pks = BuildingSnapshot.objects.filter(
+        import_file=import_file,
+        source_type=source_type,
+    ).order_by('pk').values_list('pk', flat=True).iterator()
+
+    tasks = []
+    for chunk in batch(pks, 100):
+        tasks.append(map_row_range.subtask(
+            (chunk[0], chunk[-1], import_file.pk, source_type, prog_key)
+        ))
+
+    return tasks
 
 
 @task
@@ -538,25 +690,14 @@ def _map_data(file_pk, *args, **kwargs):
         map_data.apply_async(args=[file_pk], countdown=60, expires=120)
         return {'status': 'error', 'message': 'waiting for raw data save.'}
 
-    source_type_dict = {
-        'Portfolio Raw': PORTFOLIO_RAW,
-        'Assessed Raw': ASSESSED_RAW,
-        'Green Button Raw': GREEN_BUTTON_RAW,
-    }
-    source_type = source_type_dict.get(import_file.source_type, ASSESSED_RAW)
-
-    qs = BuildingSnapshot.objects.filter(
-        import_file=import_file,
-        source_type=source_type,
-    ).iterator()
-
     prog_key = get_prog_key('map_data', file_pk)
-    tasks = []
-    for chunk in batch(qs, 100):
-        serialized_data = [obj.extra_data for obj in chunk]
-        tasks.append(map_row_chunk.subtask(
-            (serialized_data, file_pk, source_type, prog_key)
-        ))
+    if import_file.fused_import:
+        # There are no raw snapshots, so map straight from the file again.
+        parser = reader.MCMParser(import_file.local_file)
+        tasks = _import_file_tasks(import_file, parser, prog_key)
+        import_file.save()
+    else:
+        tasks = _map_raw_snapshot_tasks(import_file, prog_key)
 
     tasks = add_cache_increment_parameter(tasks)
     if tasks:
@@ -575,28 +716,90 @@ def map_data(file_pk, *args, **kwargs):
     return {'status': 'succuss'}
 
 
+def _save_raw_rows(rows, import_file, source_type):
+    """Bulk insert raw rows as BuildingSnapshots.
+
+    PKs are reserved ahead of time so that ``set_initial_sources`` can point
+    every row's sources at itself; the whole chunk is then written with one
+    INSERT instead of a save-then-update per row.
+
+    :param rows: list of dict, parsed rows from the import file.
+    :param import_file: ImportFile inst.
+    :param source_type: int, ASSESSED_RAW, PORTFOLIO_RAW, etc.
+    :returns: list of BuildingSnapshot insts.
+
+    """
+    super_org = import_file.import_record.super_organization
+    snapshots = []
+    for pk, row in zip(reserve_snapshot_ids(len(rows)), rows):
+        raw_bs = BuildingSnapshot(
+            pk=pk,
+            import_file=import_file,
+            extra_data=row,
+            source_type=source_type,
+            super_organization=super_org,
+        )
+        snapshots.append(set_initial_sources(raw_bs))
+
+    return BuildingSnapshot.objects.bulk_create(snapshots)
+
+
+def _save_rows(rows, import_file, source_type):
+    """Save parsed rows raw, or map them right away for fused imports."""
+    if import_file.fused_import:
+        _map_rows(rows, import_file, source_type)
+    else:
+        _save_raw_rows(rows, import_file, source_type)
+
+
 @task
-def _save_raw_data_chunk(chunk, file_pk, prog_key, increment, *args, **kwargs):
-    """Save the raw data to the database."""
+def _save_raw_data_rows(file_pk, prog_key, increment, *args, **kwargs):
+    """Parse the whole of a file which can't be sharded, and save its rows.
+
+    Workbooks can only be read from the start, so one task reads the file
+    once and saves its rows in batches as it goes, rather than each of
+    several tasks reading up to its own rows.
+
+    """
     import_file = ImportFile.objects.get(pk=file_pk)
-    # Save our "column headers" and sample rows for F/E.
     source_type = get_source_type(import_file)
-    for c in chunk:
-        raw_bs = BuildingSnapshot()
-        raw_bs.import_file = import_file
-        raw_bs.extra_data = c
-        raw_bs.source_type = source_type
-
-        # We require a save to get our PK
-        # We save here to set our initial source PKs.
-        raw_bs.save()
-        super_org = import_file.import_record.super_organization
-        raw_bs.super_organization = super_org
-
-        set_initial_sources(raw_bs)
-        raw_bs.save()
-
-    # Indicate progress
+    num_rows = import_file.num_rows or 1
+
+    parser = reader.MCMParser(import_file.local_file)
+    for chunk in batch(parser.next(), RAW_DATA_BATCH_ROWS):
+        _save_rows(chunk, import_file, source_type)
+        # Indicate progress
+        increment_cache(prog_key, increment * len(chunk) / float(num_rows))
+
+
+@task
+def _save_raw_data_shard(
+    file_pk, header_end, start, end, prog_key, increment, *args, **kwargs
+):
+    """Parse one byte range of a CSV file and save its rows.
+
+    :param header_end: int, offset at which the file's header row ends.
+    :param start: int, offset at which this shard's first record starts.
+    :param end: int, offset just past this shard's last record.
+
+    """
+    import_file = ImportFile.objects.get(pk=file_pk)
+    source_type = get_source_type(import_file)
+
+    shard = read_shard(import_file.local_path, header_end, start, end)
+    # MCMParser picks its reader based on the file's name.
+    shard.name = import_file.file.name
+    parser = reader.MCMParser(shard)
+
+    num_rows = 0
+    for chunk in batch(parser.next(), RAW_DATA_BATCH_ROWS):
+        _save_rows(chunk, import_file, source_type)
+        num_rows += len(chunk)
+
+    ImportFile.objects.filter(pk=file_pk).update(
+        num_rows=F('num_rows') + num_rows
+    )
+
     increment_cache(prog_key, increment)
 
 
@@ -608,6 +811,9 @@ def finish_raw_save(results, file_pk):
     prog_key = get_prog_key('save_raw_data', file_pk)
     cache.set(prog_key, 100)
 
+    if import_file.fused_import:
+        finish_mapping(results, file_pk)
+
 
 def cache_first_rows(import_file, parser):
     """Cache headers, and rows 2-6 for validation/viewing.
@@ -673,6 +879,69 @@ def _save_raw_green_button_data(file_pk, *args, **kwargs):
     }
 
 
+def _is_excel(import_file):
+    """Excel workbooks are binary, so they can't be split into byte ranges."""
+    _, ext = os.path.splitext(import_file.file.name)
+    return ext.lower() in ('.xls', '.xlsx')
+
+
+def _can_fuse(import_file):
+    """Whether to map a file's rows as they're parsed, skipping raw saves.
+
+    Only when fused imports are turned on, and the org already has a
+    mapping for each of the file's columns.
+
+    """
+    if not FUSED_IMPORT or not import_file.cached_first_row:
+        return False
+
+    plan = get_mapping_plan(import_file.import_record.super_organization)
+    mapped = set(plan.mapping)
+    for concat in plan.concats:
+        mapped.update(concat['concat_columns'])
+
+    headers = import_file.cached_first_row.split(ROW_DELIMITER)
+
+    return all(header in mapped for header in headers)
+
+
+def _import_file_tasks(import_file, parser, prog_key):
+    """Make subtasks which read the rows of a file and save them.
+
+    CSVs are split up by bytes, with a subtask per shard. Anything else is
+    read by a single subtask. Either way, workers read their rows from the
+    file themselves.
+
+    :param import_file: ImportFile inst.
+    :param parser: MCMParser inst. for the file.
+    :param prog_key: str, cache key to track the subtasks' progress in.
+    :returns: list of subtasks, lacking their cache increment.
+
+    """
+    shards = None
+    if not _is_excel(import_file):
+        shards = get_shards(import_file.local_path, RAW_DATA_SHARD_SIZE)
+
+    import_file.num_rows = 0
+    tasks = []
+    if shards is None:
+        # Counted up front so the subtask can report its progress.
+        import_file.num_rows = sum(1 for _row in parser.next())
+        if import_file.num_rows:
+            tasks.append(_save_raw_data_rows.subtask(
+                (import_file.pk, prog_key)
+            ))
+    else:
+        # Each worker adds its row count to num_rows as it goes.
+        header_end, ranges = shards
+        for start, end in ranges:
+            tasks.append(_save_raw_data_shard.subtask(
+                (import_file.pk, header_end, start, end, prog_key)
+            ))
+
+    return tasks
+
+
 @task
 @lock_and_track
 def _save_raw_data(file_pk, *args, **kwargs):
@@ -687,18 +956,12 @@ def _save_raw_data(file_pk, *args, **kwargs):
 
     parser = reader.MCMParser(import_file.local_file)
     cache_first_rows(import_file, parser)
-    rows = parser.next()
-    import_file.num_rows = 0
+    import_file.num_columns = parser.num_columns()
+    import_file.fused_import = _can_fuse(import_file)
 
     prog_key = get_prog_key('save_raw_data', file_pk)
-
-    tasks = []
-    for chunk in batch(rows, 100):
-        import_file.num_rows += len(chunk)
-        tasks.append(_save_raw_data_chunk.subtask((chunk, file_pk, prog_key)))
-
+    tasks = _import_file_tasks(import_file, parser, prog_key)
     tasks = add_cache_increment_parameter(tasks)
-    import_file.num_columns = parser.num_columns()
     import_file.save()
 
     if tasks:
@@ -716,34 +979,41 @@ def save_raw_data(file_pk, *args, **kwargs):
     return {'status': 'success'}
 
 
-def _stringify(values):
-    """Take iterable of str and NoneTypes and reduce to space sep. str."""
-    return ' '.join(
-        [PUNCT_REGEX.sub('', value.lower()) for value in values if value]
-    )
-
-
 def handle_results(results, b_idx, can_rev_idx, unmatched_list, user_pk):
     """Seek IDs and save our snapshot match.
 
     :param results: list of tuples. [('match', 0.99999),...]
     :param b_idx: int, the index of the current building in the unmatched_list.
-    :param can_rev_idx: dict, reverse index from match -> canonical PK.
+    :param can_rev_idx: MatchIndex or dict, reverse index from match ->
+        canonical PK.
     :param user_pk: user ID, used for AuditLog logging
     :unmatched_list: list of dicts, the result of a values_list query for
         unmatched BSes.
 
     """
     match_string, confidence = results[0]  # We always care about closest match
-    match_type = SYSTEM_MATCH
-    # If we passed the minimum threshold, we're here, but we need to
-    # distinguish probable matches from good matches.
-    if confidence < getattr(settings, 'MATCH_MED_THRESHOLD', 0.7):
-        match_type = POSSIBLE_MATCH
-
     can_snap_pk = can_rev_idx[match_string]
     building_pk = unmatched_list[b_idx][0]  # First element is PK
 
+    _save_fuzzy_match(
+        can_snap_pk, building_pk, confidence, _get_match_type(confidence),
+        user_pk
+    )
+
+
+def _get_match_type(confidence):
+    """If we passed the minimum threshold, we're here, but we need to
+    distinguish probable matches from good matches.
+
+    """
+    if confidence < getattr(settings, 'MATCH_MED_THRESHOLD', 0.7):
+        return POSSIBLE_MATCH
+
+    return SYSTEM_MATCH
+
+
+def _save_fuzzy_match(can_snap_pk, building_pk, confidence, match_type,
+                      user_pk):
     bs = save_snapshot_match(
         can_snap_pk, building_pk, confidence=confidence, match_type=match_type
     )
@@ -757,6 +1027,27 @@ def handle_results(results, b_idx, can_rev_idx, unmatched_list, user_pk):
     )
 
 
+def _save_fuzzy_matches(matches, user_pk):
+    """Save many fuzzy matches at once, as ``_save_fuzzy_match`` does one.
+
+    :param matches: list of (canonical snapshot pk, building pk, confidence,
+        match type) tuples.
+
+    """
+    logs = []
+    for bs in save_snapshot_matches(matches):
+        if bs is None:
+            continue
+        logs.append(AuditLog(
+            user_id=user_pk,
+            content_object=bs.canonical_building,
+            action_note='System matched building.',
+            action='save_system_match',
+            organization_id=bs.super_organization_id,
+        ))
+    AuditLog.objects.bulk_create(logs)
+
+
 @task
 @lock_and_track
 def match_buildings(file_pk, user_pk):
@@ -793,49 +1084,34 @@ def get_canonical_snapshots(org_id):
 
 def get_canonical_id_matches(org_id, pm_id, tax_id, custom_id):
     """Returns canonical snapshots that match at least one id."""
-    params = []
-    can_snapshots = get_canonical_snapshots(org_id)
-    if pm_id:
-        params.append(Q(pm_property_id=pm_id))
-        params.append(Q(tax_lot_id=pm_id))
-        params.append(Q(custom_id_1=pm_id))
-    if tax_id:
-        params.append(Q(pm_property_id=tax_id))
-        params.append(Q(tax_lot_id=tax_id))
-        params.append(Q(custom_id_1=tax_id))
-    if custom_id:
-        params.append(Q(pm_property_id=custom_id))
-        params.append(Q(tax_lot_id=custom_id))
-        params.append(Q(custom_id_1=custom_id))
-
-    if not params:
-        # Return an empty QuerySet if we don't have any params.
-        return can_snapshots.none()
-
-    canonical_matches = can_snapshots.filter(
-        reduce(operator.or_, params)
+    return filter_by_ids(
+        get_canonical_snapshots(org_id), [pm_id, tax_id, custom_id]
     )
 
-    return canonical_matches
 
+def handle_id_matches(unmatched_bs, import_file, user_pk, id_index=None):
+    """"Deals with exact maches in the IDs of buildings.
 
-def handle_id_matches(unmatched_bs, import_file, user_pk):
-    """"Deals with exact maches in the IDs of buildings."""
-    id_matches = get_canonical_id_matches(
-        unmatched_bs.super_organization_id,
-        unmatched_bs.pm_property_id,
-        unmatched_bs.tax_lot_id,
-        unmatched_bs.custom_id_1
-    )
-    if not id_matches.exists():
+    :param id_index: (optional) IdentifierIndex of the org's canonical
+        snapshots, which is updated with any matches made. Pass one in when
+        matching many buildings to save querying for each of them.
+
+    """
+    if id_index is None:
+        id_index = IdentifierIndex(
+            get_canonical_snapshots(unmatched_bs.super_organization_id)
+        )
+
+    id_matches = id_index.match(unmatched_bs)
+    if not id_matches:
         return
 
     # merge save as system match with high confidence.
-    for can_snap in id_matches:
+    for can_snap_pk in id_matches:
         # Merge all matches together; updating "unmatched" pointer
         # as we go.
         unmatched_bs = save_snapshot_match(
-            can_snap.pk,
+            can_snap_pk,
             unmatched_bs.pk,
             confidence=0.9,  # TODO(gavin) represent conf better.
             match_type=SYSTEM_MATCH,
@@ -852,6 +1128,11 @@ def handle_id_matches(unmatched_bs, import_file, user_pk):
             organization=unmatched_bs.super_organization,
         )
 
+    # The merged snapshot is now canonical in place of all it matched.
+    for can_snap_pk in id_matches:
+        id_index.remove(can_snap_pk)
+    id_index.add(unmatched_bs)
+
     # Returns the most recent child of all merging.
     return unmatched_bs
 
@@ -866,8 +1147,14 @@ def _finish_matching(import_file, progress_key):
 @task
 @lock_and_track
 def _match_buildings(file_pk, user_pk):
-    """ngram search against all of the canonical_building snapshots for org."""
-    min_threshold = settings.MATCH_MIN_THRESHOLD
+    """ngram search against all of the canonical_building snapshots for org.
+
+    Unmatched buildings are scored in parallel, in chunks, and the matches
+    are then saved in order by ``_finish_match_buildings``.
+    ``MATCH_ENGINE`` picks how chunks are scored (see
+    ``seed.matching.engines``).
+
+    """
     import_file = ImportFile.objects.get(pk=file_pk)
     prog_key = get_prog_key('match_buildings', file_pk)
     org = Organization.objects.filter(
@@ -877,8 +1164,17 @@ def _match_buildings(file_pk, user_pk):
     unmatched_buildings = find_unmatched_buildings(import_file)
 
     newly_matched_building_pks = []
+    # Canonical snapshots by ID, per org, loaded once for the whole file.
+    id_indexes = {}
     for unmatched in unmatched_buildings:
-        match = handle_id_matches(unmatched, import_file, user_pk)
+        org_id = unmatched.super_organization_id
+        if org_id not in id_indexes:
+            id_indexes[org_id] = IdentifierIndex(
+                get_canonical_snapshots(org_id)
+            )
+        match = handle_id_matches(
+            unmatched, import_file, user_pk, id_indexes[org_id]
+        )
         if match:
             newly_matched_building_pks.extend([match.pk, unmatched.pk])
 
@@ -892,19 +1188,22 @@ def _match_buildings(file_pk, user_pk):
         _finish_matching(import_file, prog_key)
         return
 
-    # Here we want all the values not related to the BS id for doing comps.
-    unmatched_ngrams = [
-        _stringify(list(values)[1:]) for values in unmatched_buildings
-    ]
-
-    canonical_buildings = find_canonical_building_values(org)
-    if not canonical_buildings:
+    engine_class = get_engine_class()
+    if engine_class.uses_index:
+        match_index = get_match_index(org.pk)
+        has_canonicals = bool(match_index)
+    else:
+        match_index = None
+        has_canonicals = CanonicalBuilding.objects.filter(
+            canonical_snapshot__super_organization_id=org.pk,
+        ).exists()
+    if not has_canonicals:
         # There are no canonical_buildings for this organization, all unmatched
         # buildings will then become canonicalized.
         hydrated_unmatched_buildings = BuildingSnapshot.objects.filter(
             pk__in=[item[0] for item in unmatched_buildings]
         )
-        num_unmatched = len(unmatched_ngrams) or 1
+        num_unmatched = len(unmatched_buildings) or 1
         increment = 1.0 / num_unmatched * 100
         for (i, unmatched) in enumerate(hydrated_unmatched_buildings):
             initialize_canonical_building(unmatched, user_pk)
@@ -914,41 +1213,149 @@ def _match_buildings(file_pk, user_pk):
         _finish_matching(import_file, prog_key)
         return
 
-    # This allows us to retrieve the PK for a given NGram after a match.
-    can_rev_idx = {
-        _stringify(value[1:]): value[0] for value in canonical_buildings
-    }
-    n = ngram.NGram(
-        [_stringify(values[1:]) for values in canonical_buildings]
+    if match_index is not None:
+        # Workers load the index from the cache, so make sure it's up to
+        # date.
+        save_match_index(org.pk, match_index)
+
+    # _finish_match_buildings adds to this as it saves the matches.
+    import_file.mapping_completion = 0
+    import_file.save()
+
+    pks = [values[0] for values in unmatched_buildings]
+    tasks = [
+        _score_buildings_chunk.subtask((chunk, org.pk, prog_key))
+        for chunk in batch(pks, MATCH_CHUNK_SIZE)
+    ]
+    # Scoring is the first half of the progress, merging is the second.
+    increment = 50.0 / len(tasks)
+    for subtask in tasks:
+        subtask.args = subtask.args + (increment,)
+
+    chord(tasks, interval=15)(
+        _finish_match_buildings.subtask([file_pk, user_pk])
     )
 
-    # For progress tracking
+    return {'status': 'success'}
 
-    num_unmatched = len(unmatched_ngrams) or 1
-    increment = 1.0 / num_unmatched * 100
 
-    # PKs when we have a match.
-    import_file.mapping_completion = 0
-    import_file.save()
-    for i, building in enumerate(unmatched_ngrams):
-        results = n.search(building, min_threshold)
+@task
+def _score_buildings_chunk(pks, org_id, prog_key, increment, *args, **kwargs):
+    """Find the closest canonical building for each of a chunk of buildings.
+
+    :param pks: list of int, PKs of unmatched BuildingSnapshots.
+    :param org_id: int, PK of the Organization whose index to search.
+    :returns: list of (building pk, canonical snapshot pk, confidence).
+        The last two are None for buildings without a close enough match.
+
+    """
+    min_threshold = settings.MATCH_MIN_THRESHOLD
+    engine_class = get_engine_class()
+    match_index = None
+    key_names = get_blocking_keys()
+    if engine_class.uses_index:
+        match_index = get_match_index(org_id)
+        key_names = match_index.key_names
+    buildings = list(BuildingSnapshot.objects.filter(
+        pk__in=pks
+    ).values_list(*(BS_VALUES_LIST + list(BLOCKING_FIELDS))))
+
+    num_values = len(BS_VALUES_LIST)
+    # Only score canonical buildings sharing a blocking key, if any.
+    building_keys = [
+        blocking_keys(values[num_values:], key_names)
+        for values in buildings
+    ]
+    match_strings = [
+        stringify(values[1:num_values]) for values in buildings
+    ]
+
+    engine = engine_class(match_index, org_id)
+    all_results = engine.search_many(
+        match_strings, min_threshold, building_keys
+    )
+
+    scores = []
+    for values, keys, results in zip(buildings, building_keys, all_results):
         if results:
-            handle_results(
-                results, i, can_rev_idx, unmatched_buildings, user_pk
-            )
+            match_string, confidence = results[0]
+            can_snap_pk = engine.get_snapshot(match_string, keys)
+            scores.append((values[0], can_snap_pk, confidence))
         else:
-            hydrated_building = BuildingSnapshot.objects.get(
-                pk=unmatched_buildings[i][0]
-            )
-            initialize_canonical_building(hydrated_building, user_pk)
+            scores.append((values[0], None, None))
+
+    increment_cache(prog_key, increment)
+
+    return scores
+
+
+def _resolve_match_types(scores):
+    """Decide how to save each scored building.
+
+    When several buildings are closest to the same canonical building, only
+    the most confident of them (the lowest PK on a tie) can be a system
+    match; the rest are saved as possible matches for a person to review.
+
+    :param scores: list of (building pk, canonical snapshot pk, confidence).
+    :returns: list of (building pk, canonical snapshot pk, confidence, match
+        type) in building PK order. Match type is None for no match.
+
+    """
+    best_claims = {}
+    for building_pk, can_snap_pk, confidence in scores:
+        if can_snap_pk is None:
+            continue
+        claim = (confidence, -building_pk)
+        best_claims[can_snap_pk] = max(
+            claim, best_claims.get(can_snap_pk, claim)
+        )
+
+    resolved = []
+    for building_pk, can_snap_pk, confidence in sorted(scores):
+        match_type = None
+        if can_snap_pk is not None:
+            match_type = _get_match_type(confidence)
+            if best_claims[can_snap_pk] != (confidence, -building_pk):
+                match_type = POSSIBLE_MATCH
+        resolved.append((building_pk, can_snap_pk, confidence, match_type))
+
+    return resolved
 
-        if i % 100 == 0:
-            increment_cache(prog_key, increment * 100)
-            import_file.mapping_completion += int(increment * 100)
-            import_file.save()
+
+@task
+def _finish_match_buildings(results, file_pk, user_pk):
+    """Save the matches scored by each _score_buildings_chunk, in order.
+
+    :param results: list of lists of scores, one for each chunk.
+
+    """
+    import_file = ImportFile.objects.get(pk=file_pk)
+    prog_key = get_prog_key('match_buildings', file_pk)
+
+    resolved = _resolve_match_types(list(itertools.chain(*results)))
+    increment = 50.0 / (len(resolved) or 1)
+    for resolved_batch in batch(resolved, MERGE_BATCH_SIZE):
+        matches = []
+        for building_pk, can_snap_pk, confidence, match_type in (
+                resolved_batch):
+            if can_snap_pk is None:
+                hydrated_building = BuildingSnapshot.objects.get(
+                    pk=building_pk
+                )
+                initialize_canonical_building(hydrated_building, user_pk)
+            else:
+                matches.append(
+                    (can_snap_pk, building_pk, confidence, match_type)
+                )
+        _save_fuzzy_matches(matches, user_pk)
+
+        increment_cache(prog_key, increment * len(resolved_batch))
+        import_file.mapping_completion += int(
+            increment * len(resolved_batch)
+        )
+        import_file.save()
 
     _finish_matching(import_file, prog_key)
-    return {'status': 'success'}
 
 
 @task
@@ -1027,6 +1434,9 @@ def _delete_organization_buildings(org_pk, chunk_size=100, *args, **kwargs):
         cache.set(deleting_cache_key, 100)
         return
 
+    # The org's match index is about to be entirely out of date.
+    invalidate_match_index(org_pk)
+
     # delete the canonical buildings
     can_ids = CanonicalBuilding.objects.filter(
         canonical_snapshot__super_organization=org_pk
@@ -0,0 +1,543 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+import cPickle as pickle
+import unittest
+from StringIO import StringIO
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from mock import patch
+
+from data_importer.models import ImportFile, ImportRecord
+from landing.models import SEEDUser as User
+from superperms.orgs.models import Organization
+from seed import reconcile
+from seed.matching import (
+    benchmark, blocking, engines, identifiers, ngrams, tfidf, trigram,
+)
+from seed.models import ASSESSED_BS, BuildingSnapshot
+from seed.tests import util
+from seed.utils import address
+
+
+class TestMatchIndex(TestCase):
+    """Tests for the persistent n-gram match index."""
+
+    def setUp(self):
+        self.org = Organization.objects.create()
+        self.import_record = ImportRecord.objects.create(
+            owner=User.objects.create(username='test'),
+            super_organization=self.org,
+        )
+        self.import_file = ImportFile.objects.create(
+            import_record=self.import_record,
+        )
+        ngrams.invalidate_match_index(self.org.pk)
+        cache.delete(ngrams.JOURNAL_SEQ_KEY.format(self.org.pk))
+
+    def make_canonical(self, address, **kwargs):
+        kwargs['address_line_1'] = address
+        return util.make_fake_snapshot(
+            self.import_file, kwargs, ASSESSED_BS, is_canon=True, org=self.org
+        )
+
+    def test_build(self):
+        snapshot = self.make_canonical('123 Main St.')
+
+        index = ngrams.get_match_index(self.org.pk)
+
+        self.assertEqual(len(index), 1)
+        match_string, _similarity = index.search('123 main st', 0.5)[0]
+        self.assertEqual(match_string, '123 main st')
+        self.assertEqual(index[match_string], snapshot.pk)
+
+    def test_pickle(self):
+        self.make_canonical('123 Main St.')
+        self.make_canonical('456 Elm Ave.')
+        index = ngrams.MatchIndex.build(self.org.pk)
+
+        loaded = pickle.loads(pickle.dumps(index, pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(loaded.entries, index.entries)
+        self.assertEqual(
+            loaded.search('456 elm', 0.1), index.search('456 elm', 0.1)
+        )
+
+    def test_incremental_updates(self):
+        """Changes to canonicals are applied without re-indexing."""
+        old = self.make_canonical('123 Main St.')
+        ngrams.get_match_index(self.org.pk)
+
+        new = self.make_canonical('456 Elm Ave.')
+        canon = old.canonical_building
+        canon.active = False
+        canon.save()
+
+        with patch.object(ngrams.MatchIndex, 'build') as build:
+            index = ngrams.get_match_index(self.org.pk)
+            self.assertFalse(build.called)
+
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index['456 elm ave'], new.pk)
+        self.assertEqual(index.search('123 main st', 0.5), [])
+
+    def test_lost_journal(self):
+        """The index is rebuilt if any changes have gone missing."""
+        self.make_canonical('123 Main St.')
+        ngrams.get_match_index(self.org.pk)
+        self.make_canonical('456 Elm Ave.')
+        seq = cache.get(ngrams.JOURNAL_SEQ_KEY.format(self.org.pk))
+        cache.delete(ngrams.JOURNAL_KEY.format(self.org.pk, seq))
+
+        index = ngrams.get_match_index(self.org.pk)
+
+        self.assertEqual(len(index), 2)
+
+    def test_rolled_back_changes(self):
+        """Journaled changes which were rolled back aren't replayed."""
+        old = self.make_canonical('123 Main St.')
+        ngrams.get_match_index(self.org.pk)
+
+        class RollBack(Exception):
+            pass
+
+        try:
+            with transaction.atomic():
+                self.make_canonical('456 Elm Ave.')
+                canon = old.canonical_building
+                canon.active = False
+                canon.save()
+                raise RollBack
+        except RollBack:
+            pass
+
+        with patch.object(ngrams.MatchIndex, 'build') as build:
+            index = ngrams.get_match_index(self.org.pk)
+            self.assertFalse(build.called)
+
+        self.assertEqual(index.entries.keys(), [old.canonical_building_id])
+        self.assertEqual(index['123 main st'], old.pk)
+
+    def test_blocked_search(self):
+        """Only canonicals sharing a blocking key, or without any, match."""
+        self.make_canonical('123 Main St.', postal_code='78701')
+        self.make_canonical('123 Main Ave.', postal_code='94110')
+        self.make_canonical('123 Main Rd.')
+
+        with self.settings(MATCH_BLOCKING_KEYS=('postal_code',)):
+            index = ngrams.get_match_index(self.org.pk)
+            keys = blocking.blocking_keys(('78701-1234', None, None))
+        results = index.search('123 main', 0.1, keys)
+
+        self.assertEqual(
+            sorted(match for match, _similarity in results),
+            ['123 main rd', '123 main st'],
+        )
+        # Without keys, everything is searched.
+        self.assertEqual(len(index.search('123 main', 0.1)), 3)
+
+    def test_blocked_snapshot(self):
+        """Duplicate match strings resolve to the canonical in the block."""
+        self.make_canonical('123 Main St.', city='Austin')
+        houston = self.make_canonical('123 Main St.', city='Houston')
+
+        with self.settings(MATCH_BLOCKING_KEYS=('city',)):
+            index = ngrams.get_match_index(self.org.pk)
+            keys = blocking.blocking_keys((None, 'HOUSTON', None))
+        self.assertEqual(index.get_snapshot('123 main st', keys), houston.pk)
+
+    def test_blocks_smaller_than_org(self):
+        """In a one city org, a building is only scored against its street."""
+        streets = ['Main St.', 'Elm Ave.', 'Oak Rd.', 'Pine St.']
+        for i, street in enumerate(streets * 3):
+            self.make_canonical(
+                '{0} {1}'.format(100 + i, street),
+                city='Austin',
+                postal_code='7870{0}'.format(i % 2),
+            )
+
+        index = ngrams.get_match_index(self.org.pk)
+        keys = blocking.blocking_keys(('78700', 'Austin', '150 Main Street'))
+        candidates = [
+            match_string for match_string in index.snapshots
+            if index.in_blocks(match_string, keys)
+        ]
+
+        self.assertEqual(len(index), 12)
+        self.assertEqual(
+            sorted(candidates), ['100 main st', '104 main st', '108 main st']
+        )
+
+    def test_blocking_keys_changed(self):
+        """Changing MATCH_BLOCKING_KEYS rebuilds the index."""
+        self.make_canonical('123 Main St.', postal_code='78701')
+        ngrams.get_match_index(self.org.pk)
+
+        with self.settings(MATCH_BLOCKING_KEYS=('city',)):
+            index = ngrams.get_match_index(self.org.pk)
+
+        self.assertEqual(index.key_names, ('city',))
+        self.assertEqual(index.blocks.keys(), [None])
+
+
+@unittest.skipIf(tfidf.sparse is None, 'NumPy and SciPy are not installed')
+class TestTfidfMatcher(TestCase):
+    """Tests for the TF-IDF matching engine."""
+
+    def setUp(self):
+        self.matcher = tfidf.TfidfMatcher(
+            ['123 main st', '123 main ave', '500 elm st']
+        )
+
+    def test_search_many(self):
+        results = self.matcher.search_many(
+            ['123 main st', '123 main street', 'zzz'], 0.3
+        )
+
+        self.assertEqual(results[0][0], ('123 main st', 1.0))
+        self.assertEqual(
+            [match for match, _similarity in results[1]],
+            ['123 main st', '123 main ave'],
+        )
+        self.assertEqual(results[2], [])
+
+    def test_allowed(self):
+        results = self.matcher.search_many(
+            ['123 main st'], 0.3, allowed=[lambda s: s != '123 main st']
+        )
+
+        self.assertEqual(
+            [match for match, _similarity in results[0]], ['123 main ave']
+        )
+
+    def test_allowed_only_best(self):
+        """Only as many candidates as needed are checked, best first."""
+        checked = []
+
+        def is_allowed(match_string):
+            checked.append(match_string)
+            return True
+
+        results = self.matcher.search_many(
+            ['123 main st'], 0.0, allowed=[is_allowed], limit=1
+        )
+
+        self.assertEqual(results[0], [('123 main st', 1.0)])
+        self.assertEqual(checked, ['123 main st'])
+
+    def test_blocks(self):
+        """More buildings than fit in one multiply are all scored."""
+        with patch.object(tfidf, 'BLOCK_SIZE', 2):
+            results = self.matcher.search_many(
+                ['500 elm st', '123 main ave', '123 main st'], 0.9
+            )
+
+        self.assertEqual(
+            [result[0][0] for result in results],
+            ['500 elm st', '123 main ave', '123 main st'],
+        )
+
+
+class TestEngines(TestCase):
+    """Tests for the matching engine registry."""
+
+    def setUp(self):
+        self.index = ngrams.MatchIndex(key_names=('postal_code',))
+        self.index.add(1, 10, (None, None, None, '123 Main St.'),
+                       ('78701', None, None))
+        self.index.add(2, 20, (None, None, None, '123 Main Ave.'),
+                       ('94110', None, None))
+
+    def test_get_engine(self):
+        with self.settings(MATCH_ENGINE='ngram'):
+            engine = engines.get_engine(self.index)
+
+        self.assertTrue(isinstance(engine, engines.NGramEngine))
+
+    def test_unknown_engine(self):
+        """Unknown engines fall back to ngram."""
+        engine = engines.get_engine(self.index, name='nope')
+
+        self.assertTrue(isinstance(engine, engines.NGramEngine))
+
+    def test_engines_agree(self):
+        """Every installed engine finds the same best matches."""
+        keys_list = [(('postal_code', '78701'),), ()]
+        for name in benchmark.available_engines():
+            engine = engines.get_engine(self.index, name=name)
+            results = engine.search_many(
+                ['123 main st', '123 main ave'], 0.3, keys_list
+            )
+
+            self.assertEqual(
+                [result[0][0] for result in results],
+                ['123 main st', '123 main ave'],
+            )
+            # Blocking still applies.
+            self.assertNotIn(
+                '123 main ave', [match for match, _sim in results[0]]
+            )
+
+
+class TestTrigramEngine(TestCase):
+    """Tests for pg_trgm candidate generation."""
+
+    def setUp(self):
+        self.org = Organization.objects.create()
+        self.import_record = ImportRecord.objects.create(
+            owner=User.objects.create(username='test'),
+            super_organization=self.org,
+        )
+        self.import_file = ImportFile.objects.create(
+            import_record=self.import_record,
+        )
+
+    def make_canonical(self, address, **kwargs):
+        kwargs['address_line_1'] = address
+        return util.make_fake_snapshot(
+            self.import_file, kwargs, ASSESSED_BS, is_canon=True, org=self.org
+        )
+
+    def has_pg_trgm(self):
+        if connection.vendor != 'postgresql':
+            return False
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+    def test_match_key(self):
+        """Canonical snapshots keep their match strings."""
+        snapshot = self.make_canonical('123 Main St.')
+
+        snapshot = BuildingSnapshot.objects.get(pk=snapshot.pk)
+        self.assertEqual(snapshot.match_key, '123 main st')
+
+    def test_search_many(self):
+        if not self.has_pg_trgm():
+            self.skipTest('pg_trgm is not installed')
+
+        main_st = self.make_canonical('123 Main St.', postal_code='78701')
+        self.make_canonical('123 Main St.', postal_code='94110')
+        self.make_canonical('500 Elm St.')
+
+        with self.settings(MATCH_BLOCKING_KEYS=('postal_code',)):
+            engine = engines.get_engine(None, self.org.pk, name='trigram')
+        keys = (('postal_code', '78701'),)
+        results = engine.search_many(
+            ['123 main street', 'zzz'], 0.3, [keys, ()]
+        )
+
+        self.assertEqual(results[0][0][0], '123 main st')
+        self.assertEqual(results[1], [])
+        self.assertEqual(
+            engine.get_snapshot('123 main st', keys), main_st.pk
+        )
+
+    def test_candidates_in_block(self):
+        """Closer look-alikes in other blocks don't crowd out the block."""
+        if not self.has_pg_trgm():
+            self.skipTest('pg_trgm is not installed')
+
+        with self.settings(MATCH_BLOCKING_KEYS=('postal_code',)):
+            for _ in range(trigram.CANDIDATES + 1):
+                self.make_canonical('123 Main St.', postal_code='94110')
+            in_block = self.make_canonical(
+                '123 Main Street', postal_code='78701'
+            )
+            engine = engines.get_engine(None, self.org.pk, name='trigram')
+
+        self.assertEqual(
+            BuildingSnapshot.objects.get(pk=in_block.pk).blocking_keys,
+            'postal_code:78701'
+        )
+        keys = (('postal_code', '78701'),)
+        results = engine.search_many(['123 main st'], 0.3, [keys])
+
+        self.assertEqual(
+            [match for match, _similarity in results[0]], ['123 main street']
+        )
+        self.assertEqual(
+            engine.get_snapshot('123 main street', keys), in_block.pk
+        )
+
+
+class TestBenchmark(TestCase):
+    """Tests for the offline matching benchmark."""
+
+    def test_load_csv(self):
+        canonicals, unmatched = benchmark.load_csv(StringIO(
+            'id,match_id,address_line_1,postal_code\n'
+            '1,,123 Main St.,78701\n'
+            'a,1,123 Main Street,78701\n'
+            'b,none,500 Elm St.,\n'
+        ))
+
+        self.assertEqual([b.building_id for b in canonicals], ['1'])
+        self.assertEqual(
+            [(b.building_id, b.match_id) for b in unmatched],
+            [('a', '1'), ('b', None)],
+        )
+        self.assertEqual(
+            unmatched[1].values, {'address_line_1': '500 Elm St.'}
+        )
+
+    def test_score(self):
+        unmatched = [
+            benchmark.Building('a', {}, '1'),
+            benchmark.Building('b', {}, '2'),
+            benchmark.Building('c', {}),
+            benchmark.Building('d', {}, '4'),
+        ]
+        predictions = [('1', 0.9), ('3', 0.5), ('5', 0.35), (None, None)]
+
+        self.assertEqual(
+            benchmark.score(predictions, unmatched, 0.3), (1 / 3.0, 1 / 3.0)
+        )
+        self.assertEqual(
+            benchmark.score(predictions, unmatched, 0.6), (1.0, 1 / 3.0)
+        )
+
+    def test_run_engines(self):
+        canonicals, unmatched = benchmark.synthetic_dataset(50, seed=1)
+        reports = benchmark.benchmark(
+            benchmark.available_engines(), canonicals, unmatched, [0.3, 0.5],
+            isolate=False,
+        )
+
+        for report in reports:
+            self.assertEqual(
+                [threshold for threshold, _p, _r in report['scores']],
+                [0.3, 0.5],
+            )
+            precision, recall = report['scores'][0][1:]
+            self.assertTrue(precision > 0.5)
+            self.assertTrue(recall > 0.5)
+
+
+class TestBlockingKeys(TestCase):
+    """Tests for the blocking keys buildings are matched within."""
+
+    def test_blocking_keys(self):
+        keys = blocking.blocking_keys(
+            ('78701-1234', ' San  Antonio ', '123 N. Main St. Apt 4'),
+            ('postal_code', 'city', 'street'),
+        )
+
+        self.assertEqual(keys, (
+            ('postal_code', '78701'),
+            ('city', 'san antonio'),
+            ('street', 'main'),
+        ))
+
+    def test_composite_keys(self):
+        values = ('78701-1234', 'Austin', '123 N. Main St.')
+        names = ('postal_code_street', 'city_street')
+
+        self.assertEqual(blocking.blocking_keys(values, names), (
+            ('postal_code_street', '78701 main'),
+            ('city_street', 'austin main'),
+        ))
+        # Both parts are needed.
+        self.assertEqual(
+            blocking.blocking_keys((None, 'Austin', ''), names), ()
+        )
+
+    def test_missing_values(self):
+        keys = blocking.blocking_keys(
+            (None, '', '100'), ('postal_code', 'city', 'street')
+        )
+
+        self.assertEqual(keys, ())
+
+    def test_street_key(self):
+        self.assertEqual(blocking.street_key('1600 Pennsylvania Ave NW'),
+                         'pennsylvania')
+        self.assertEqual(blocking.street_key('Suite 200'), None)
+        self.assertEqual(blocking.street_key('2 W 5th Street'), '5th')
+
+
+class TestExactKeys(TestCase):
+    """Tests for the normalized address and ID keys of snapshots."""
+
+    def setUp(self):
+        self.org = Organization.objects.create()
+        import_record = ImportRecord.objects.create(
+            owner=User.objects.create(username='test'),
+            super_organization=self.org,
+        )
+        self.import_file = ImportFile.objects.create(
+            import_record=import_record,
+        )
+
+    def make_canonical(self, **kwargs):
+        return util.make_fake_snapshot(
+            self.import_file, kwargs, ASSESSED_BS, is_canon=True, org=self.org
+        )
+
+    def test_normalize_address(self):
+        self.assertEqual(
+            address.normalize_address('123 North Main Street, Apt. 4'),
+            '123 n main st #4',
+        )
+        self.assertEqual(
+            address.normalize_address('123 N MAIN ST #4'), '123 n main st #4'
+        )
+        self.assertEqual(address.normalize_address(' Suite '), None)
+        self.assertEqual(address.normalize_address(None), None)
+
+    def test_normalize_identifier(self):
+        self.assertEqual(address.normalize_identifier('435/422'), '435-422')
+        self.assertEqual(address.normalize_identifier(' 435 - 422 '),
+                         '435-422')
+        self.assertEqual(address.normalize_identifier('ABC'), 'abc')
+        self.assertNotEqual(address.normalize_identifier('12-3'),
+                            address.normalize_identifier('1-23'))
+        self.assertEqual(address.normalize_identifier('--'), None)
+
+    def test_saved_keys(self):
+        snapshot = self.make_canonical(
+            address_line_1='123 Main Street',
+            tax_lot_id='435/422',
+            pm_property_id='ABC',
+        )
+
+        snapshot = BuildingSnapshot.objects.get(pk=snapshot.pk)
+        self.assertEqual(snapshot.address_key, '123 main st')
+        self.assertEqual(snapshot.identifier_keys, '435-422 abc')
+
+    def test_identifier_index(self):
+        canon = self.make_canonical(tax_lot_id='435/422')
+        other = self.make_canonical(custom_id_1='abc')
+        index = identifiers.IdentifierIndex(
+            BuildingSnapshot.objects.filter(super_organization=self.org)
+        )
+
+        self.assertEqual(
+            index.match(BuildingSnapshot(pm_property_id='435 - 422')),
+            [canon.pk],
+        )
+        self.assertEqual(
+            index.match(BuildingSnapshot(tax_lot_id='ABC')), [other.pk]
+        )
+        self.assertEqual(index.match(BuildingSnapshot(tax_lot_id='435')), [])
+
+    def test_reconcile(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('ID lookups need PostgreSQL arrays')
+
+        canon = self.make_canonical(
+            address_line_1='500 Elm Avenue', tax_lot_id='435/422'
+        )
+        self.make_canonical(address_line_1='500 Elm Road', tax_lot_id='1-23')
+        snapshots = BuildingSnapshot.objects.filter(
+            super_organization=self.org
+        )
+
+        self.assertEqual(list(reconcile.search(
+            BuildingSnapshot(address_line_1='500 ELM AVE.'), snapshots
+        )), [canon])
+        self.assertEqual(list(reconcile.search(
+            BuildingSnapshot(pm_property_id='435-422'), snapshots
+        )), [canon])
@@ -1,8 +1,9 @@
 """
 :copyright: (c) 2014 Building Energy Inc
 """
-from datetime import datetime
+from datetime import date, datetime
 
+from django.core.cache import cache
 from django.test import TestCase
 
 from superperms.orgs.models import Organization, OrganizationUser
@@ -160,6 +161,88 @@ class TestBuildingSnapshot(TestCase):
         self.assertEqual(bs2.tip, bs3)
         self.assertEqual(bs3.tip, bs3)
 
+    def test_lineage_queries(self):
+        """Trees are loaded in a fixed number of queries, however deep."""
+        chain = [seed_models.BuildingSnapshot.objects.create()]
+        for _ in range(10):
+            child = seed_models.BuildingSnapshot.objects.create()
+            chain[-1].children.add(child)
+            chain.append(child)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(chain[0].tip, chain[-1])
+        with self.assertNumQueries(2):
+            self.assertEqual(chain[-1].parent_tree, chain[:-1])
+        self.assertEqual(chain[0].child_tree, chain[1:])
+        self.assertEqual(
+            seed_models._find_tips([chain[0].pk, chain[5].pk]),
+            {chain[0].pk: chain[-1].pk, chain[5].pk: chain[-1].pk},
+        )
+
+    def test_stored_tips(self):
+        """Snapshots keep their tree's tip as children come and go."""
+        bs1 = seed_models.BuildingSnapshot.objects.create()
+        bs2 = seed_models.BuildingSnapshot.objects.create()
+        bs3 = seed_models.BuildingSnapshot.objects.create()
+
+        bs1.children.add(bs2)
+        bs3.parents.add(bs2)
+
+        def stored(snapshot):
+            return seed_models.BuildingSnapshot.objects.filter(
+                pk=snapshot.pk
+            ).values_list('tip_snapshot_id', 'is_tip')[0]
+
+        self.assertEqual(stored(bs1), (bs3.pk, False))
+        self.assertEqual(stored(bs2), (bs3.pk, False))
+        self.assertEqual(stored(bs3), (bs3.pk, True))
+
+        bs2.children.remove(bs3)
+
+        self.assertEqual(stored(bs1), (bs2.pk, False))
+        self.assertEqual(stored(bs2), (bs2.pk, True))
+        self.assertEqual(bs1.tip, bs2)
+        self.assertEqual(bs3.tip, bs3)
+
+        # Flagged tips are their own, without working them out.
+        bs4 = seed_models.BuildingSnapshot.objects.create()
+        with self.assertNumQueries(1):
+            self.assertEqual(seed_models.get_tips([bs4.pk]), {bs4.pk: bs4.pk})
+
+    def test_store_match_keys(self):
+        """Match keys are filled in for snapshots saved without them."""
+        bs = seed_models.BuildingSnapshot.objects.create(
+            address_line_1='123 Main St.', postal_code='78701',
+            pm_property_id='1243',
+        )
+        keys = seed_models.BuildingSnapshot.objects.filter(
+            pk=bs.pk
+        ).values_list(*seed_models.MATCH_KEY_FIELDS)
+        expected = keys[0]
+        seed_models.BuildingSnapshot.objects.filter(pk=bs.pk).update(**dict(
+            (field, None) for field in seed_models.MATCH_KEY_FIELDS
+        ))
+
+        seed_models.store_match_keys([bs.pk])
+
+        self.assertEqual(keys[0], expected)
+        self.assertTrue(all(expected))
+
+    def test_save_keeps_stored_tip(self):
+        """Saving an out of date instance doesn't undo a new tip."""
+        bs1 = seed_models.BuildingSnapshot.objects.create()
+        stale = seed_models.BuildingSnapshot.objects.get(pk=bs1.pk)
+        bs2 = seed_models.BuildingSnapshot.objects.create()
+        bs1.children.add(bs2)
+
+        stale.property_name = 'Renamed'
+        stale.save()
+
+        bs1 = seed_models.BuildingSnapshot.objects.get(pk=bs1.pk)
+        self.assertEqual(bs1.property_name, 'Renamed')
+        self.assertEqual(bs1.tip_snapshot_id, bs2.pk)
+        self.assertFalse(bs1.is_tip)
+
     def test_remove_child(self):
         """Test behavior for removing a child."""
         bs1 = seed_models.BuildingSnapshot.objects.create()
@@ -288,6 +371,64 @@ class TestBuildingSnapshot(TestCase):
         refreshed_bs2_canon = refreshed_bs2.canonical_building
         self.assertFalse(refreshed_bs2_canon.active)
 
+    def test_save_snapshot_matches(self):
+        """Batched matches are saved like ``save_snapshot_match`` does."""
+        bs2_canon = self.bs2.canonical_building
+
+        results = seed_models.save_snapshot_matches(
+            [(self.bs1.pk, self.bs2.pk, 0.9, seed_models.SYSTEM_MATCH)],
+            user=self.fake_user,
+        )
+
+        self.assertEqual(seed_models.BuildingSnapshot.objects.all().count(), 3)
+        result = seed_models.BuildingSnapshot.objects.get(pk=results[0].pk)
+        self.assertEqual(result.property_name, self.bs1.property_name)
+        self.assertEqual(result.property_name_source, self.bs1)
+        self.assertEqual(result.confidence, 0.9)
+        self.assertEqual(result.last_modified_by, self.fake_user)
+        self.assertEqual(result.match_key, '435422 1243 1243 555 database ln')
+        self.assertEqual([r.pk for r in result.meters.all()], [self.meter.pk])
+        self.assertEqual(
+            sorted([r.pk for r in result.parents.all()]),
+            sorted([self.bs1.pk, self.bs2.pk])
+        )
+        # Differing values are kept as variants.
+        variant = result.variants.get(field_name='property_name')
+        self.assertEqual(
+            sorted(variant.options.values_list('value', flat=True)),
+            ['A Place', 'Greenfield Complex'],
+        )
+
+        canon = seed_models.CanonicalBuilding.objects.get(
+            pk=self.bs1.canonical_building.pk
+        )
+        self.assertEqual(canon.canonical_snapshot, result)
+        self.assertEqual(result.canonical_building, canon)
+        self.assertFalse(
+            seed_models.CanonicalBuilding.raw_objects.get(
+                pk=bs2_canon.pk
+            ).active
+        )
+
+    def test_save_snapshot_matches_chained(self):
+        """Later matches in a batch merge into the tips of earlier ones."""
+        self._add_additional_fake_buildings()
+
+        first, second = seed_models.save_snapshot_matches([
+            (self.bs1.pk, self.bs3.pk, 0.9, seed_models.SYSTEM_MATCH),
+            (self.bs1.pk, self.bs4.pk, 0.5, seed_models.POSSIBLE_MATCH),
+        ])
+
+        self.assertEqual(
+            sorted([r.pk for r in second.parents.all()]),
+            sorted([first.pk, self.bs4.pk])
+        )
+        self.assertEqual(self.bs1.tip, second)
+        canon = seed_models.CanonicalBuilding.objects.get(
+            pk=self.bs1.canonical_building.pk
+        )
+        self.assertEqual(canon.canonical_snapshot, second)
+
     def test_merge_extra_data_no_data(self):
         """Test edgecase where there is no extra_data to merge."""
         test_extra, test_sources = mapper.merge_extra_data(self.bs1, self.bs2)
@@ -417,6 +558,132 @@ class TestBuildingSnapshot(TestCase):
             sorted(fake_building_extra.keys())
         )
 
+    def test_update_building_compacts_edits(self):
+        """An edit which is edited again keeps only the values it changed."""
+        fake_building = util.make_fake_snapshot(
+            self.import_file1,
+            {
+                u'property_name': u'Place pl.',
+                u'address_line_1': u'332 Place pl.',
+                u'postal_code': u'68674',
+            },
+            seed_models.COMPOSITE_BS,
+            is_canon=True
+        )
+        fake_building.super_organization = self.fake_org
+        fake_building.extra_data = {u'Assessor Data 1': u'2342342'}
+        fake_building.save()
+        seed_models.set_initial_sources(fake_building)
+
+        def edit(snapshot, postal_code, extra_data):
+            # Simulate the hydrated JS payload.
+            updated_values = {
+                u'pk': snapshot.pk,
+                u'property_name': snapshot.property_name,
+                u'property_name_source': snapshot.property_name_source_id,
+                u'address_line_1': snapshot.address_line_1,
+                u'address_line_1_source': (
+                    snapshot.address_line_1_source_id
+                ),
+                u'postal_code': postal_code,
+                u'extra_data': extra_data,
+            }
+            return seed_models.update_building(
+                snapshot, updated_values, self.fake_user
+            )
+
+        first = edit(fake_building, u'99999', {u'Assessor Data 1': u'NUP.'})
+        second = edit(first, u'11111', {
+            u'Assessor Data 1': u'NUP.', u'Assessor Data 2': u'245646',
+        })
+
+        # The original snapshot wasn't an edit, so is left alone.
+        fake_building = seed_models.BuildingSnapshot.objects.get(
+            pk=fake_building.pk
+        )
+        self.assertIsNone(fake_building.edit_delta)
+        self.assertEqual(fake_building.postal_code, u'68674')
+
+        stored = seed_models.BuildingSnapshot.objects.stored().get(
+            pk=first.pk
+        )
+        self.assertIsNotNone(stored.edit_delta)
+        self.assertIsNone(stored.address_line_1)
+        self.assertEqual(stored.extra_data, {})
+        self.assertIsNone(second.edit_delta)
+
+        # Filled in as it's loaded, worked out from the second edit rather
+        # than the cache.
+        cache.delete(seed_models.SNAPSHOT_VALUES_KEY.format(first.pk))
+        loaded = seed_models.BuildingSnapshot.objects.get(pk=first.pk)
+        self.assertEqual(loaded.postal_code, u'99999')
+        self.assertEqual(loaded.postal_code_source_id, first.pk)
+        self.assertEqual(loaded.address_line_1, u'332 Place pl.')
+        self.assertEqual(loaded.extra_data, {u'Assessor Data 1': u'NUP.'})
+        self.assertEqual(
+            loaded.extra_data_sources, {u'Assessor Data 1': first.pk}
+        )
+        self.assertEqual(second.postal_code_source_id, second.pk)
+        # Related managers fill it in, too.
+        self.assertEqual(
+            second.parents.get().to_dict()['address_line_1'],
+            u'332 Place pl.'
+        )
+
+        # Deleting the second edit writes the first's values back.
+        cache.delete(seed_models.SNAPSHOT_VALUES_KEY.format(first.pk))
+        second.delete()
+        stored = seed_models.BuildingSnapshot.objects.stored().get(
+            pk=first.pk
+        )
+        self.assertIsNone(stored.edit_delta)
+        self.assertEqual(stored.postal_code, u'99999')
+        self.assertEqual(stored.address_line_1, u'332 Place pl.')
+
+    def test_compacted_edit_without_edit_of_it(self):
+        """A compacted edit which has lost the edit of it fails loudly."""
+        parent = util.make_fake_snapshot(
+            self.import_file1, {}, seed_models.COMPOSITE_BS
+        )
+        snapshot = util.make_fake_snapshot(
+            self.import_file1, {}, seed_models.COMPOSITE_BS
+        )
+        parent.children.add(snapshot)
+        seed_models.BuildingSnapshot.objects.filter(pk=snapshot.pk).update(
+            edit_delta={'fields': {}}
+        )
+
+        with self.assertRaises(seed_models.BuildingSnapshot.DoesNotExist):
+            seed_models.BuildingSnapshot.objects.get(pk=snapshot.pk)
+
+    def test_compact_edit_round_trip(self):
+        """Compacted values come back exactly, floats and dates included."""
+        parent = util.make_fake_snapshot(
+            self.import_file1, {}, seed_models.COMPOSITE_BS
+        )
+        snapshot = util.make_fake_snapshot(
+            self.import_file1,
+            {
+                u'gross_floor_area': 123.45678901234567,
+                u'year_ending': date(2014, 12, 31),
+            },
+            seed_models.COMPOSITE_BS
+        )
+        child = util.make_fake_snapshot(
+            self.import_file1,
+            {u'gross_floor_area': 1.0},
+            seed_models.COMPOSITE_BS
+        )
+        parent.children.add(snapshot)
+        snapshot.children.add(child)
+
+        seed_models.compact_edit(snapshot, child)
+        cache.delete(seed_models.SNAPSHOT_VALUES_KEY.format(snapshot.pk))
+
+        stored = seed_models.BuildingSnapshot.objects.get(pk=snapshot.pk)
+        self.assertEqual(stored.gross_floor_area, 123.45678901234567)
+        self.assertEqual(stored.year_ending, date(2014, 12, 31))
+
     def test_recurse_tree(self):
         """Make sure we get an accurate child tree."""
         self._add_additional_fake_buildings()
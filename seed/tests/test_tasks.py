@@ -1,15 +1,22 @@
 """
 :copyright: (c) 2014 Building Energy Inc
 """
+import os
+import shutil
+import tempfile
 from dateutil import parser
 from os import path
 
 from mock import patch
+from mcm import reader
 
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.core.files import File
+from django.core.files.base import ContentFile
 
 from audit_logs.models import AuditLog
+from data_importer import storage
 from data_importer.models import ImportFile, ImportRecord
 from landing.models import SEEDUser as User
 from superperms.orgs.models import Organization, OrganizationUser
@@ -86,6 +93,58 @@ class TestCleaner(TestCase):
         )
 
 
+class TestMappingPlan(TestCase):
+    """Tests that compiled mapping plans follow their org's mappings."""
+
+    def setUp(self):
+        self.org = Organization.objects.create()
+        util.make_fake_mappings({'property_name': u'Name'}, self.org)
+
+    def test_get_mapping_plan(self):
+        plan = tasks.get_mapping_plan(self.org)
+
+        self.assertEqual(plan.mapping, {u'Name': u'property_name'})
+        self.assertEqual(plan.apply_columns, [])
+        # Unchanged mappings reuse the compiled plan.
+        self.assertIs(tasks.get_mapping_plan(self.org), plan)
+
+    def test_mapping_change_invalidates_plan(self):
+        plan = tasks.get_mapping_plan(self.org)
+
+        util.make_fake_mappings({'not_a_field': u'Notes'}, self.org)
+        new_plan = tasks.get_mapping_plan(self.org)
+
+        self.assertIsNot(new_plan, plan)
+        self.assertEqual(new_plan.mapping, {
+            u'Name': u'property_name',
+            u'Notes': u'not_a_field',
+        })
+        self.assertEqual(new_plan.apply_columns, [u'Notes'])
+
+        ColumnMapping.objects.filter(super_organization=self.org).delete()
+        self.assertEqual(tasks.get_mapping_plan(self.org).mapping, {})
+
+    def test_column_unit_invalidates_plan(self):
+        util.make_fake_mappings({'my_eui': u'EUI'}, self.org)
+        plan = tasks.get_mapping_plan(self.org)
+        self.assertEqual(plan.cleaner.clean_value('123,456', 'my_eui'),
+                         '123,456')
+
+        column = Column.objects.get(
+            column_name='my_eui', organization=self.org
+        )
+        column.unit = Unit.objects.create(
+            unit_name='my_eui unit',
+            unit_type=FLOAT,
+        )
+        column.save()
+        new_plan = tasks.get_mapping_plan(self.org)
+
+        self.assertIsNot(new_plan, plan)
+        self.assertEqual(new_plan.cleaner.clean_value('123,456', 'my_eui'),
+                         123456)
+
+
 class TestTasks(TestCase):
     """Tests for dealing with SEED related tasks."""
 
@@ -186,6 +245,40 @@ class TestTasks(TestCase):
                 (k, expected_pk, raw_bldg.extra_data_sources.get(k))
             )
 
+    def test_save_raw_data_rows(self):
+        """Every row of the file is read and saved, in order."""
+        parser = reader.MCMParser(self.import_file.local_file)
+        rows = list(parser.next())
+        self.import_file.num_rows = len(rows)
+        self.import_file.save()
+
+        tasks._save_raw_data_rows(self.import_file.pk, 'fake_cache_key', 1)
+
+        raw_saved = BuildingSnapshot.objects.filter(
+            import_file=self.import_file,
+        ).order_by('pk')
+        self.assertEqual(
+            [raw_bldg.extra_data for raw_bldg in raw_saved], rows
+        )
+
+    def test_save_raw_rows(self):
+        """Bulk saved raw rows source themselves."""
+        rows = [self.fake_row, self.fake_extra_data]
+        tasks._save_raw_rows(rows, self.import_file, ASSESSED_RAW)
+
+        raw_saved = BuildingSnapshot.objects.filter(
+            import_file=self.import_file,
+        ).order_by('pk')
+
+        self.assertEqual(raw_saved.count(), 2)
+        for raw_bldg, row in zip(raw_saved, rows):
+            self.assertDictEqual(raw_bldg.extra_data, row)
+            self.assertEqual(raw_bldg.super_organization, self.fake_org)
+            self.assertEqual(raw_bldg.tax_lot_id_source_id, raw_bldg.pk)
+            self.assertEqual(raw_bldg.address_line_1_source_id, raw_bldg.pk)
+            for k in row:
+                self.assertEqual(raw_bldg.extra_data_sources[k], raw_bldg.pk)
+
     def test_map_data(self):
         """Save mappings based on user specifications."""
         fake_import_file = ImportFile.objects.create(
@@ -307,6 +400,40 @@ class TestTasks(TestCase):
             'System matched building ID.'
         )
 
+    def test_match_buildings_shared_id(self):
+        """Buildings in one file matching the same ID end up in one tree."""
+        snapshot = util.make_fake_snapshot(
+            self.import_file,
+            {'pm_property_id': '1243', 'property_name': 'Greenfield'},
+            ASSESSED_BS, is_canon=True, org=self.fake_org
+        )
+        new_import_file = ImportFile.objects.create(
+            import_record=self.import_record,
+            mapping_done=True
+        )
+        first = util.make_fake_snapshot(
+            new_import_file, {'pm_property_id': '1243'}, PORTFOLIO_BS,
+            org=self.fake_org
+        )
+        # Matches a different field than the canonical snapshot has it in.
+        second = util.make_fake_snapshot(
+            new_import_file, {'tax_lot_id': '1243'}, PORTFOLIO_BS,
+            org=self.fake_org
+        )
+
+        tasks.match_buildings(new_import_file.pk, self.fake_user.pk)
+
+        canon = CanonicalBuilding.objects.get(active=True)
+        self.assertEqual(canon.pk, snapshot.canonical_building.pk)
+        tip = canon.canonical_snapshot
+        parents = tip.parents.order_by('pk')
+        # The first match's snapshot was created after ``second``.
+        self.assertEqual(parents[0].pk, second.pk)
+        self.assertEqual(
+            sorted(parents[1].parents.values_list('pk', flat=True)),
+            [snapshot.pk, first.pk]
+        )
+
     def test_match_no_matches(self):
         """When a canonical exists, but doesn't match, we create a new one."""
         bs1_data = {
@@ -460,6 +587,71 @@ class TestTasks(TestCase):
             1
         )
 
+    def test_fuzzy_match_buildings(self):
+        """Buildings without a shared ID are scored in chunks and merged."""
+        bs1_data = {
+           'pm_property_id': 123,
+           'tax_lot_id': '435/422',
+           'property_name': 'Greenfield Complex',
+           'address_line_1': '555 NorthWest Databaseer Lane.',
+           'city': 'Gotham City',
+           'postal_code': 8999,
+        }
+        bs2_data = {
+           'pm_property_id': 456,
+           'tax_lot_id': '435/423',
+           'property_name': 'Greenfield Complex',
+           'address_line_1': '555 NorthWest Databaser Lane',
+           'city': 'Gotham City',
+           'postal_code': 8999,
+        }
+        snapshot = util.make_fake_snapshot(
+            self.import_file, bs1_data, ASSESSED_BS, is_canon=True,
+            org=self.fake_org
+        )
+        # As a fresh import, or a remap, leaves it.
+        new_import_file = ImportFile.objects.create(
+            import_record=self.import_record,
+            mapping_done=True,
+            mapping_completion=None,
+        )
+        new_snapshot = util.make_fake_snapshot(
+            new_import_file, bs2_data, PORTFOLIO_BS, org=self.fake_org
+        )
+
+        with patch.object(tasks, 'MATCH_CHUNK_SIZE', 1):
+            tasks.match_buildings(new_import_file.pk, self.fake_user.pk)
+
+        child = BuildingSnapshot.objects.get(parents=new_snapshot)
+        self.assertEqual(
+            sorted(child.parents.values_list('pk', flat=True)),
+            sorted([snapshot.pk, new_snapshot.pk])
+        )
+
+        new_import_file = ImportFile.objects.get(pk=new_import_file.pk)
+        self.assertTrue(new_import_file.matching_done)
+        self.assertEqual(new_import_file.mapping_completion, 100)
+
+    def test_resolve_match_types(self):
+        """Only the best claim on a canonical building is a system match."""
+        scores = [
+            (12, 100, 0.9),
+            (10, 100, 0.95),
+            (11, None, None),
+            (13, 200, 0.8),
+            (14, 200, 0.8),
+            (15, 300, 0.5),
+        ]
+
+        self.assertEqual(tasks._resolve_match_types(scores), [
+            (10, 100, 0.95, SYSTEM_MATCH),
+            (11, None, None, None),
+            (12, 100, 0.9, POSSIBLE_MATCH),
+            (13, 200, 0.8, SYSTEM_MATCH),
+            (14, 200, 0.8, POSSIBLE_MATCH),
+            (15, 300, 0.5, POSSIBLE_MATCH),
+        ])
+
     def test_get_ancestors(self):
         """Tests get_ancestors(building), returns all non-composite, non-raw
             BuildingSnapshot instances.
@@ -730,3 +922,127 @@ class TestTasksXLSX(TestTasks):
             'address_line_1': u'Address Line 1',
             'year_built': u'Year Built'
         }
+
+
+class TestFusedImport(TestCase):
+    """Tests for mapping rows as they're parsed."""
+
+    def setUp(self):
+        self.fake_user = User.objects.create(username='test')
+        self.fake_org = Organization.objects.create()
+        self.import_record = ImportRecord.objects.create(
+            owner=self.fake_user,
+            super_organization=self.fake_org,
+        )
+        self.import_file = ImportFile.objects.create(
+            import_record=self.import_record,
+            source_type='Assessed Raw',
+        )
+        rows = ['Name,Address Line 1'] + [
+            'Building {0},{0} Main St.'.format(i) for i in range(10)
+        ]
+        self.import_file.file.save(
+            'fused.csv', ContentFile('\n'.join(rows) + '\n')
+        )
+
+        util.make_fake_mappings({
+            'property_name': u'Name',
+            'address_line_1': u'Address Line 1',
+        }, self.fake_org)
+
+    def assertMapped(self):
+        self.assertFalse(BuildingSnapshot.objects.filter(
+            import_file=self.import_file,
+            source_type=ASSESSED_RAW,
+        ).exists())
+
+        mapped = BuildingSnapshot.objects.filter(
+            import_file=self.import_file,
+            source_type=ASSESSED_BS,
+        )
+        self.assertEqual(
+            sorted(mapped.values_list('property_name', flat=True)),
+            ['Building {0}'.format(i) for i in range(10)]
+        )
+
+    @patch.object(tasks, 'FUSED_IMPORT', True)
+    def test_fused_import(self):
+        tasks._save_raw_data(self.import_file.pk)
+
+        import_file = ImportFile.objects.get(pk=self.import_file.pk)
+        self.assertTrue(import_file.fused_import)
+        self.assertTrue(import_file.raw_save_done)
+        self.assertTrue(import_file.mapping_done)
+        self.assertEqual(import_file.num_rows, 10)
+        self.assertMapped()
+
+        # Remapping reads the rows from the file again.
+        tasks.remap_data(self.import_file.pk)
+        self.assertMapped()
+
+    @patch.object(tasks, 'FUSED_IMPORT', True)
+    def test_unmapped_columns(self):
+        """Files with columns that need mapping are saved raw."""
+        ColumnMapping.objects.filter(
+            column_raw__column_name=u'Name'
+        ).delete()
+
+        tasks._save_raw_data(self.import_file.pk)
+
+        import_file = ImportFile.objects.get(pk=self.import_file.pk)
+        self.assertFalse(import_file.fused_import)
+        self.assertFalse(import_file.mapping_done)
+        self.assertEqual(BuildingSnapshot.objects.filter(
+            import_file=self.import_file,
+            source_type=ASSESSED_RAW,
+        ).count(), 10)
+
+
+class TestImportFileCache(TestCase):
+    """Import stages share a bounded local copy of the uploaded file."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            IMPORT_FILE_CACHE_DIR=self.cache_dir
+        )
+        self.settings_override.enable()
+
+        import_record = ImportRecord.objects.create()
+        self.import_file = ImportFile.objects.create(
+            import_record=import_record
+        )
+        self.file_path = path.join(
+            path.dirname(__file__), 'data', 'portfolio-manager-sample.csv'
+        )
+        self.import_file.file = File(open(self.file_path))
+        self.import_file.save()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.cache_dir)
+
+    def test_local_path_is_shared(self):
+        """Every stage reads the same local copy."""
+        local_path = self.import_file.local_path
+        other = ImportFile.objects.get(pk=self.import_file.pk)
+
+        self.assertEqual(other.local_path, local_path)
+        self.assertEqual(os.listdir(self.cache_dir), [
+            path.basename(local_path)
+        ])
+        with open(self.file_path) as original:
+            self.assertEqual(other.local_file.read(), original.read())
+
+    def test_evict(self):
+        """Least recently used copies go once we're over the limit."""
+        local_path = self.import_file.local_path
+        stale_path = path.join(self.cache_dir, 'stale')
+        with open(stale_path, 'w') as stale:
+            stale.write('old data')
+        os.utime(stale_path, (0, 0))
+
+        storage.evict(max_bytes=os.path.getsize(local_path))
+
+        self.assertFalse(path.exists(stale_path))
+        self.assertTrue(path.exists(local_path))
@@ -1,8 +1,24 @@
 """
 :copyright: (c) 2014 Building Energy Inc
 """
+import csv
+import datetime
+import io
+import os
+import tempfile
+
 from django.test import TestCase
+from mcm import cleaners
+from superperms.orgs.models import Organization
+from seed import search
+from seed.models import (
+    DATE, FLOAT, STRING, BuildingSnapshot, Column, ExtraDataKeyUsage,
+    PromotedValue, Unit, save_promoted_values, update_search_documents,
+)
+from seed.utils import extra_data_indexes, promoted_columns
+from seed.utils.cleaning import BatchCleaner
 from seed.utils.generic import split_model_fields
+from seed.utils.shards import find_record_boundaries, get_shards, read_shard
 
 
 class DummyClass(object):
@@ -39,3 +55,325 @@ class TestGenericUtils(TestCase):
         obj_fields, non_obj_fields = split_model_fields(obj, fields_to_split)
         self.assertEqual(obj_fields, [])
         self.assertEqual(non_obj_fields, [f4])
+
+
+class TestShards(TestCase):
+
+    data = (
+        'id,name\n'
+        '1,"multi\nline"\n'
+        '2,"say ""hi""\n"\n'
+        '3,plain\n'
+        '4,last'
+    )
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_find_record_boundaries(self):
+        """Boundaries never split a quoted field, whatever the block size."""
+        expected = [8, 23, 39, 47]
+        for block_size in range(1, len(self.data) + 1):
+            boundaries = find_record_boundaries(
+                io.BytesIO(self.data), 1, block_size=block_size
+            )
+            self.assertEqual(boundaries, expected)
+
+    def test_get_shards(self):
+        """Shards cover every record after the header exactly once."""
+        header_end, shards = get_shards(self.path, 1)
+        self.assertEqual(header_end, 8)
+        self.assertEqual(shards, [(8, 23), (23, 39), (39, 47), (47, 53)])
+
+        header_end, shards = get_shards(self.path, 1024)
+        self.assertEqual(shards, [(8, 53)])
+
+    def test_read_shard(self):
+        """Each shard parses on its own, header row included."""
+        header_end, shards = get_shards(self.path, 20)
+        rows = []
+        for start, end in shards:
+            shard = read_shard(self.path, header_end, start, end)
+            rows.extend(csv.DictReader(shard))
+
+        self.assertEqual(rows, [
+            {'id': '1', 'name': 'multi\nline'},
+            {'id': '2', 'name': 'say "hi"\n'},
+            {'id': '3', 'name': 'plain'},
+            {'id': '4', 'name': 'last'},
+        ])
+
+    def test_no_newlines(self):
+        """Files without newline terminated rows can't be sharded."""
+        with open(self.path, 'wb') as f:
+            f.write('id,name\r1,one\r')
+
+        self.assertIsNone(get_shards(self.path, 1))
+
+
+class TestBatchCleaner(TestCase):
+
+    types = {
+        'floaty': 'float',
+        'datey': 'date',
+        'stringy': 'str',
+    }
+    values = [
+        u'', u'0', u'12', u'-12', u'12.50', u'1,234', u'$1,234.56', u'12 ',
+        u'n/a', u'Not Available', u'2014-01-02', u'1/2/2014', u'01/02/2014',
+        u'2014-01-02 03:04:05', u'Jan 2, 2014', u'garbage',
+    ]
+
+    def test_parity(self):
+        """Every cell cleans exactly the same as with the MCM cleaner."""
+        cleaner = cleaners.Cleaner({'types': self.types})
+        mapping = dict((name.upper(), name) for name in self.types)
+        rows = [
+            dict((raw_name, value) for raw_name in mapping)
+            for value in self.values
+        ]
+
+        batch_cleaner = BatchCleaner(cleaner, self.types)
+        batch_cleaner.clean_rows(rows, mapping)
+
+        for row in rows:
+            for raw_name, value in row.items():
+                column_name = mapping[raw_name]
+                expected = cleaner.clean_value(value, column_name)
+                result = batch_cleaner.clean_value(value, column_name)
+                self.assertEqual(
+                    (type(result), result), (type(expected), expected),
+                    '{0!r} in {1} cleaned differently'.format(
+                        value, column_name
+                    )
+                )
+
+
+class TestExtraDataIndexes(TestCase):
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='my org')
+
+    def _search(self, seconds, **params):
+        qs = BuildingSnapshot.objects.all()
+        for key, value in params.items():
+            qs = qs.json_query(key, cond='>', value=value, key_cast='float')
+        extra_data_indexes.record_key_usage(qs, [self.org], seconds)
+
+    def test_record_key_usage(self):
+        """Each search counts once for each of its keys."""
+        self._search(0.5, eui='10', score='50')
+        self._search(1.5, eui='20')
+
+        eui = ExtraDataKeyUsage.objects.get(key='eui')
+        self.assertEqual(eui.key_cast, 'float')
+        self.assertEqual(eui.filter_count, 2)
+        self.assertEqual(eui.sort_count, 0)
+        self.assertAlmostEqual(eui.seconds_per_query, 1.0)
+        self.assertEqual(
+            ExtraDataKeyUsage.objects.get(key='score').filter_count, 1
+        )
+
+        # Searches without extra_data keys aren't counted.
+        extra_data_indexes.record_key_usage(
+            BuildingSnapshot.objects.all(), [self.org], 2.0
+        )
+        self.assertEqual(ExtraDataKeyUsage.objects.count(), 2)
+
+    def test_advise(self):
+        """Busy, slow float keys are indexed; quiet indexes are dropped."""
+        for _ in range(3):
+            self._search(1.0, eui='10')
+            self._search(0.01, score='50')
+        self._search(1.0, area='5')
+        idle = ExtraDataKeyUsage.objects.create(
+            organization=self.org,
+            key='old',
+            key_cast='float',
+            index_name='seed_bs_ed_old',
+            indexed_at=datetime.datetime(2014, 1, 1),
+        )
+
+        to_create, to_drop = extra_data_indexes.advise(
+            min_queries=2, min_seconds=0.5
+        )
+
+        self.assertEqual([u.key for u in to_create], ['eui'])
+        self.assertEqual(to_drop, [idle])
+
+        # No more than max_per_org indexes for an org.
+        to_create, _ = extra_data_indexes.advise(
+            min_queries=1, min_seconds=0.5, max_per_org=1
+        )
+        self.assertEqual([u.key for u in to_create], ['eui'])
+
+    def test_report(self):
+        """Time saved is the drop in search time, for each search since."""
+        ExtraDataKeyUsage.objects.create(
+            organization=self.org,
+            key='eui',
+            key_cast='float',
+            filter_count=10,
+            seconds=1.0,
+            index_name='seed_bs_ed_eui',
+            indexed_at=datetime.datetime.now(),
+            seconds_per_query_before=0.5,
+        )
+
+        rows = extra_data_indexes.report()
+
+        self.assertEqual(len(rows), 1)
+        self.assertAlmostEqual(rows[0]['seconds_per_query'], 0.1)
+        self.assertAlmostEqual(rows[0]['seconds_saved'], 4.0)
+
+
+class TestPromotedColumns(TestCase):
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='my org')
+        self.eui = Column.objects.create(
+            organization=self.org,
+            column_name='eui',
+            is_extra_data=True,
+            unit=Unit.objects.create(unit_name='kBtu', unit_type=FLOAT),
+        )
+        self.snapshots = []
+        for eui in ['10', '20.5', 'Not Available', '30']:
+            snapshot = BuildingSnapshot.objects.create(
+                super_organization=self.org
+            )
+            snapshot.extra_data = {'eui': eui}
+            snapshot.save()
+            self.snapshots.append(snapshot)
+
+    def _filter(self, params, orgs):
+        return search.filter_other_params(
+            BuildingSnapshot.objects.all(), params, {}, orgs=orgs
+        )
+
+    def test_promotable(self):
+        """Only numeric and date extra_data columns can be promoted."""
+        self.assertTrue(promoted_columns.is_promotable(self.eui))
+        text = Column.objects.create(
+            organization=self.org,
+            column_name='type',
+            is_extra_data=True,
+            unit=Unit.objects.create(unit_name='text', unit_type=STRING),
+        )
+        self.assertFalse(promoted_columns.is_promotable(text))
+        self.assertRaises(ValueError, promoted_columns.promote_column, text)
+
+    def test_promote_column(self):
+        """Promoting fills in typed values, skipping ones of another type."""
+        promoted_columns.promote_column(self.eui, batch_size=3)
+
+        values = PromotedValue.objects.filter(column=self.eui)
+        self.assertEqual(
+            sorted(values.values_list('float_value', flat=True)),
+            [10.0, 20.5, 30.0]
+        )
+
+        promoted_columns.demote_column(self.eui)
+        self.assertFalse(self.eui.is_promoted)
+        self.assertEqual(values.count(), 0)
+
+    def test_save_promoted_values(self):
+        """New snapshots get values for their org's promoted columns."""
+        promoted_columns.promote_column(self.eui)
+        date = Column.objects.create(
+            organization=self.org,
+            column_name='audited',
+            is_extra_data=True,
+            is_promoted=True,
+            unit=Unit.objects.create(unit_name='date', unit_type=DATE),
+        )
+        snapshot = BuildingSnapshot.objects.create(super_organization=self.org)
+        snapshot.extra_data = {'eui': 40, 'audited': '2014-03-01'}
+        snapshot.save()
+
+        save_promoted_values([snapshot])
+
+        self.assertEqual(
+            snapshot.promoted_values.get(column=self.eui).float_value, 40.0
+        )
+        self.assertEqual(
+            snapshot.promoted_values.get(column=date).date_value.month, 3
+        )
+
+    def test_filter_other_params(self):
+        """Ranges on promoted columns give what ranges on extra_data do."""
+        params = {'eui__gte': '15', 'eui__lt': '30'}
+        expected = list(self._filter(params, None))
+        self.assertEqual(expected, [self.snapshots[1]])
+
+        promoted_columns.promote_column(self.eui)
+        qs = self._filter(params, [self.org])
+        self.assertIn('seed_promotedvalue', str(qs.query))
+        self.assertEqual(list(qs), expected)
+
+        # Only when every org searched has promoted the column.
+        other_org = Organization.objects.create(name='other org')
+        qs = self._filter(params, [self.org, other_org])
+        self.assertNotIn('seed_promotedvalue', str(qs.query))
+
+
+class TestSearchDocuments(TestCase):
+
+    def setUp(self):
+        self.org = Organization.objects.create(name='my org')
+        self.snapshots = []
+        for name, address, extra_data in [
+            ('Main Office', '123 Main St', {'Owner': 'Acme'}),
+            ('Warehouse', '456 Mainstay Ave', {}),
+            ('Acme Tower', '789 Oak St', {}),
+        ]:
+            snapshot = BuildingSnapshot.objects.create(
+                super_organization=self.org,
+                property_name=name,
+                address_line_1=address,
+            )
+            snapshot.extra_data = extra_data
+            snapshot.save()
+            self.snapshots.append(snapshot)
+        update_search_documents(s.pk for s in self.snapshots)
+
+    def _search(self, q, rank=False):
+        return list(search.search_buildings(
+            q, queryset=BuildingSnapshot.objects.all(), rank=rank
+        ))
+
+    def test_search_query(self):
+        """Every word of a search has to start a word of the document."""
+        self.assertEqual(search.search_query('123 Mai'), '123:* & mai:*')
+        self.assertEqual(search.search_query('435/422'), '435:* & 422:*')
+        self.assertEqual(search.search_query(' - '), None)
+
+    def test_search_buildings(self):
+        """Searches match word prefixes across fields and extra_data."""
+        s = self.snapshots
+        self.assertEqual(set(self._search('main')), set([s[0], s[1]]))
+        self.assertEqual(self._search('123 main'), [s[0]])
+        self.assertEqual(self._search('ain'), [])
+        self.assertEqual(set(self._search('acme')), set([s[0], s[2]]))
+        self.assertEqual(self._search('?!'), [])
+
+    def test_rank(self):
+        """Ranked searches put matches on names ahead of extra_data."""
+        self.assertEqual(
+            self._search('acme', rank=True),
+            [self.snapshots[2], self.snapshots[0]]
+        )
+
+    def test_save_keeps_document(self):
+        """Saving a snapshot loaded before its document was written."""
+        snapshot = BuildingSnapshot.objects.create(
+            super_organization=self.org, property_name='Annex'
+        )
+        update_search_documents([snapshot.pk])
+        snapshot.save()
+        self.assertEqual(self._search('annex'), [snapshot])
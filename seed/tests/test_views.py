@@ -38,6 +38,7 @@ from seed.views.main import (
 )
 from seed.utils.mapping import _get_column_names
 from seed.utils.constants import ASSESSOR_FIELDS
+from seed.utils.trees import SnapshotTree
 from seed.tests import util as test_util
 
 
@@ -1828,3 +1829,14 @@ class MatchTreeTests(TestCase):
 
         self.assertEqual(bs4_root, self.bs3)
         self.assertItemsEqual(bs4_cps, bs4_expected_parent_coparents)
+
+    def test_snapshot_tree(self):
+        """SnapshotTree gives what the snapshots would, in a few queries."""
+        with self.assertNumQueries(4):
+            tree = SnapshotTree(self.bs4)
+            tree_dicts = [tree.to_dict(b.pk) for b in tree.match_tree()]
+
+        self.assertEqual(tree.tip, self.bs9)
+        expected = self.bs9.parent_tree + [self.bs9]
+        self.assertEqual(tree.match_tree(), expected)
+        self.assertEqual(tree_dicts, [b.to_dict() for b in expected])
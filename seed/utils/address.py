@@ -0,0 +1,122 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Normalized keys of addresses and identifiers, for exact matching.
+
+Different files write the same address or ID differently, e.g.
+'123 North Main Street, Apt. 4' and '123 N MAIN ST #4'. Both normalize to
+the same key, so a snapshot's keys are worked out once when it's mapped and
+kept in indexed columns, and exact matches are then index lookups.
+
+"""
+import re
+
+# The length of BuildingSnapshot.address_key; longer keys are cut short.
+ADDRESS_KEY_LENGTH = 255
+# Runs of anything but letters, digits and '#'.
+SEPARATOR_REGEX = re.compile(r'[^\w#]+|_+', re.UNICODE)
+# Runs of anything but letters and digits.
+ID_SEPARATOR_REGEX = re.compile(r'[\W_]+', re.UNICODE)
+# The USPS standard abbreviations of common street suffixes.
+STREET_SUFFIXES = {
+    'alley': 'aly',
+    'avenue': 'ave',
+    'av': 'ave',
+    'boulevard': 'blvd',
+    'circle': 'cir',
+    'court': 'ct',
+    'drive': 'dr',
+    'expressway': 'expy',
+    'freeway': 'fwy',
+    'highway': 'hwy',
+    'lane': 'ln',
+    'parkway': 'pkwy',
+    'place': 'pl',
+    'plaza': 'plz',
+    'road': 'rd',
+    'square': 'sq',
+    'street': 'st',
+    'terrace': 'ter',
+    'trail': 'trl',
+}
+DIRECTIONS = {
+    'north': 'n',
+    'south': 's',
+    'east': 'e',
+    'west': 'w',
+    'northeast': 'ne',
+    'northwest': 'nw',
+    'southeast': 'se',
+    'southwest': 'sw',
+}
+# Words which introduce a unit number; all become '#'.
+UNIT_WORDS = frozenset([
+    'apt', 'apartment', 'unit', 'ste', 'suite', 'rm', 'room', 'no', 'number',
+])
+
+
+def normalize_address(address):
+    """The normalized key of an address, or None if it's blank.
+
+    Lower cases, drops punctuation, abbreviates street suffixes and
+    directions, and writes unit numbers as '#4', e.g. '123 N. Main Street,
+    Suite 4' becomes '123 n main st #4'.
+
+    """
+    if not address:
+        return None
+
+    words = []
+    for word in SEPARATOR_REGEX.sub(
+        ' ', unicode(address).lower().replace('#', ' # ')
+    ).split():
+        if word in UNIT_WORDS:
+            word = '#'
+        else:
+            word = STREET_SUFFIXES.get(word) or DIRECTIONS.get(word) or word
+        if word == '#' and words and words[-1] == '#':
+            continue
+        words.append(word)
+
+    # 'Apt 4' is '# 4' so far.
+    key = ' '.join(words).replace('# ', '#').rstrip(' #')
+
+    return key[:ADDRESS_KEY_LENGTH] or None
+
+
+def normalize_identifier(value):
+    """The normalized key of an ID, or None if it's blank.
+
+    Lower cases and strips it, and writes each run of punctuation or spaces
+    as '-', so that '435/422' and '435 - 422' are the same ID but '12-3' and
+    '1-23' aren't.
+
+    """
+    if value is None:
+        return None
+
+    key = ID_SEPARATOR_REGEX.sub('-', unicode(value).lower()).strip('-')
+
+    return key or None
+
+
+def identifier_keys(values):
+    """The normalized keys of several IDs, as a set."""
+    keys = set(normalize_identifier(value) for value in values)
+    keys.discard(None)
+
+    return keys
+
+
+def join_identifier_keys(keys):
+    """The space separated form ``BuildingSnapshot.identifier_keys`` keeps.
+
+    Returns None if there are no keys.
+
+    """
+    return ' '.join(sorted(keys)) or None
+
+
+def split_identifier_keys(joined):
+    return set(joined.split()) if joined else set()
@@ -78,7 +78,10 @@ def get_search_query(user, params):
     )
 
     buildings_queryset = search.filter_other_params(
-        buildings_queryset, other_search_params, mappable_types
+        buildings_queryset,
+        other_search_params,
+        mappable_types,
+        orgs=user.orgs.all(),
     )
 
     return buildings_queryset
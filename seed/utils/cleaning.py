@@ -0,0 +1,197 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Clean a whole chunk of rows a column at a time.
+
+``mapper.map_row`` asks its cleaner for one cell at a time. ``BatchCleaner``
+cleans every column of a chunk up front, once per distinct value, and then
+answers ``map_row`` from what it has already cleaned.
+
+Plain numbers and dates in a recognised format skip the MCM cleaner and are
+converted a whole column at a time. A fast path is only used for a column
+after it has given the same result as the MCM cleaner for one of that
+column's values. Anything a fast path can't handle goes to the MCM cleaner,
+so results are always the same as calling it directly.
+
+"""
+import datetime
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FLOAT_TYPES = ('float',)
+DATE_TYPES = ('date', 'datetime')
+NUMBER_REGEX = re.compile(r'^-?\d+(\.\d+)?$')
+# Tried in order, so put the most common first.
+DATE_FORMATS = (
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%Y-%m-%d %H:%M:%S',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%Y/%m/%d',
+)
+
+
+def _same(a, b):
+    """True if a and b are the same value and the same type."""
+    return type(a) is type(b) and a == b
+
+
+def _to_floats(values):
+    """Convert a list of number strings to floats in one pass."""
+    if numpy is not None:
+        return numpy.array(values).astype(numpy.float64).tolist()
+
+    return [float(value) for value in values]
+
+
+def _infer_date_format(value):
+    for date_format in DATE_FORMATS:
+        try:
+            datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        return date_format
+
+
+class BatchCleaner(object):
+    """Wraps an MCM cleaner, cleaning chunks of rows a column at a time.
+
+    Use ``clean_rows`` on a chunk, then pass this wherever the MCM cleaner
+    would have gone, e.g. as ``mapper.map_row``'s ``cleaner``.
+
+    """
+
+    def __init__(self, cleaner, types):
+        """
+        :param cleaner: mcm.cleaners.Cleaner inst. to match.
+        :param types: dict, the cleaner's schema types, e.g.
+            {'gross_floor_area': 'float'}.
+
+        """
+        self.cleaner = cleaner
+        self.types = types
+        # {column_name: {raw value: cleaned value}}
+        self.cleaned = {}
+
+    def __getattr__(self, name):
+        # Anything else map_row might want is the MCM cleaner's business.
+        return getattr(self.cleaner, name)
+
+    def clean_rows(self, rows, mapping):
+        """Clean every mapped column of a chunk of rows.
+
+        :param rows: list of dict, raw rows keyed by raw column name.
+        :param mapping: dict, raw column name to mapped column name.
+
+        """
+        columns = {}
+        for row in rows:
+            for raw_name, value in row.items():
+                if raw_name in mapping:
+                    columns.setdefault(raw_name, set()).add(value)
+
+        for raw_name, values in columns.items():
+            self.clean_column(mapping[raw_name], values)
+
+    def clean_column(self, column_name, values):
+        """Clean a column's values, remembering the results.
+
+        :param column_name: str, the mapped name of the column.
+        :param values: iterable of raw values.
+
+        """
+        cleaned = self.cleaned.setdefault(column_name, {})
+        values = [value for value in values if value not in cleaned]
+        if not values:
+            return
+
+        column_type = self.types.get(column_name)
+        if column_type in FLOAT_TYPES:
+            values = self._clean_floats(column_name, values)
+        elif column_type in DATE_TYPES:
+            values = self._clean_dates(column_name, values)
+
+        for value in values:
+            cleaned[value] = self.cleaner.clean_value(value, column_name)
+
+    def clean_value(self, value, column_name):
+        """Same as the MCM cleaner's ``clean_value``."""
+        try:
+            return self.cleaned[column_name][value]
+        except (KeyError, TypeError):
+            return self.cleaner.clean_value(value, column_name)
+
+    def _clean_floats(self, column_name, values):
+        """Convert plain number strings; returns the values left over.
+
+        Whole numbers and decimals are checked against the MCM cleaner
+        separately, in case it keeps whole numbers as ints.
+
+        """
+        numbers = {}
+        rest = []
+        for value in values:
+            match = None
+            if isinstance(value, basestring):
+                match = NUMBER_REGEX.match(value)
+            if match:
+                numbers.setdefault(bool(match.group(1)), []).append(value)
+            else:
+                rest.append(value)
+
+        for group in numbers.values():
+            if self._agrees(column_name, group[0], float(group[0])):
+                self.cleaned[column_name].update(
+                    zip(group, _to_floats(group))
+                )
+            else:
+                rest.extend(group[1:])
+
+        return rest
+
+    def _clean_dates(self, column_name, values):
+        """Parse dates in the column's format; returns the values left over.
+
+        The format is inferred from the column's first date-like value.
+
+        """
+        date_format = None
+        for sample in values:
+            if isinstance(sample, basestring):
+                date_format = _infer_date_format(sample)
+                if date_format is not None:
+                    break
+
+        if date_format is None:
+            return values
+
+        if not self._agrees(
+            column_name, sample,
+            datetime.datetime.strptime(sample, date_format)
+        ):
+            return [value for value in values if value != sample]
+
+        cleaned = self.cleaned[column_name]
+        rest = []
+        for value in values:
+            if value == sample:
+                continue
+            try:
+                cleaned[value] = datetime.datetime.strptime(value, date_format)
+            except (TypeError, ValueError):
+                rest.append(value)
+
+        return rest
+
+    def _agrees(self, column_name, value, result):
+        """Check a fast path result against the MCM cleaner."""
+        expected = self.cleaner.clean_value(value, column_name)
+        self.cleaned[column_name][value] = expected
+
+        return _same(expected, result)
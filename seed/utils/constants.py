@@ -1,22 +1,30 @@
 EXCLUDE_FIELDS = [
+    'address_key',
     'best_guess_canonical_building',
     'best_guess_confidence',
+    'blocking_keys',
     'canonical_building',
     'canonical_for_ds',
     'children',
     'confidence',
     'created',
+    'edit_delta',
     'extra_data',
     'id',
+    'identifier_keys',
     'import_file',
+    'is_tip',
     'last_modified_by',
+    'match_key',
     'match_type',
     'modified',
     'parents',
     'pk',
+    'search_document',
     'seed_org',
     'source_type',
     'super_organization',
+    'tip_snapshot',
 ]
 
 META_FIELDS = [
@@ -0,0 +1,208 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Expression indexes on the extra_data keys orgs search on the most.
+
+Nothing indexes a single extra_data key, so a search filtering on e.g.
+'ENERGY STAR Score' reads every one of the org's snapshots.
+``record_key_usage`` counts and times the searches on each key, ``advise``
+picks the busy, slow keys to index and the indexed ones which have gone
+quiet, and ``create_key_index`` and ``drop_key_index`` do the work. The
+``extra_data_indexes`` management command puts them together.
+
+Each index is partial, covering one org's snapshots, on the float
+expression ``JsonQuerySet`` compares with (``NUMBER_TEMPL``), so only
+numeric range filters are served. Text filters are ``LIKE '%...%'``, and
+sorts put missing values first, neither of which a btree index helps with.
+
+"""
+import datetime
+import hashlib
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from seed.managers.json import NUMBER_TEMPL
+from seed.models import BuildingSnapshot, ExtraDataKeyUsage
+
+# Index float keys which have been filtered on at least this often...
+MIN_QUERIES = 100
+# ...and whose searches took at least this long on average.
+MIN_SECONDS_PER_QUERY = 0.2
+# Drop indexes on keys filtered on less than MIN_QUERIES times in this long.
+IDLE_DAYS = 30
+# Every index slows down imports a little, so keep only the busiest.
+MAX_INDEXES_PER_ORG = 10
+INDEX_PREFIX = 'seed_bs_ed_'
+
+
+def index_name(org_id, key):
+    """The name of an org's index on a key; always under 63 characters."""
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+    return '{0}{1}_{2}'.format(INDEX_PREFIX, org_id, digest)
+
+
+def _count_usage(org, usage, key, key_cast, seconds):
+    """Adds a search to a key's usage; returns 0 if it has none yet."""
+    count_field = '{0}_count'.format(usage)
+    return ExtraDataKeyUsage.objects.filter(
+        organization=org, key=key, key_cast=key_cast
+    ).update(**{
+        count_field: F(count_field) + 1,
+        'seconds': F('seconds') + seconds,
+    })
+
+
+def record_key_usage(queryset, orgs, seconds):
+    """Counts each extra_data key a search used, for each org searched.
+
+    :param queryset: JsonQuerySet, which the search ran.
+    :param orgs: iterable of Organization inst.
+    :param seconds: float, how long the search took.
+
+    """
+    keys = set(getattr(queryset, 'json_keys', []))
+    for org in orgs:
+        for usage, key, key_cast in keys:
+            if _count_usage(org, usage, key, key_cast, seconds):
+                continue
+            try:
+                with transaction.atomic():
+                    ExtraDataKeyUsage.objects.create(
+                        organization=org,
+                        key=key,
+                        key_cast=key_cast,
+                        seconds=seconds,
+                        **{'{0}_count'.format(usage): 1}
+                    )
+            except IntegrityError:
+                # Another search on the key got there first.
+                _count_usage(org, usage, key, key_cast, seconds)
+
+
+def advise(min_queries=MIN_QUERIES,
+           min_seconds=MIN_SECONDS_PER_QUERY,
+           idle_days=IDLE_DAYS,
+           max_per_org=MAX_INDEXES_PER_ORG):
+    """Which keys to index, and which indexes to drop.
+
+    :returns: tuple, (list of ExtraDataKeyUsage inst. to index, list of
+        ExtraDataKeyUsage inst. whose index to drop), busiest first.
+
+    """
+    idle_since = datetime.datetime.now() - datetime.timedelta(days=idle_days)
+    to_drop = list(ExtraDataKeyUsage.objects.filter(
+        index_name__isnull=False,
+        indexed_at__lte=idle_since,
+        filter_count__lt=min_queries,
+    ).order_by('-seconds'))
+    dropped = set(usage.pk for usage in to_drop)
+
+    indexed_per_org = {}
+    for usage in ExtraDataKeyUsage.objects.filter(index_name__isnull=False):
+        if usage.pk not in dropped:
+            org_id = usage.organization_id
+            indexed_per_org[org_id] = indexed_per_org.get(org_id, 0) + 1
+
+    to_create = []
+    candidates = ExtraDataKeyUsage.objects.filter(
+        index_name__isnull=True,
+        key_cast='float',
+        filter_count__gte=min_queries,
+    ).order_by('-seconds')
+    for usage in candidates:
+        org_id = usage.organization_id
+        if indexed_per_org.get(org_id, 0) >= max_per_org:
+            continue
+        if usage.seconds_per_query < min_seconds:
+            continue
+        to_create.append(usage)
+        indexed_per_org[org_id] = indexed_per_org.get(org_id, 0) + 1
+
+    return to_create, to_drop
+
+
+def create_key_index(usage):
+    """Indexes an org's snapshots on a key.
+
+    Builds the index concurrently, so it can't run in a transaction. The
+    usage counts start over, to compare with the searches before.
+
+    :param usage: ExtraDataKeyUsage inst.
+
+    """
+    name = index_name(usage.organization_id, usage.key)
+    table = BuildingSnapshot._meta.db_table
+    cursor = connection.cursor()
+    # A build which failed part way leaves an invalid index behind.
+    cursor.execute('DROP INDEX CONCURRENTLY IF EXISTS {0}'.format(name))
+    cursor.execute(
+        'CREATE INDEX CONCURRENTLY {0} ON {1} ({2}) '
+        'WHERE super_organization_id = %s'.format(
+            name, table, NUMBER_TEMPL.format('extra_data')
+        ),
+        [usage.key, usage.key, usage.organization_id]
+    )
+
+    usage.seconds_per_query_before = usage.seconds_per_query
+    usage.index_name = name
+    usage.indexed_at = datetime.datetime.now()
+    usage.filter_count = usage.sort_count = 0
+    usage.seconds = 0
+    usage.save()
+
+
+def drop_key_index(usage):
+    """Drops an org's index on a key.
+
+    :param usage: ExtraDataKeyUsage inst.
+
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        'DROP INDEX CONCURRENTLY IF EXISTS {0}'.format(usage.index_name)
+    )
+
+    usage.index_name = None
+    usage.indexed_at = None
+    usage.seconds_per_query_before = None
+    usage.save()
+
+
+def report():
+    """How much search time each index has saved.
+
+    :returns: list of dicts, one per index, most time saved first, like::
+
+        {
+            'organization_id': 1,
+            'key': 'ENERGY STAR Score',
+            'index_name': 'seed_bs_ed_1_...',
+            'queries': 350,
+            'seconds_per_query_before': 1.2,
+            'seconds_per_query': 0.1,
+            'seconds_saved': 385.0,
+        }
+
+    """
+    rows = []
+    for usage in ExtraDataKeyUsage.objects.filter(index_name__isnull=False):
+        before = usage.seconds_per_query_before
+        after = usage.seconds_per_query
+        saved = None
+        if before is not None and after is not None:
+            saved = (before - after) * usage.query_count
+        rows.append({
+            'organization_id': usage.organization_id,
+            'key': usage.key,
+            'index_name': usage.index_name,
+            'queries': usage.query_count,
+            'seconds_per_query_before': before,
+            'seconds_per_query': after,
+            'seconds_saved': saved,
+        })
+
+    rows.sort(key=lambda row: row['seconds_saved'] or 0, reverse=True)
+
+    return rows
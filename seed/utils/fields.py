@@ -0,0 +1,50 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Model fields which djorm_pgjson doesn't have.
+
+"""
+from django.db import models
+from djorm_pgjson.fields import JSONField
+
+
+class JSONBField(JSONField):
+    """A ``JSONField`` kept in a PostgreSQL ``jsonb`` column.
+
+    ``jsonb`` can be GIN indexed, so that key existence (``?``) and
+    containment (``@>``) filters are index scans. Needs PostgreSQL 9.4.
+
+    """
+
+    def db_type(self, connection):
+        return 'jsonb'
+
+
+class TSVectorField(models.Field):
+    """A PostgreSQL ``tsvector``, written in SQL rather than from Python.
+
+    Not editable or serialized, and always nullable, as the value is only
+    ever set by an UPDATE computing it from other columns.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('serialize', False)
+        super(TSVectorField, self).__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        return 'tsvector'
+
+
+try:
+    from south.modelsinspector import add_introspection_rules
+    add_introspection_rules([], [
+        r'^seed\.utils\.fields\.JSONBField',
+        r'^seed\.utils\.fields\.TSVectorField',
+    ])
+except ImportError:
+    pass
@@ -0,0 +1,124 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Typed, indexed copies of an org's chosen extra_data columns.
+
+A range filter on an extra_data key casts every one of the org's values to
+a float, on every search. An org can instead promote its numeric and date
+extra_data columns: each snapshot's value is then kept typed in
+``PromotedValue`` as snapshots are mapped, merged and edited (see
+``seed.models.save_promoted_values``), and ``filter_other_params`` filters
+on those with an index scan.
+
+"""
+from django.db import transaction
+
+from seed.models import (
+    PROMOTED_VALUE_FIELDS,
+    BuildingSnapshot,
+    PromotedValue,
+    get_promoted_columns,
+    promoted_value,
+    save_promoted_values,
+)
+
+# The conditions of ``filter_other_params`` as lookups.
+CONDITION_LOOKUPS = {
+    '>': 'gt',
+    '<': 'lt',
+}
+
+
+def is_promotable(column):
+    """Only extra_data columns with numeric or date units can be promoted."""
+    return bool(
+        column.is_extra_data and column.unit and
+        column.unit.unit_type in PROMOTED_VALUE_FIELDS
+    )
+
+
+def promote_column(column, batch_size=1000):
+    """Promotes a column and fills in the values of the org's snapshots.
+
+    :param column: Column inst.
+    :param batch_size: int, snapshots to fill in per transaction.
+
+    """
+    if not is_promotable(column):
+        raise ValueError(
+            u'{0} is not a numeric or date extra_data column.'.format(column)
+        )
+
+    column.is_promoted = True
+    column.save()
+
+    PromotedValue.objects.filter(column=column).delete()
+    snapshots = BuildingSnapshot.objects.filter(
+        super_organization_id=column.organization_id
+    ).only('pk', 'super_organization', 'extra_data')
+    pks = list(snapshots.order_by('pk').values_list('pk', flat=True))
+    columns = {column.organization_id: [column]}
+    for start in range(0, len(pks), batch_size):
+        with transaction.atomic():
+            save_promoted_values(
+                list(snapshots.filter(pk__in=pks[start:start + batch_size])),
+                columns,
+            )
+
+
+def demote_column(column):
+    """Stops promoting a column and drops its values."""
+    column.is_promoted = False
+    column.save()
+    PromotedValue.objects.filter(column=column).delete()
+
+
+def get_searchable_columns(orgs):
+    """The columns a search across ``orgs`` can filter promoted values on.
+
+    Only names which every org has promoted, with the same type of unit,
+    since otherwise some orgs' snapshots would have no values to find.
+
+    :param orgs: iterable of Organization inst.
+    :returns: dict, {column name: list of Column inst., one per org}
+
+    """
+    org_ids = set(org.pk for org in orgs)
+    by_name = {}
+    for org_columns in get_promoted_columns(org_ids).values():
+        for column in org_columns:
+            by_name.setdefault(column.column_name, []).append(column)
+
+    searchable = {}
+    for name, columns in by_name.items():
+        fields = set(
+            PROMOTED_VALUE_FIELDS[column.unit.unit_type] for column in columns
+        )
+        if len(columns) == len(org_ids) and len(fields) == 1:
+            searchable[name] = columns
+
+    return searchable
+
+
+def filter_promoted(queryset, columns, cond, value):
+    """Filters snapshots on their promoted values of a column.
+
+    :param queryset: BuildingSnapshot queryset.
+    :param columns: list of Column inst., as ``get_searchable_columns``.
+    :param cond: str, '>' or '<'.
+    :param value: the bound, e.g. '50' or '2014-01-01'.
+    :returns: queryset, empty if ``value`` isn't of the columns' type.
+
+    """
+    unit_type = columns[0].unit.unit_type
+    value = promoted_value(value, unit_type)
+    if value is None:
+        return queryset.none()
+
+    lookup = '{0}__{1}'.format(
+        PROMOTED_VALUE_FIELDS[unit_type], CONDITION_LOOKUPS[cond]
+    )
+    return queryset.filter(pk__in=PromotedValue.objects.filter(
+        column__in=columns, **{lookup: value}
+    ).values('snapshot_id'))
@@ -0,0 +1,111 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Split CSV files into byte ranges which can be parsed independently.
+
+Boundaries always fall just after a newline that ends a record, so a quoted
+field containing newlines is never cut in two. Quoting is tracked by quote
+parity, which holds for RFC 4180 CSV where a literal quote inside a quoted
+field is escaped by doubling it.
+
+"""
+import io
+
+BLOCK_SIZE = 8 * 1024 * 1024
+QUOTE = '"'
+NEWLINE = '\n'
+
+
+def find_record_boundaries(fileobj, step, block_size=BLOCK_SIZE):
+    """Find the ends of records roughly every ``step`` bytes.
+
+    The first boundary is the end of the first record (the header row), each
+    following boundary is the end of the first record that finishes at
+    least ``step`` bytes after the previous boundary.
+
+    :param fileobj: file opened in binary mode, positioned at 0.
+    :param step: int, minimum number of bytes between boundaries.
+    :returns: list of int, offsets just past each record ending newline.
+
+    """
+    boundaries = []
+    target = 0
+    offset = 0
+    quoted = False
+    for block in iter(lambda: fileobj.read(block_size), ''):
+        # ``quoted`` is the quoting state at ``block[cursor]``.
+        cursor = 0
+        while target < offset + len(block):
+            start = max(target - offset, cursor)
+            quoted ^= block.count(QUOTE, cursor, start) % 2 == 1
+            cursor = start
+
+            found = None
+            newline = block.find(NEWLINE, cursor)
+            while newline != -1:
+                quoted ^= block.count(QUOTE, cursor, newline) % 2 == 1
+                cursor = newline + 1
+                if not quoted:
+                    found = offset + cursor
+                    break
+                newline = block.find(NEWLINE, cursor)
+
+            if found is None:
+                # The record runs into the next block, keep looking there.
+                break
+
+            boundaries.append(found)
+            target = found + step
+
+        quoted ^= block.count(QUOTE, cursor) % 2 == 1
+        offset += len(block)
+
+    return boundaries
+
+
+def get_shards(path, shard_size):
+    """Split a CSV file into header and body byte ranges.
+
+    :param path: str, path to a local CSV file.
+    :param shard_size: int, approximate size in bytes of each shard.
+    :returns: tuple, (header_end, [(start, end), ...]) where each shard is a
+        half-open byte range of whole records following the header row. None
+        if the file has no newline terminated header row (e.g. it uses
+        ``\\r`` line endings), in which case it can't be sharded.
+
+    """
+    with io.open(path, 'rb') as f:
+        boundaries = find_record_boundaries(f, shard_size)
+        f.seek(0, io.SEEK_END)
+        size = f.tell()
+
+    if not boundaries:
+        return None
+
+    header_end = boundaries[0]
+    if boundaries[-1] < size:
+        # Whatever follows the last newline is a final, unterminated record.
+        boundaries.append(size)
+
+    shards = zip(boundaries[:-1], boundaries[1:])
+
+    return header_end, shards
+
+
+def read_shard(path, header_end, start, end):
+    """Read a shard back as a standalone CSV file, header row included.
+
+    :param path: str, path to the local CSV file.
+    :param header_end: int, offset at which the header row ends.
+    :param start: int, offset at which the shard starts.
+    :param end: int, offset at which the shard ends.
+    :returns: io.BytesIO inst.
+
+    """
+    with io.open(path, 'rb') as f:
+        header = f.read(header_end)
+        f.seek(start)
+        body = f.read(end - start)
+
+    return io.BytesIO(header + body)
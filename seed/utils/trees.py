@@ -0,0 +1,116 @@
+"""
+:copyright: (c) 2014 Building Energy Inc
+"""
+"""
+Load a whole BuildingSnapshot tree at once.
+
+``BuildingSnapshot.parent_tree``, ``co_parent`` and ``to_dict`` each query
+the children/parents M2M, so serializing a tree that way costs several
+queries per node. ``SnapshotTree`` loads every node and edge of a tree up
+front, in a fixed number of queries however deep the tree is, and answers
+the same questions in memory.
+
+"""
+from django.db.models import Q
+
+from seed.models import (
+    BuildingSnapshot, get_lineage, get_tips, objs_to_dicts, walk_lineage,
+)
+
+
+def _default_order(snapshot):
+    """Sort key giving BuildingSnapshot's default order (newest first)."""
+    return (snapshot.modified, snapshot.created, snapshot.pk)
+
+
+class SnapshotTree(object):
+    """The tree of snapshots ending at a snapshot's tip.
+
+    Holds the tip, all of its ancestors and their parent and child links.
+    Snapshots are shared, so the same pk always gives the same instance.
+
+    :param snapshot: BuildingSnapshot inst., any snapshot in the tree.
+
+    """
+
+    def __init__(self, snapshot):
+        self.tip_pk = get_tips([snapshot.pk])[snapshot.pk]
+        edges, _source_types = get_lineage([self.tip_pk], 'parents')
+        pks = set([self.tip_pk])
+        for parent_pks in edges.values():
+            pks.update(parent_pks)
+
+        # Every link touching the tree, including children off of it, as
+        # to_dict lists all of a snapshot's children.
+        through = BuildingSnapshot.children.through
+        links = list(through.objects.filter(
+            Q(from_buildingsnapshot_id__in=pks) |
+            Q(to_buildingsnapshot_id__in=pks)
+        ).values_list('from_buildingsnapshot_id', 'to_buildingsnapshot_id'))
+        for link in links:
+            pks.update(link)
+        self.snapshots = BuildingSnapshot.objects.in_bulk(list(pks))
+
+        # {pk: pks of its parents or children, in default order}
+        self.parents = {}
+        self.children = {}
+        for parent_pk, child_pk in links:
+            self.parents.setdefault(child_pk, []).append(parent_pk)
+            self.children.setdefault(parent_pk, []).append(child_pk)
+        for related in (self.parents, self.children):
+            for pk_list in related.values():
+                pk_list.sort(
+                    key=lambda pk: _default_order(self.snapshots[pk]),
+                    reverse=True,
+                )
+        self._dicts = {}
+
+    def get(self, pk):
+        return self.snapshots[pk]
+
+    @property
+    def tip(self):
+        return self.snapshots[self.tip_pk]
+
+    def first_child(self, pk):
+        """As ``BuildingSnapshot.children.first()``."""
+        children = self.children.get(pk)
+        return self.snapshots[children[0]] if children else None
+
+    def co_parent(self, pk):
+        """As ``BuildingSnapshot.co_parent``."""
+        children = self.children.get(pk)
+        if not children:
+            return None
+        for parent_pk in self.parents[children[0]]:
+            if parent_pk != pk:
+                return self.snapshots[parent_pk]
+
+    def parent_tree(self, pk):
+        """As ``BuildingSnapshot.parent_tree``."""
+        return [
+            self.snapshots[parent_pk]
+            for parent_pk in walk_lineage(self.parents, pk)
+        ]
+
+    def match_tree(self):
+        """The tip's parent tree, then the tip."""
+        return self.parent_tree(self.tip_pk) + [self.tip]
+
+    def to_dict(self, pk):
+        """As ``BuildingSnapshot.to_dict()``, without querying."""
+        if not self._dicts:
+            self._serialize()
+        d = dict(self._dicts[pk])
+        d['children'] = list(self.children.get(pk, []))
+        d['parents'] = list(self.parents.get(pk, []))
+        co_parent = self.co_parent(pk)
+        d['co_parent'] = co_parent.pk if co_parent else None
+        return d
+
+    def _serialize(self):
+        # Everything but the children M2M, which we already have.
+        fields = [f.name for f in BuildingSnapshot._meta.fields]
+        snapshots = self.snapshots.values()
+        for snapshot, d in zip(snapshots, objs_to_dicts(snapshots, fields)):
+            self._dicts[snapshot.pk] = d
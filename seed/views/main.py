@@ -4,6 +4,7 @@
 # system imports
 import json
 import datetime
+import time
 import uuid
 
 # django imports
@@ -61,7 +62,10 @@ from seed.utils.projects import (
 )
 
 from seed.utils.time import convert_to_js_timestamp
+from seed.utils.trees import SnapshotTree
+from seed.utils.extra_data_indexes import record_key_usage
 from seed.utils.mapping import get_mappable_types, get_mappable_columns
+from seed.matching.ngrams import forget_canonical_buildings
 
 from .. import search
 from .. import exporter
@@ -540,14 +544,18 @@ def search_buildings(request):
         params['order_by'],
         other_orgs=other_orgs,
         extra_data_sort=extra_data_sort,
+        rank=params['rank'],
     )
 
     # full text search across a couple common fields
     buildings_queryset = search.search_buildings(
-        params['q'], queryset=building_snapshots
+        params['q'], queryset=building_snapshots, rank=params['rank']
     )
     buildings_queryset = search.filter_other_params(
-        buildings_queryset, other_search_params, db_columns
+        buildings_queryset,
+        other_search_params,
+        db_columns,
+        orgs=set(orgs) | set(other_orgs),
     )
     # apply order_by here if extra_data_sort is True
     parent_org = orgs.first().parent_org
@@ -574,6 +582,7 @@ def search_buildings(request):
             order_by_rev=params['sort_reverse'],
             unit=ed_unit,
         )
+    started = time.time()
     buildings, building_count = search.generate_paginated_results(
         buildings_queryset,
         number_per_page=params['number_per_page'],
@@ -582,6 +591,8 @@ def search_buildings(request):
         whitelist_orgs=whitelist_orgs,
         below_threshold=below_threshold,
     )
+    # For indexing the extra_data keys searched on the most.
+    record_key_usage(buildings_queryset, orgs, time.time() - started)
     project_slug = None
     if other_search_params and 'project__slug' in other_search_params:
         project_slug = other_search_params['project__slug']
@@ -871,17 +882,17 @@ def get_match_tree(request):
     # since our tree has the structure of two parents and one child, we can go
     # to the tip and look up, otherwise it's hard to keep track of the
     # co-parent trees of the children.
-    tree = bs.tip.parent_tree + [bs.tip]
-    tree = map(lambda b: b.to_dict(), tree)
+    tree = SnapshotTree(bs)
     return {
         'status': 'success',
-        'match_tree': tree,
+        'match_tree': [tree.to_dict(b.pk) for b in tree.match_tree()],
     }
 
 
-def _parent_tree_coparents(snapshot):
+def _parent_tree_coparents(snapshot, tree=None):
     """
-    Takes a BuildingSnapshot inst. Climbs the snapshot tree upward and
+    Takes a BuildingSnapshot inst., and optionally its SnapshotTree if it
+    has already been loaded. Climbs the snapshot tree upward and
     returns (root, parent_coparents,) where parent_coparents is every
     coparent on the path from the root to the snapshot's coparents and
     the root node. Does not return internal nodes from the path.
@@ -935,19 +946,24 @@ def _parent_tree_coparents(snapshot):
     )
 
     """
+    if tree is None:
+        tree = SnapshotTree(snapshot)
     result_nodes = []
-    root = snapshot
-    canon = root.canonical_building
-
-    if (not canon) and root.co_parent and root.co_parent.canonical_building:
-        root = root.co_parent
-        canon = root.canonical_building
-
-    while root and not (root.parents.count() == 0):
-        parents = root.parents.all()
-        root = parents.filter(canonical_building=canon).first()
-        coparents = parents.exclude(pk=root.pk)
-        result_nodes = result_nodes + list(coparents)
+    root = tree.get(snapshot.pk)
+    canon_id = root.canonical_building_id
+    co_parent = tree.co_parent(root.pk)
+
+    if (not canon_id) and co_parent and co_parent.canonical_building_id:
+        root = co_parent
+        canon_id = root.canonical_building_id
+
+    while root and tree.parents.get(root.pk):
+        parents = [tree.get(pk) for pk in tree.parents[root.pk]]
+        root = next(
+            (p for p in parents if p.canonical_building_id == canon_id), None
+        )
+        coparents = [p for p in parents if p.pk != root.pk]
+        result_nodes = result_nodes + coparents
 
     result_nodes.append(root)
 
@@ -989,33 +1005,35 @@ def get_coparents(request):
         }
     """
     building_id = request.GET.get('building_id', '')
-    node = BuildingSnapshot.objects.get(pk=building_id)
+    # The whole tree, loaded up front so that walking it doesn't query.
+    snapshot = BuildingSnapshot.objects.get(pk=building_id)
+    tree = SnapshotTree(snapshot)
+    node = tree.get(snapshot.pk)
 
     # we need to climb up 'root's parents to find the other matched
     # snapshots
-    root, proto_result = _parent_tree_coparents(node)
+    root, proto_result = _parent_tree_coparents(node, tree)
 
-    if node.canonical_building and node.co_parent:
-        proto_result.append(node.co_parent)
-    elif node.co_parent and node.co_parent.canonical_building:
+    co_parent = tree.co_parent(node.pk)
+    if node.canonical_building_id and co_parent:
+        proto_result.append(co_parent)
+    elif co_parent and co_parent.canonical_building_id:
         proto_result.append(node)
 
-    while node.children.first():
-        child = node.children.first()
-        if child.co_parent:
-            proto_result.append(child.co_parent)
-        node = child
+    child = tree.first_child(node.pk)
+    while child:
+        co_parent = tree.co_parent(child.pk)
+        if co_parent:
+            proto_result.append(co_parent)
+        child = tree.first_child(child.pk)
 
-    result = map(lambda b: b.to_dict(), proto_result)
+    result = [tree.to_dict(b.pk) for b in proto_result]
 
-    tip = root.tip
-    tree = tip.parent_tree + [tip]
-    tree = map(lambda b: b.to_dict(), tree)
     response = {
         'status': 'success',
         'coparents': result,
-        'match_tree': tree,
-        'tip': tip.to_dict(),
+        'match_tree': [tree.to_dict(b.pk) for b in tree.match_tree()],
+        'tip': tree.to_dict(tree.tip_pk),
     }
 
     return response
@@ -1976,7 +1994,11 @@ def delete_buildings(request):
         list(selected_buildings.values_list('id', flat=True)), request.user.pk
     )
     # this step might have to move into a task
-    CanonicalBuilding.objects.filter(
+    canons = CanonicalBuilding.objects.filter(
         buildingsnapshot=selected_buildings
-    ).update(active=False)
+    )
+    forget_canonical_buildings(canons.values_list(
+        'pk', 'canonical_snapshot__super_organization_id'
+    ))
+    canons.update(active=False)
     return {'status': 'success'}